@@ -0,0 +1,262 @@
+"""本地HTTP/JSON分析接口
+
+为BI工具提供与页面相同的分析结果。响应按数据集指纹生成ETag（gzip 压缩的响应使用单独的ETag），支持
+If-None-Match 条件请求（304）和 gzip 压缩，编码后的响应保存在有界的进程内缓存中。
+
+用法:
+    python api_server.py AircraftDetail221225.xlsx [更多文件...] --port 8502 --status "In Service"
+
+接口:
+    GET /api/info                                  数据集信息
+    GET /api/airline-model                         航司x机型交叉表
+    GET /api/market-share                          全部市场占有率表
+    GET /api/market-share/<表名>                    单个市场占有率表（如 制造商全部）
+    GET /api/models                                机型列表
+    GET /api/airlines                              航司列表
+    GET /api/airlines/<航司>/age-distribution       航司机型x机龄分布表
+"""
+import argparse
+import gzip
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from app import MARKET_SHARE_TABLE_NAMES, ChinaAircraftAnalysisTool
+
+
+def accepts_gzip(accept_encoding):
+    """Accept-Encoding 是否接受 gzip: 按 q 值判断（q=0 表示不接受），未列出 gzip 时取 * 的 q 值"""
+    qualities = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0))) > 0
+
+
+def frame_to_json(df):
+    """DataFrame 转为 JSON 友好的 split 结构（index/columns/data）"""
+    if df is None:
+        return None
+    return json.loads(df.to_json(orient='split', force_ascii=False))
+
+
+class AnalysisService:
+    """分析接口的业务逻辑：路由、结果计算和响应缓存"""
+
+    def __init__(self, analyzer, cache_size=128):
+        self.analyzer = analyzer
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # 正在计算的响应: 缓存键 -> 锁（同一响应只计算一次，其它请求等待结果）
+        self._computing = {}
+
+    def etag_for(self, path, gzipped=False, fingerprint=None):
+        """同一数据集上的同一路径结果不变，ETag 由数据集指纹（默认当前数据集）、路径和内容编码决定"""
+        fingerprint = fingerprint or self.analyzer.data_fingerprint
+        return f'"{fingerprint}:{path}{"-gz" if gzipped else ""}"'
+
+    def resolve(self, path):
+        """解析路径，返回计算结果的函数（不计算结果）；未知路径（含未知的表名、不存在的航司）返回 None"""
+        analyzer = self.analyzer
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts[:1] != ['api']:
+            return None
+        parts = parts[1:]
+
+        if parts == ['info']:
+            return self._info
+
+        if parts == ['airline-model']:
+            return lambda: frame_to_json(analyzer.get_cached_report('generate_airline_model_table', verbose=False))
+
+        if parts[:1] == ['market-share'] and len(parts) <= 2:
+            if len(parts) == 2:
+                # 按表名列表检查（当前数据集没有该表时在计算结果后返回 404）
+                if parts[1] not in MARKET_SHARE_TABLE_NAMES:
+                    return None
+                return lambda: frame_to_json(self._market_share().get(parts[1]))
+            return lambda: {name: frame_to_json(df) for name, df in self._market_share().items()}
+
+        if parts == ['models']:
+            return lambda: frame_to_json(analyzer.get_cached_report('generate_model_list', verbose=False))
+
+        if parts == ['airlines']:
+            return self._airlines
+
+        if len(parts) == 3 and parts[0] == 'airlines' and parts[2] == 'age-distribution':
+            if analyzer.filtered_df is None or len(analyzer._airline_rows(parts[1])) == 0:
+                return None
+            return lambda: frame_to_json(
+                analyzer.get_cached_report('generate_airline_age_distribution', parts[1], verbose=False))
+
+        return None
+
+    def _market_share(self):
+        return self.analyzer.get_cached_report('generate_market_share_analysis', verbose=False) or {}
+
+    def _info(self):
+        df = self.analyzer.filtered_df
+        return {
+            'fingerprint': self.analyzer.data_fingerprint,
+            'rows': len(df),
+            'airlines': int(df['Airline_Normalized'].nunique()) if 'Airline_Normalized' in df.columns else 0,
+            'models': int(df['Master Series'].nunique()) if 'Master Series' in df.columns else 0,
+        }
+
+    def _airlines(self):
+        df = self.analyzer.filtered_df
+        if 'Airline_Normalized' not in df.columns:
+            return []
+        return sorted(df['Airline_Normalized'].unique().tolist())
+
+    def build_payload(self, path):
+        """按路径计算结果，返回可序列化对象；未知路径返回 None"""
+        route = self.resolve(path)
+        return None if route is None else route()
+
+    def get_response(self, path, route=None):
+        """返回 (数据集指纹, JSON字节, gzip字节)；未知路径返回 None（route 为已解析的路径）
+
+        只在读写缓存时持有锁，计算结果期间其它请求（缓存命中、304）不受影响。
+        """
+        fingerprint = self.analyzer.data_fingerprint
+        key = (fingerprint, path)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            computing = self._computing.setdefault(key, threading.Lock())
+
+        with computing:
+            try:
+                # 等待期间其它请求可能已经算出结果
+                with self._lock:
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                        return self._cache[key]
+
+                route = route or self.resolve(path)
+                payload = None if route is None else route()
+                if payload is None:
+                    return None
+
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                response = (fingerprint, body, gzip.compress(body))
+
+                with self._lock:
+                    self._cache[key] = response
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                return response
+            finally:
+                with self._lock:
+                    self._computing.pop(key, None)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip('/') or '/'
+
+        try:
+            # 先确认路径存在（未知路径返回 404，不会因条件请求返回 304）
+            route = self.service.resolve(path)
+            if route is None:
+                self._send_json(HTTPStatus.NOT_FOUND, {'error': f'未知接口: {path}'})
+                return
+
+            # 条件请求：ETag 未变化时无需计算结果（压缩和未压缩的响应使用不同的ETag）
+            use_gzip = accepts_gzip(self.headers.get('Accept-Encoding'))
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match:
+                etag = self.service.etag_for(path, use_gzip)
+                if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                    self.send_response(HTTPStatus.NOT_MODIFIED)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+            response = self.service.get_response(path, route)
+        except Exception as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)})
+            return
+
+        if response is None:
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': f'未知接口: {path}'})
+            return
+
+        fingerprint, body, gzipped = response
+        etag = self.service.etag_for(path, use_gzip, fingerprint)
+        content = gzipped if use_gzip else body
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(analyzer, host='127.0.0.1', port=8502, cache_size=128):
+    """创建绑定到已加载数据的HTTP服务"""
+    handler = type('BoundAnalysisRequestHandler', (AnalysisRequestHandler,),
+                   {'service': AnalysisService(analyzer, cache_size=cache_size)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='中国窄体机分析HTTP接口')
+    parser.add_argument('files', nargs='+', help='飞机数据Excel文件')
+    parser.add_argument('--status', default='All Status', choices=['All Status', 'In Service', 'Storage'],
+                        help='状态筛选')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--cache-size', type=int, default=128, help='响应缓存条目上限')
+    args = parser.parse_args()
+
+    # 加载过程（阶段耗时、行数和警告）写入日志
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    analyzer = ChinaAircraftAnalysisTool()
+    if not analyzer.load_and_filter_data(args.files, args.status):
+        raise SystemExit('数据加载失败')
+
+    server = create_server(analyzer, args.host, args.port, args.cache_size)
+    print(f"已加载 {len(analyzer.filtered_df)} 架飞机，数据集指纹 {analyzer.data_fingerprint}")
+    print(f"分析接口: http://{args.host}:{args.port}/api/info")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
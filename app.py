@@ -1,214 +1,633 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import warnings
 import os
 import re
-import matplotlib
 from io import BytesIO
-import tempfile
+import hashlib
+import json
+import copy
+import html
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from itertools import groupby
+
+from chart_templates import get_pyplot
+from columnar_export import COLUMNAR_FORMATS
+from dataset import DatasetSnapshot
+from engines import DATAFRAME_ENGINES, available_engines, create_engine
+from fleet_projection import RETIREMENT_POLICIES, FleetAgeProjection
+from fleet_simulation import (DEFAULT_RETIREMENT_AGE, SEAT_CATEGORIES, prepare_simulation, share_distributions,
+                              shift_shares, simulate_fleet_replacement)
+from ingest import ingest_sheets, list_sheet_names, source_display_name
+from pipeline import StagePipeline
+from progress import EventBus
 
-# 设置图表字体为英文，避免中文字符问题
-matplotlib.use('Agg')
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Helvetica', 'sans-serif']
-plt.rcParams['axes.unicode_minus'] = False
 warnings.filterwarnings('ignore')
 
-# 设置图表样式
-sns.set_style("whitegrid")
-plt.rcParams['figure.figsize'] = (14, 9)  # 增加图表尺寸
-plt.rcParams['axes.titlesize'] = 16
-plt.rcParams['axes.labelsize'] = 14
-plt.rcParams['xtick.labelsize'] = 12
-plt.rcParams['ytick.labelsize'] = 12
-plt.rcParams['legend.fontsize'] = 12
+# 机龄分布图的分段和配色
+AGE_GROUP_BINS = [0, 5, 10, 15, 20, 100]
+AGE_GROUP_LABELS = ['<5', '5-10', '10-15', '15-20', '≥20']
+AGE_GROUP_COLORS = ['#4ECDC4', '#45B7D1', '#FF6B6B', '#FFE66D', '#96CEB4']
 
 
-class ChinaAircraftAnalysisTool:
-    def __init__(self):
-        # 窄体机型号列表（包括支线机）
-        self.narrow_body_models = [
-            # Boeing
-            '737-600', '737-700', '737-800', '737-900',
-            '737 MAX 7', '737 MAX 8', '737 MAX 9', '737 MAX 10',
-            # Airbus
-            'A318', 'A319', 'A320', 'A321',
-            'A319neo', 'A320neo', 'A321neo',
-            # COMAC
-            'C919', 'C919ER',
-            # Regional Jets
-            'ARJ21', 'CRJ200', 'CRJ700', 'CRJ900', 'CRJ1000',
-            'E170', 'E175', 'E190', 'E195',
-            'E190-E2', 'E195-E2',
-            'MA60', 'MA600'
-        ]
+def plot_age_distribution(labels, values, title):
+    """绘制机龄分布柱状图（matplotlib），返回 Figure"""
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(12, 8))
 
-        # 制造商分类
-        self.manufacturer_mapping = {
-            'AIRBUS': 'Airbus',
-            'BOEING': 'Boeing',
-            'EMBRAER': 'Embraer',
-            'COMAC': 'COMAC',
-            'CRAIC': 'COMAC',
-            'BOMBARDIER': 'Bombardier',
-            'CANADAIR': 'Bombardier',
-            'AVIC': 'AVIC',
-            'XIAN': 'AVIC',
-            'HARBIN': 'AVIC',
-            'TEXTRON': 'Textron',
-            'CESSNA': 'Textron'
-        }
+    # 生成机龄分布柱状图 - 使用英文标签
+    bars = ax.bar(labels, values, color=AGE_GROUP_COLORS[:len(values)])
+    ax.set_xlabel('Age (years)', fontsize=14)
+    ax.set_ylabel('Number of Aircraft', fontsize=14)
+    ax.set_title(title, fontsize=18, fontweight='bold')
 
-        # 飞机型号座位数映射
-        self.seat_capacity_map = {
-            # Boeing
-            '737-600': 110, '737-700': 126, '737-800': 162,
-            '737-900': 180, '737 MAX 7': 138, '737 MAX 8': 178,
-            '737 MAX 9': 193, '737 MAX 10': 204,
-
-            # Airbus
-            'A318': 107, 'A319': 124, 'A320': 150, 'A321': 185,
-            'A319neo': 140, 'A320neo': 165, 'A321neo': 206,
-
-            # COMAC
-            'C919': 168, 'C919ER': 192,
-
-            # Regional Jets
-            'ARJ21': 78, 'ARJ21-700': 78, 'ARJ21-900': 105,
-            'CRJ200': 50, 'CRJ700': 70, 'CRJ900': 90, 'CRJ1000': 104,
-            'E170': 72, 'E175': 88, 'E190': 100, 'E195': 124,
-            'E190-E2': 106, 'E195-E2': 132,
-            'MA60': 60, 'MA600': 60
+    # 添加数值标签
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2., height + 0.5,
+                f'{int(height)}', ha='center', va='bottom', fontsize=12)
+
+    plt.tight_layout()
+    return fig
+
+
+# 市场占有率表的名称（见 _market_share_tables；座位等级没有飞机时不生成该等级的表）
+MARKET_SHARE_TABLE_NAMES = (('制造商全部',) + tuple(f'制造商 {seat_category}' for seat_category in SEAT_CATEGORIES)
+                            + ('机型全部',) + tuple(f'机型 {seat_category}' for seat_category in SEAT_CATEGORIES))
+
+# 注册号查询结果显示的字段
+REGISTRATION_RECORD_COLUMNS = ['Registration', 'Airline_Normalized', 'Airline_Group', 'Operator', 'Region',
+                               'Master Series', 'Model_Normalized', 'Aircraft_Class', 'Manufacturer_Category',
+                               'Age', 'Estimated_Seats', 'Seat_Category', 'Status']
+
+# 建立行号索引的维度（交叉筛选和按航司取数使用）
+ROW_INDEX_COLUMNS = ['Airline_Group', 'Airline_Normalized', 'Manufacturer_Category', 'Aircraft_Class',
+                     'Model_Normalized', 'Seat_Category', 'Status']
+
+# 参考数据文件（修改后运行中的应用会按修改时间自动重新加载）
+DEFAULT_REFERENCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference_data.json')
+
+# 参考数据文件的格式版本: 1 为最初的格式，2 增加 regions 和 aircraft_classes（版本 1 的文件按两者为空读取）
+REFERENCE_SCHEMA_VERSION = 2
+
+# 影响机型类别标注阶段 / 区域标注阶段 / 数据增强阶段的参考数据
+CLASS_REFERENCE_KEYS = ('narrow_body_models', 'aircraft_classes')
+REGION_REFERENCE_KEYS = ('china_states', 'china_operators', 'regions')
+ENRICH_REFERENCE_KEYS = ('manufacturer_mapping', 'seat_capacity_map', 'airline_groups')
+STAGE_REFERENCE_KEYS = {'region': REGION_REFERENCE_KEYS, 'aircraft_class': CLASS_REFERENCE_KEYS,
+                        'enrich': ENRICH_REFERENCE_KEYS}
+
+# 读取清洗阶段的结果: 清洗后的数据、其中的客机（标注和增强阶段的输入）、原始行数
+IngestResult = namedtuple('IngestResult', ['cleaned', 'base', 'raw_row_count'])
+
+# 默认区域由 china_states / china_operators 定义，其它区域见参考数据的 regions；都不匹配的归入 OTHER_REGION
+DEFAULT_REGION = '中国内地'
+OTHER_REGION = '其他地区'
+
+# narrow_body_models 中未列入其它类别的机型为窄体机；不属于任何类别的客机归入 OTHER_AIRCRAFT_CLASS
+NARROW_BODY_CLASS = '窄体机'
+OTHER_AIRCRAFT_CLASS = '其他'
+
+# 已编译的参考数据（按 路径 -> (修改时间, 参考数据) 缓存，所有会话共享）
+_reference_cache = {}
+
+
+def _keyword_pattern(keywords):
+    """与逐个 str.contains(..., case=False) 等价的单个正则，无关键字时返回 None"""
+    if not keywords:
+        return None
+    return re.compile('|'.join(f'(?:{keyword})' for keyword in keywords), re.IGNORECASE)
+
+
+def compile_reference_index(reference):
+    """把参考数据编译为匹配时直接使用的查找结构"""
+    airline_groups = reference['airline_groups']
+    region_definitions = [(DEFAULT_REGION, reference['china_states'], reference['china_operators'])]
+    region_definitions += [(region, definition.get('states', []), definition.get('operators', []))
+                           for region, definition in reference['regions'].items()]
+
+    narrow_body_set = frozenset(reference['narrow_body_models'])
+    aircraft_classes = reference['aircraft_classes']
+    aircraft_class_of = {model: aircraft_class for aircraft_class, models in aircraft_classes.items()
+                         for model in models if model in narrow_body_set}
+    aircraft_class_patterns = []
+    for aircraft_class, models in aircraft_classes.items():
+        keywords = [model for model in models if model not in narrow_body_set]
+        if keywords:
+            aircraft_class_patterns.append((aircraft_class, re.compile(
+                '|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)))
+    return {
+        'narrow_body_upper': [(model, model.upper()) for model in reference['narrow_body_models']],
+        'narrow_body_set': narrow_body_set,
+        # narrow_body_models 中的标准机型 -> 类别；其它机型按关键字匹配类别（如宽体机）
+        'aircraft_class_of': aircraft_class_of,
+        'aircraft_class_patterns': aircraft_class_patterns,
+        'aircraft_class_names': list(dict.fromkeys([NARROW_BODY_CLASS, *aircraft_classes, OTHER_AIRCRAFT_CLASS])),
+        # 默认机型范围: narrow_body_models 覆盖的类别（窄体机和支线机）
+        'default_aircraft_scope': tuple(dict.fromkeys(aircraft_class_of.get(model, NARROW_BODY_CLASS)
+                                                      for model in reference['narrow_body_models'])),
+        'manufacturer_items': [(key.upper(), value) for key, value in reference['manufacturer_mapping'].items()],
+        'seat_capacity_upper': [(key.upper(), value) for key, value in reference['seat_capacity_map'].items()],
+        'airline_group_lower': [(airline.lower(), group)
+                                for group, airlines in airline_groups.items() for airline in airlines],
+        'all_airlines_lower': [(airline.lower(), airline)
+                               for airlines in airline_groups.values() for airline in airlines],
+        # 按顺序匹配的区域: [(区域, 省份正则, 航司关键字正则)]，默认区域在最前
+        'region_patterns': [(region, _keyword_pattern(states), _keyword_pattern(operators))
+                            for region, states, operators in region_definitions],
+    }
+
+
+def load_reference_data(path):
+    """读取参考数据文件并编译查找索引（文件未修改时直接返回已编译结果）"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _reference_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, encoding='utf-8') as f:
+        reference = json.load(f)
+
+    version = reference.get('version', 1)
+    if not isinstance(version, int) or version > REFERENCE_SCHEMA_VERSION:
+        raise ValueError(f"不支持的参考数据版本: {version}（支持到 {REFERENCE_SCHEMA_VERSION}）")
+
+    # regions / aircraft_classes 可省略（只分析默认区域 / 全部按窄体机范围）
+    reference.setdefault('regions', {})
+    reference.setdefault('aircraft_classes', {})
+    missing = [key for key in CLASS_REFERENCE_KEYS + REGION_REFERENCE_KEYS + ENRICH_REFERENCE_KEYS
+               if key not in reference]
+    if missing:
+        raise ValueError(f"参考数据文件缺少字段: {', '.join(missing)}")
+
+    reference['mtime'] = mtime
+    reference['index'] = compile_reference_index(reference)
+    # 各阶段所用参考数据的指纹（计算阶段的参数，内容不变的阶段不重新计算）
+    reference['fingerprints'] = {
+        stage: hashlib.sha1(json.dumps({key: reference[key] for key in keys}, sort_keys=True,
+                                       ensure_ascii=False).encode('utf-8')).hexdigest()
+        for stage, keys in STAGE_REFERENCE_KEYS.items()
+    }
+    _reference_cache[path] = (mtime, reference)
+    return reference
+
+
+class ChinaAircraftAnalysisTool:
+    def __init__(self, reference_path=None):
+        # 参考数据（机型、制造商、座位数、省份、航司分组）从外部文件加载
+        self.reference_path = reference_path or DEFAULT_REFERENCE_PATH
+        self._reference_mtime = None
+        self._apply_reference(load_reference_data(self.reference_path))
+
+        # 数据存储: df 为清洗后的原始数据，global_df 为所有区域的增强数据；
+        # 当前区域、机型范围和状态的视图为不可变的数据集快照（filtered_df 即快照的数据表），切换时整体替换
+        self.df = None
+        self.global_df = None
+        self.snapshot = None
+        # 固定在某个快照上的分析视图指向原分析实例（见 for_snapshot）
+        self._owner = None
+
+        # 当前区域和机型范围（None 为默认的窄体机含支线机），以及各 (区域, 机型类别) 的行位置
+        self.region = DEFAULT_REGION
+        self.aircraft_scope = None
+        self._partitions = {}
+
+        # 计算过程事件（阶段、进度、提示和警告）: 页面订阅渲染器显示，其它情况写入日志
+        self.events = EventBus()
+
+        # 加载流程按阶段缓存结果，参数或数据源变化时只重新计算受影响的阶段
+        self.pipeline = self._build_pipeline()
+
+        # 当前数据源及其内容哈希，和状态筛选
+        self._sources = None
+        self._sources_key = None
+        self.raw_row_count = 0
+        self.status_filter = None
+
+        # 多工作表并行导入、市场占有率模拟的进程数（None 表示按CPU核数）
+        self.ingest_workers = None
+        self.simulation_workers = None
+
+        # 清洗、增强和市场占有率汇总使用的计算引擎（'pandas' / 'polars'，见 engines.py）
+        self.dataframe_engine = 'pandas'
+
+        # SQL查询引擎（DuckDB，按需创建）
+        self._sql_conn = None
+        self._sql_cache = {}
+        self.sql_cache_size = 64
+
+        # 机型目录、注册号索引和维度行号索引属于各数据集快照（见 model_catalog / _registration_lookup / _row_lookup）
+
+        # 报表结果缓存（按数据集指纹区分）
+        self._report_cache = {}
+        self._report_lock = threading.Lock()
+        self.report_usage = Counter()
+
+        # 后台预计算（加载数据后可选开启）
+        self.warmup_enabled = False
+        self.warmup_progress = (0, 0)
+        self._warmup_thread = None
+
+        # 图表渲染引擎（按图表类型选择: 'plotly' 浏览器端交互渲染 / 'matplotlib' 服务端PNG）
+        self.chart_backends = {
+            'status': 'plotly',
+            'age': 'plotly',
+            'market_share': 'plotly'
         }
 
+    @property
+    def filtered_df(self):
+        """当前快照的数据表（当前区域、机型范围和状态的视图），不可修改"""
+        return None if self.snapshot is None else self.snapshot.frame
+
+    @property
+    def data_fingerprint(self):
+        """当前快照的标识（数据内容指纹，用于缓存键）"""
+        return None if self.snapshot is None else self.snapshot.snapshot_id
+
+    def for_snapshot(self, snapshot=None):
+        """返回固定在指定快照（默认当前快照）上的分析视图
+
+        视图与原实例共用参考数据、报表缓存和事件总线，报表方法在视图上按该快照计算，
+        计算期间重新加载或切换视图不会影响结果。
+        """
+        view = copy.copy(self)
+        view.snapshot = snapshot if snapshot is not None else self.snapshot
+        view._owner = self._owner or self
+        return view
+
+    def _apply_reference(self, reference):
+        """使用参考数据及其编译索引"""
+        # 窄体机型号列表（包括支线机）
+        self.narrow_body_models = reference['narrow_body_models']
+        # 机型类别（支线喷气机、涡桨支线机、宽体机等）
+        self.aircraft_classes = reference['aircraft_classes']
+        # 制造商分类
+        self.manufacturer_mapping = reference['manufacturer_mapping']
+        # 飞机型号座位数映射
+        self.seat_capacity_map = reference['seat_capacity_map']
         # 中国省份列表（用于筛选）
-        self.china_states = [
-            'Beijing', 'Chongqing', 'Fujian', 'Guangdong', 'Guangxi', 'Guizhou',
-            'Hainan', 'Hebei', 'Heilongjiang', 'Henan', 'Hubei', 'Hunan',
-            'Inner Mongolia', 'Jiangsu', 'Jiangxi', 'Jilin', 'Liaoning',
-            'Ningxia', 'Qinghai', 'Shaanxi', 'Shandong', 'Shanghai',
-            'Sichuan', 'Tianjin', 'Tibet', 'Xinjiang', 'Yunnan', 'Zhejiang',
-            'Unassigned (China)'
-        ]
-
+        self.china_states = reference['china_states']
+        # 中国航司名称关键字（用于筛选）
+        self.china_operators = reference['china_operators']
+        # 其它区域的省份/国家和航司关键字
+        self.regions = reference['regions']
         # 航司分组
-        self.airline_groups = {
-            '国航系': [
-                'Air China', 'Air China Cargo', 'Air China Inner Mongolia',
-                'Beijing Airlines', 'Dalian Airlines', 'Shenzhen Airlines',
-                'Shandong Airlines', 'Air Macau'
-            ],
-            '东航系': [
-                'China Eastern Airlines', 'China Eastern Airlines Guangdong',
-                'China Eastern Airlines Wuhan', 'China Eastern Airlines Yunnan',
-                'Shanghai Airlines', 'China United Airlines', 'China Eastern Cargo'
-            ],
-            '南航系': [
-                'China Southern Airlines', 'China Southern Cargo',
-                'Chongqing Airlines', 'Hebei Airlines', 'Jiangxi Air',
-                'Xiamen Airlines', 'Sichuan Airlines'
-            ],
-            '海航系': [
-                'Hainan Airlines', 'Capital Airlines', 'Tianjin Airlines',
-                'West Air', 'Lucky Air', 'GX Airlines', 'Fuzhou Airlines',
-                '9 Air', 'Air Guilin', 'Grand China Air', 'Suparna Airlines',
-                'Beijing Capital Airlines', 'Urumqi Air', 'Hong Kong Airlines'
-            ],
-            '地方航司': [
-                'Juneyao Air', 'Spring Airlines', 'Chengdu Airlines',
-                'Tibet Airlines', 'Loong Air', 'Ruili Airlines',
-                'Qingdao Airlines', 'Okay Airways', 'Colorful Guizhou Airlines',
-                'China Express Airlines', 'Joy Air', 'Donghai Airlines',
-                'Kunming Airlines', 'LongJiang Airlines'
-            ]
-        }
+        self.airline_groups = reference['airline_groups']
 
         # 所有航司列表
         self.all_airlines = []
         for group_airlines in self.airline_groups.values():
             self.all_airlines.extend(group_airlines)
 
-        # 数据存储
-        self.df = None
-        self.filtered_df = None
+        self.reference_version = reference.get('version')
+        self._reference_index = reference['index']
+        self._reference_fingerprints = reference['fingerprints']
+        self._reference_mtime = reference['mtime']
 
-    def load_and_filter_data(self, file_path, status_filter=None, verbose=True):
-        """加载和筛选数据"""
-        if verbose:
-            st.info(f"正在加载文件: {os.path.basename(file_path)}")
+    def reload_reference_if_changed(self, verbose=True):
+        """参考数据文件修改后热加载，只重新计算受影响的阶段；返回是否重新加载"""
+        try:
+            mtime = os.stat(self.reference_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._reference_mtime:
+            return False
 
+        previous = {key: getattr(self, key)
+                    for key in CLASS_REFERENCE_KEYS + REGION_REFERENCE_KEYS + ENRICH_REFERENCE_KEYS}
         try:
-            # 读取Excel文件
-            self.df = pd.read_excel(file_path)
+            self._apply_reference(load_reference_data(self.reference_path))
+        except Exception as e:
+            # 文件有误时保留当前参考数据，文件再次修改后重试
+            self._reference_mtime = mtime
             if verbose:
-                st.success(f"✅ 原始数据行数: {len(self.df)}")
+                self.events.message(f"❌ 参考数据文件加载失败: {e}", 'error')
+            return False
 
-            # 数据清洗
-            self._clean_data(verbose=verbose)
+        changed = {key for key, value in previous.items() if getattr(self, key) != value}
+        if self.global_df is None or not changed:
+            return True
 
-            # 筛选中国内地飞机
-            self.filtered_df = self._filter_china_mainland(verbose=verbose)
+        # 各标注和增强阶段以对应参考数据的指纹为参数：只重新计算指纹变化的阶段及其下游阶段，
+        # 新的数据集指纹使相关报表缓存失效
+        self._refresh_view(verbose=False)
 
-            # 筛选窄体机
-            self.filtered_df = self._filter_narrow_body(verbose=verbose)
+        if verbose:
+            self.events.message(f"🔄 参考数据已更新（{', '.join(sorted(changed))}），相关结果已重新计算", 'info')
+        return True
 
-            # 应用状态筛选
-            if status_filter and status_filter != 'All Status':
-                if 'Status' in self.filtered_df.columns:
-                    self.filtered_df = self.filtered_df[self.filtered_df['Status'] == status_filter]
-                    if verbose:
-                        st.write(f"📊 状态筛选: {status_filter}")
+    def load_and_filter_data(self, file_path, status_filter=None, verbose=True):
+        """加载和筛选数据
 
-            # 数据增强
-            self._enhance_data(verbose=verbose)
+        file_path 可以是文件路径或上传文件等内存缓冲区，也可以是它们的列表；
+        工作簿中的所有工作表都会被读取。
+        """
+        sources = list(file_path) if isinstance(file_path, (list, tuple)) else [file_path]
+        if verbose:
+            self.events.message(f"正在加载文件: {', '.join(source_display_name(source) for source in sources)}", 'info')
 
-            if verbose:
-                st.success(f"✅ 数据加载完成!")
-                st.write(f"  • 原始数据: {len(self.df)} 行")
-                st.write(f"  • 筛选后数据: {len(self.filtered_df)} 行")
+        previous = (self._sources, self._sources_key, self.status_filter)
+        try:
+            # 内容和筛选条件都未变化时不重复处理
+            sources_key = tuple(self._source_digest(source) for source in sources)
+            if self.filtered_df is not None and sources_key == self._sources_key and status_filter == self.status_filter:
+                if verbose:
+                    self.events.message("ℹ️ 文件内容与筛选条件未变化，沿用已加载的数据", 'info')
+                return True
 
-                # 显示数据概览
-                self._display_data_overview()
+            # 只重新计算数据源或参数变化的阶段（如只改变状态筛选时只重新取视图）；
+            # 各阶段生成新的数据表，全部完成后才替换当前数据
+            self._sources, self._sources_key = sources, sources_key
+            self.status_filter = status_filter
+            self._refresh_view(verbose=verbose)
+
+            if verbose:
+                with self.events.stage('summary'):
+                    self.events.message(f"✅ 数据加载完成!", 'success')
+                    self.events.message(f"  • 原始数据: {self.raw_row_count} 行")
+                    self.events.message(f"  • 所有区域和机型类别: {len(self.global_df)} 行")
+                    self.events.message(f"  • {self.region} / {'、'.join(self.current_aircraft_scope())}: "
+                                        f"{len(self.filtered_df)} 行")
 
             return True
 
         except Exception as e:
+            # 加载失败时保留原有数据和参数
+            self._sources, self._sources_key, self.status_filter = previous
             if verbose:
-                st.error(f"❌ 数据加载失败: {e}")
+                self.events.message(f"❌ 数据加载失败: {e}", 'error')
             return False
 
-    def _clean_data(self, verbose=True):
-        """数据清洗"""
-        # 1. 处理机龄数据
-        age_column = None
-        for col in self.df.columns:
+    def _build_pipeline(self):
+        """加载流程的计算阶段: 读取清洗 → 区域标注 / 机型类别标注 / 数据增强 → 合并 → 分区 → 视图
+
+        标注和增强阶段只依赖读取清洗的结果和各自的参考数据，视图阶段只依赖区域、机型范围和状态，
+        修改其中一项只重新计算依赖它的阶段。
+        """
+        pipeline = StagePipeline(self.events)
+        pipeline.add('ingest', self._ingest_sources, params=lambda: (self._sources_key, self.dataframe_engine))
+        pipeline.add('region', self._tag_regions, inputs=('ingest',),
+                     params=lambda: self._reference_fingerprints['region'])
+        pipeline.add('aircraft_class', self._tag_aircraft_classes, inputs=('ingest',),
+                     params=lambda: self._reference_fingerprints['aircraft_class'])
+        pipeline.add('enrich', lambda ingested, verbose: self._engine().enhance(ingested.base, verbose=verbose),
+                     inputs=('ingest',), params=lambda: (self._reference_fingerprints['enrich'], self.dataframe_engine))
+        pipeline.add('assemble', self._assemble_global_data, inputs=('ingest', 'region', 'aircraft_class', 'enrich'))
+        pipeline.add('partitions', self._build_partitions, inputs=('assemble',))
+        pipeline.add('view', self._build_view, inputs=('assemble', 'partitions'),
+                     params=lambda: (self.region, self.current_aircraft_scope(), self.status_filter))
+        return pipeline
+
+    def _refresh_view(self, verbose=True):
+        """取视图阶段的结果（必要时重新计算变化的阶段），发布为当前数据集快照"""
+        snapshot = self.pipeline.get('view', verbose=verbose)
+        ingested = self.pipeline.get('ingest', verbose=verbose)
+        self.df = ingested.cleaned
+        self.raw_row_count = ingested.raw_row_count
+        self.global_df = self.pipeline.get('assemble', verbose=verbose)
+        self._partitions = self.pipeline.get('partitions', verbose=verbose)
+        self.snapshot = snapshot
+        return snapshot
+
+    def _ingest_sources(self, verbose=True):
+        """读取和清洗当前数据源的所有工作表并筛选客机，返回 IngestResult"""
+        sheet_tasks = [(source, sheet_name) for source in self._sources for sheet_name in list_sheet_names(source)]
+        if len(sheet_tasks) > 1:
+            # 多个工作表在进程池中并行读取和清洗，合并后与单个工作表一样筛选客机
+            cleaned_df, raw_row_count = self._load_sheets_parallel(sheet_tasks, verbose=verbose)
+            return IngestResult(cleaned_df, self._select_passenger_aircraft(cleaned_df), raw_row_count)
+
+        # 读取Excel文件（内存缓冲区直接读取，不落盘）
+        source, sheet_name = sheet_tasks[0]
+        with self.events.stage('read') as stage:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            raw_df = pd.read_excel(source, sheet_name=sheet_name)
+            raw_row_count = stage.rows_out = len(raw_df)
+            if verbose:
+                self.events.message(f"✅ 原始数据行数: {raw_row_count}", 'success')
+
+        # 数据清洗
+        with self.events.stage('clean', rows_in=len(raw_df)) as stage:
+            cleaned_df = self._engine().clean(raw_df, verbose=verbose)
+            stage.rows_out = len(cleaned_df)
+
+        return IngestResult(cleaned_df, self._select_passenger_aircraft(cleaned_df), raw_row_count)
+
+    def _engine(self):
+        """当前计算引擎"""
+        return create_engine(self.dataframe_engine, self)
+
+    def set_dataframe_engine(self, engine, verbose=True):
+        """切换计算引擎（重新计算清洗和增强阶段，结果不变）；返回是否切换"""
+        if engine == self.dataframe_engine:
+            return False
+        create_engine(engine, self)
+        self.dataframe_engine = engine
+        if self.global_df is not None:
+            self._refresh_view(verbose=verbose)
+        return True
+
+    def _assemble_global_data(self, ingested, regions, aircraft_classes, enhanced_df, verbose=True):
+        """合并区域、机型类别和增强列，得到所有区域和机型类别的数据（新数据表，共用增强结果的列）"""
+        global_df = enhanced_df.copy(deep=False)
+        position = len(ingested.base.columns)
+        global_df.insert(position, 'Region', regions)
+        global_df.insert(position + 1, 'Aircraft_Class', aircraft_classes)
+        return global_df
+
+    def _build_partitions(self, global_df, verbose=True):
+        """一次分组得到各 (区域, 机型类别) 的行位置"""
+        if {'Region', 'Aircraft_Class'} <= set(global_df.columns):
+            return global_df.groupby(['Region', 'Aircraft_Class'], sort=False).indices
+        return {}
+
+    def current_aircraft_scope(self):
+        """当前机型范围（机型类别元组）"""
+        if self.aircraft_scope is None:
+            return self._reference_index['default_aircraft_scope']
+        return tuple(self.aircraft_scope)
+
+    @staticmethod
+    def _view_rows(partitions, region, aircraft_scope):
+        """区域和机型范围对应的行位置（保持原始顺序）"""
+        parts = [partitions[(region, aircraft_class)] for aircraft_class in aircraft_scope
+                 if (region, aircraft_class) in partitions]
+        if not parts:
+            return np.array([], dtype=np.intp)
+        return np.sort(np.concatenate(parts))
+
+    def _build_view(self, global_df, partitions, verbose=True):
+        """从全部增强数据中取出当前区域、机型范围和状态的视图，生成数据集快照并构建索引"""
+        frame = global_df.take(self._view_rows(partitions, self.region, self.current_aircraft_scope()))
+        frame = self._apply_status_filter(frame, self.status_filter, verbose=verbose)
+
+        snapshot = DatasetSnapshot(frame, self._compute_fingerprint(frame), region=self.region,
+                                   aircraft_scope=self.current_aircraft_scope(), status_filter=self.status_filter)
+
+        # 构建机型目录、注册号索引和维度行号索引后再替换当前快照
+        self._model_catalog_for(snapshot)
+        self._registration_lookup(snapshot)
+        self._row_lookup(snapshot)
+        return snapshot
+
+    def region_counts(self):
+        """当前机型范围内各区域的飞机数量（默认区域在前，其它按参考数据顺序，未匹配的在最后）"""
+        scope = set(self.current_aircraft_scope())
+        counts = Counter()
+        for (region, aircraft_class), rows in self._partitions.items():
+            if aircraft_class in scope:
+                counts[region] += len(rows)
+        order = [DEFAULT_REGION] + list(self.regions) + [OTHER_REGION]
+        return {region: counts[region] for region in order if region in counts or region == self.region}
+
+    def aircraft_class_counts(self):
+        """当前区域内各机型类别的飞机数量"""
+        counts = Counter()
+        for (region, aircraft_class), rows in self._partitions.items():
+            if region == self.region:
+                counts[aircraft_class] += len(rows)
+        return {aircraft_class: counts[aircraft_class]
+                for aircraft_class in self._reference_index['aircraft_class_names']}
+
+    def set_region(self, region, verbose=True):
+        """切换分析区域（只按行位置取视图，不重新读取和筛选）；返回是否切换"""
+        if region == self.region:
+            return False
+        self.region = region
+        if self.global_df is not None:
+            self._refresh_view(verbose=verbose)
+            if verbose:
+                self.events.message(f"🌏 已切换到 {region}: {len(self.filtered_df)} 架飞机", 'info')
+        return True
+
+    def set_aircraft_scope(self, aircraft_scope, verbose=True):
+        """切换机型范围（机型类别列表，None 为默认范围）；返回是否切换"""
+        if aircraft_scope is not None:
+            aircraft_scope = tuple(aircraft_scope)
+            if aircraft_scope == self._reference_index['default_aircraft_scope']:
+                aircraft_scope = None
+        if aircraft_scope == self.aircraft_scope:
+            return False
+        self.aircraft_scope = aircraft_scope
+        if self.global_df is not None:
+            self._refresh_view(verbose=verbose)
+            if verbose:
+                self.events.message(f"✈️ 机型范围: {'、'.join(self.current_aircraft_scope())}，{len(self.filtered_df)} 架飞机",
+                                    'info')
+        return True
+
+    def set_status_filter(self, status_filter, verbose=True):
+        """切换状态筛选（只重新取视图，不重新读取和增强）；返回是否切换"""
+        if status_filter == self.status_filter:
+            return False
+        self.status_filter = status_filter
+        if self.global_df is not None:
+            self._refresh_view(verbose=verbose)
+            if verbose:
+                self.events.message(f"📊 状态筛选: {status_filter or 'All Status'}，{len(self.filtered_df)} 架飞机", 'info')
+        return True
+
+    def _apply_status_filter(self, df, status_filter, verbose=True):
+        """应用状态筛选，返回筛选后的数据表"""
+        if status_filter and status_filter != 'All Status':
+            if 'Status' in df.columns:
+                df = df[df['Status'] == status_filter]
+                if verbose:
+                    self.events.message(f"📊 状态筛选: {status_filter}")
+        return df
+
+    def _load_sheets_parallel(self, sheet_tasks, verbose=True):
+        """并行读取和清洗多个工作表，返回 (合并后按注册号去重的清洗结果, 原始行数)"""
+        if verbose:
+            self.events.message(f"⚙️ 并行处理 {len(sheet_tasks)} 个工作表...")
+
+        frames = []
+        raw_row_count = 0
+        for source_name, sheet_name, result in ingest_sheets(sheet_tasks, max_workers=self.ingest_workers,
+                                                             reference_path=self.reference_path,
+                                                             dataframe_engine=self.dataframe_engine):
+            if isinstance(result, Exception):
+                if verbose:
+                    self.events.message(f"⚠️ 跳过工作表 {source_name} / {sheet_name}: {result}", 'warning')
+                continue
+
+            sheet_df, raw_rows = result
+            raw_row_count += raw_rows
+            if verbose:
+                self.events.message(f"  • {source_name} / {sheet_name}: {raw_rows} 行 → 清洗后 {len(sheet_df)} 行")
+            if len(sheet_df) > 0:
+                frames.append(sheet_df)
+
+        if not frames:
+            raise ValueError("所有工作表中都没有飞机数据")
+
+        # 合并各工作表的清洗结果
+        merged = pd.concat(frames, ignore_index=True)
+        if 'Registration' in merged.columns:
+            before = len(merged)
+            merged = merged.drop_duplicates(subset=['Registration'], keep='first')
+            if before > len(merged) and verbose:
+                self.events.message(f"  • 跨工作表移除 {before - len(merged)} 个重复记录")
+
+        if verbose:
+            self.events.message(f"✅ 合并结果: {len(merged)} 架飞机", 'success')
+        return merged, raw_row_count
+
+    @staticmethod
+    def _source_digest(source):
+        """计算数据源的内容哈希：内存缓冲区通过 memoryview 直接哈希，文件路径分块读取"""
+        hasher = hashlib.sha1()
+        if hasattr(source, 'getbuffer'):
+            with source.getbuffer() as buffer:
+                hasher.update(buffer)
+        else:
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _find_age_column(df):
+        """年龄列: 第一个列名包含 age（不含 stage）的列，没有时返回 None"""
+        for col in df.columns:
             if 'age' in str(col).lower() and 'stage' not in str(col).lower():
-                age_column = col
-                break
+                return col
+        return None
+
+    def _clean_data(self, df, verbose=True):
+        """数据清洗，返回清洗后的新数据表"""
+        df = df.copy()
+
+        # 1. 处理机龄数据
+        age_column = self._find_age_column(df)
 
         if age_column:
             if verbose:
-                st.write(f"📝 使用列 '{age_column}' 作为年龄列")
-            self.df['Age'] = pd.to_numeric(self.df[age_column], errors='coerce')
+                self.events.message(f"📝 使用列 '{age_column}' 作为年龄列")
+            df['Age'] = pd.to_numeric(df[age_column], errors='coerce')
             if verbose:
-                st.write(f"  • 有效机龄数据: {self.df['Age'].notna().sum()} 行")
+                self.events.message(f"  • 有效机龄数据: {df['Age'].notna().sum()} 行")
 
             # 处理异常机龄值
-            age_mask = self.df['Age'] > 50
+            age_mask = df['Age'] > 50
             if age_mask.any():
                 if verbose:
-                    st.warning(f"⚠️ 发现 {age_mask.sum()} 个异常机龄值 (>50年)")
-                self.df.loc[age_mask, 'Age'] = np.nan
+                    self.events.message(f"⚠️ 发现 {age_mask.sum()} 个异常机龄值 (>50年)", 'warning',
+                                        stage='clean', count=int(age_mask.sum()))
+                df.loc[age_mask, 'Age'] = np.nan
         else:
             if verbose:
-                st.warning("⚠️ 未找到年龄列，将创建空Age列")
-            self.df['Age'] = np.nan
+                self.events.message("⚠️ 未找到年龄列，将创建空Age列", 'warning')
+            df['Age'] = np.nan
 
         # 2. 处理状态数据
-        if 'Status' in self.df.columns:
+        if 'Status' in df.columns:
             # 标准化状态名称
             def normalize_status(status):
                 if pd.isna(status):
@@ -224,58 +643,77 @@ class ChinaAircraftAnalysisTool:
                 else:
                     return status_str
 
-            self.df['Status'] = self.df['Status'].apply(normalize_status)
-            self.df['Status'] = self.df['Status'].fillna('Unknown')
+            df['Status'] = df['Status'].apply(normalize_status)
+            df['Status'] = df['Status'].fillna('Unknown')
 
         # 3. 移除重复记录
-        if 'Registration' in self.df.columns:
-            before = len(self.df)
-            self.df = self.df.drop_duplicates(subset=['Registration'], keep='first')
-            after = len(self.df)
+        if 'Registration' in df.columns:
+            before = len(df)
+            df = df.drop_duplicates(subset=['Registration'], keep='first')
+            after = len(df)
             if before > after and verbose:
-                st.write(f"  • 移除 {before - after} 个重复记录")
-
-    def _filter_china_mainland(self, verbose=True):
-        """筛选中国内地飞机"""
+                self.events.message(f"  • 移除 {before - after} 个重复记录")
+        return df
+
+    @staticmethod
+    def _select_passenger_aircraft(df):
+        """筛选客机（Primary Usage 为 Passenger，没有该列时保留全部）"""
+        if 'Primary Usage' in df.columns:
+            return df[df['Primary Usage'] == 'Passenger'].copy()
+        return df
+
+    def _tag_regions(self, ingested, verbose=True):
+        """标注所属区域（保留所有区域的客机），返回与客机数据对齐的区域列"""
         if verbose:
-            st.write("🌏 筛选中国内地飞机...")
+            self.events.message("🌏 标注飞机所属区域...")
 
-        if len(self.df) == 0:
-            return pd.DataFrame()
-
-        mask = pd.Series(False, index=self.df.index)
-
-        # 筛选Operator State
-        if 'Operator State' in self.df.columns:
-            for province in self.china_states:
-                mask = mask | self.df['Operator State'].astype(str).str.contains(province, case=False, na=False)
-
-        # 筛选Operator
-        if 'Operator' in self.df.columns:
-            china_operators = ['China', 'Air China', 'China Eastern', 'China Southern',
-                               'Hainan', 'Shenzhen', 'Xiamen', 'Sichuan', 'Shanghai',
-                               'Beijing', 'Guangzhou', 'Tianjin']
-            for operator in china_operators:
-                mask = mask | self.df['Operator'].astype(str).str.contains(operator, case=False, na=False)
-
-        # 筛选Primary Usage为Passenger（如果存在该列）
-        if 'Primary Usage' in self.df.columns:
-            usage_mask = self.df['Primary Usage'] == 'Passenger'
-            mask = mask & usage_mask
-
-        filtered_df = self.df[mask].copy()
+        regions = self._classify_regions(ingested.base)
         if verbose:
-            st.success(f"✅ 筛选结果: {len(filtered_df)} 架飞机")
+            region_counts = regions.value_counts()
+            self.events.message("✅ 区域标注结果: " + ", ".join(f"{region} {count}" for region, count in region_counts.items()),
+                                'success')
+        return regions
+
+    def _classify_regions(self, df):
+        """确定每条记录的区域：先按 Operator State 匹配，未匹配时再按 Operator 关键字匹配
+
+        两列都只对唯一值做一次正则匹配；多个区域都匹配时取参考数据中靠前的区域。
+        """
+        region_patterns = self._reference_index['region_patterns']
+
+        def match_region(value, pattern_position):
+            text = str(value)
+            for region_pattern in region_patterns:
+                pattern = region_pattern[pattern_position]
+                if pattern is not None and pattern.search(text):
+                    return region_pattern[0]
+            return None
 
-        return filtered_df
+        region = pd.Series(None, index=df.index, dtype=object)
+        if 'Operator State' in df.columns:
+            region = self._map_unique(df['Operator State'], lambda state: match_region(state, 1))
+        if 'Operator' in df.columns:
+            region = region.fillna(self._map_unique(df['Operator'], lambda operator: match_region(operator, 2)))
+        return region.fillna(OTHER_REGION).astype(object)
 
-    def _filter_narrow_body(self, verbose=True):
-        """筛选窄体机"""
+    def _tag_aircraft_classes(self, ingested, verbose=True):
+        """标注机型类别（窄体机、支线喷气机、涡桨支线机、宽体机等），返回与客机数据对齐的机型类别列"""
         if verbose:
-            st.write("✈️ 筛选窄体机...")
+            self.events.message("✈️ 标注机型类别...")
 
-        if self.filtered_df is None or len(self.filtered_df) == 0:
-            return pd.DataFrame()
+        aircraft_classes = self._classify_aircraft(ingested.base)
+        if verbose:
+            default_scope = self._reference_index['default_aircraft_scope']
+            class_counts = aircraft_classes.value_counts()
+            self.events.message(f"✅ 窄体机（含支线机）: {int(class_counts.reindex(default_scope).sum())} 架飞机；"
+                                + ", ".join(f"{aircraft_class} {count}" for aircraft_class, count in class_counts.items()),
+                                'success')
+        return aircraft_classes
+
+    def _classify_aircraft(self, df):
+        """按编译好的机型索引确定每条记录的机型类别（每个不同的型号只匹配一次）"""
+        if 'Master Series' not in df.columns:
+            return pd.Series(OTHER_AIRCRAFT_CLASS, index=df.index, dtype=object)
 
         # 标准化机型名称
         def normalize_model(model):
@@ -285,9 +723,7 @@ class ChinaAircraftAnalysisTool:
             model_str = str(model).strip().upper()
 
             # 检查是否是窄体机
-            for standard_model in self.narrow_body_models:
-                standard_model_upper = standard_model.upper()
-
+            for standard_model, standard_model_upper in self._reference_index['narrow_body_upper']:
                 # 检查标准型号是否在型号字符串中
                 if standard_model_upper in model_str:
                     # 特殊处理neo系列
@@ -311,22 +747,35 @@ class ChinaAircraftAnalysisTool:
 
             return None
 
-        # 应用筛选
-        model_filtered = self.filtered_df[self.filtered_df['Master Series'].apply(
-            lambda x: normalize_model(x) in self.narrow_body_models if pd.notna(x) else False)]
+        narrow_body_set = self._reference_index['narrow_body_set']
+        aircraft_class_of = self._reference_index['aircraft_class_of']
+        aircraft_class_patterns = self._reference_index['aircraft_class_patterns']
 
-        if verbose:
-            st.success(f"✅ 窄体机筛选结果: {len(model_filtered)} 架飞机")
+        def classify(model):
+            if pd.isna(model):
+                return OTHER_AIRCRAFT_CLASS
 
-        return model_filtered
+            # 窄体机型号列表中的机型（包括支线机）
+            standard_model = normalize_model(model)
+            if standard_model in narrow_body_set:
+                return aircraft_class_of.get(standard_model, NARROW_BODY_CLASS)
 
-    def _enhance_data(self, verbose=True):
-        """数据增强"""
+            # 其它机型按类别关键字匹配
+            for aircraft_class, pattern in aircraft_class_patterns:
+                if pattern.search(str(model)):
+                    return aircraft_class
+            return OTHER_AIRCRAFT_CLASS
+
+        return self._map_unique(df['Master Series'], classify).astype(object)
+
+    def _enhance_data(self, df, verbose=True):
+        """数据增强，返回增强后的新数据表"""
         if verbose:
-            st.write("🔧 增强数据...")
+            self.events.message("🔧 增强数据...")
 
-        if self.filtered_df is None or len(self.filtered_df) == 0:
-            return
+        if df is None or len(df) == 0:
+            return df
+        df = df.copy()
 
         # 1. 标准化制造商信息
         def get_manufacturer(name):
@@ -335,7 +784,7 @@ class ChinaAircraftAnalysisTool:
 
             name_str = str(name).upper()
 
-            for key, value in self.manufacturer_mapping.items():
+            for key, value in self._reference_index['manufacturer_items']:
                 if key in name_str:
                     return value
 
@@ -353,12 +802,12 @@ class ChinaAircraftAnalysisTool:
 
             return 'Other'
 
-        if 'Manufacturer' in self.filtered_df.columns:
-            self.filtered_df['Manufacturer_Category'] = self.filtered_df['Manufacturer'].apply(get_manufacturer)
-        elif 'Master Series' in self.filtered_df.columns:
-            self.filtered_df['Manufacturer_Category'] = self.filtered_df['Master Series'].apply(get_manufacturer)
+        if 'Manufacturer' in df.columns:
+            df['Manufacturer_Category'] = self._map_unique(df['Manufacturer'], get_manufacturer)
+        elif 'Master Series' in df.columns:
+            df['Manufacturer_Category'] = self._map_unique(df['Master Series'], get_manufacturer)
         else:
-            self.filtered_df['Manufacturer_Category'] = 'Unknown'
+            df['Manufacturer_Category'] = 'Unknown'
 
         # 2. 估算座位数
         def estimate_seats(model):
@@ -367,8 +816,8 @@ class ChinaAircraftAnalysisTool:
 
             model_str = str(model).upper()
 
-            for key, value in self.seat_capacity_map.items():
-                if key.upper() in model_str:
+            for key, value in self._reference_index['seat_capacity_upper']:
+                if key in model_str:
                     return value
 
             # 基于型号前缀估算
@@ -399,10 +848,10 @@ class ChinaAircraftAnalysisTool:
 
             return 150
 
-        if 'Master Series' in self.filtered_df.columns:
-            self.filtered_df['Estimated_Seats'] = self.filtered_df['Master Series'].apply(estimate_seats)
+        if 'Master Series' in df.columns:
+            df['Estimated_Seats'] = self._map_unique(df['Master Series'], estimate_seats)
         else:
-            self.filtered_df['Estimated_Seats'] = 150
+            df['Estimated_Seats'] = 150
 
         # 3. 座位等级分类
         def get_seat_category(seats):
@@ -413,7 +862,7 @@ class ChinaAircraftAnalysisTool:
             else:
                 return 'Over 150 seats'
 
-        self.filtered_df['Seat_Category'] = self.filtered_df['Estimated_Seats'].apply(get_seat_category)
+        df['Seat_Category'] = df['Estimated_Seats'].apply(get_seat_category)
 
         # 4. 机龄分类
         def get_age_category(age):
@@ -430,29 +879,28 @@ class ChinaAircraftAnalysisTool:
             else:
                 return '≥20 years'
 
-        if 'Age' in self.filtered_df.columns:
-            self.filtered_df['Age_Category'] = self.filtered_df['Age'].apply(get_age_category)
+        if 'Age' in df.columns:
+            df['Age_Category'] = df['Age'].apply(get_age_category)
         else:
-            self.filtered_df['Age_Category'] = 'Unknown'
+            df['Age_Category'] = 'Unknown'
 
         # 5. 航司集团分类
         def get_airline_group(operator):
             if pd.isna(operator):
                 return 'Other Airlines'
 
-            operator_str = str(operator)
+            operator_str = str(operator).lower()
 
-            for group, airlines in self.airline_groups.items():
-                for airline in airlines:
-                    if airline.lower() in operator_str.lower():
-                        return group
+            for airline_lower, group in self._reference_index['airline_group_lower']:
+                if airline_lower in operator_str:
+                    return group
 
             return 'Other Airlines'
 
-        if 'Operator' in self.filtered_df.columns:
-            self.filtered_df['Airline_Group'] = self.filtered_df['Operator'].apply(get_airline_group)
+        if 'Operator' in df.columns:
+            df['Airline_Group'] = self._map_unique(df['Operator'], get_airline_group)
         else:
-            self.filtered_df['Airline_Group'] = 'Other Airlines'
+            df['Airline_Group'] = 'Other Airlines'
 
         # 6. 航司标准化
         def normalize_airline(operator):
@@ -465,17 +913,215 @@ class ChinaAircraftAnalysisTool:
             operator_str = re.sub(r'\s*\([^)]*\)', '', operator_str).strip()
 
             # 查找匹配的航司
-            for airline in self.all_airlines:
-                if airline.lower() in operator_str.lower():
+            operator_lower = operator_str.lower()
+            for airline_lower, airline in self._reference_index['all_airlines_lower']:
+                if airline_lower in operator_lower:
                     return airline
 
             return operator_str
 
-        if 'Operator' in self.filtered_df.columns:
-            self.filtered_df['Airline_Normalized'] = self.filtered_df['Operator'].apply(normalize_airline)
+        if 'Operator' in df.columns:
+            df['Airline_Normalized'] = self._map_unique(df['Operator'], normalize_airline)
+
+        # 7. 机型标准化
+        if 'Master Series' in df.columns:
+            df['Model_Normalized'] = self._map_unique(df['Master Series'],
+                                                                    self._normalize_model_name)
 
         if verbose:
-            st.success("✅ 数据增强完成")
+            self.events.message("✅ 数据增强完成", 'success')
+        return df
+
+    @staticmethod
+    def _compute_fingerprint(df):
+        """计算数据表的指纹（内容哈希）"""
+        if df is None:
+            return None
+
+        hasher = hashlib.sha1()
+        hasher.update(','.join(map(str, df.columns)).encode('utf-8'))
+        if len(df) > 0:
+            row_hashes = pd.util.hash_pandas_object(df, index=True)
+            hasher.update(row_hashes.values.tobytes())
+        return hasher.hexdigest()
+
+    def get_cached_report(self, report_name, *args, **kwargs):
+        """按数据集指纹缓存报表结果（report_name 为本类的报表方法名）"""
+        # 记录使用次数，后台预计算按此排定优先级
+        self.report_usage[report_name] += 1
+        return self._cached_report(report_name, *args, **kwargs)
+
+    def _cached_report(self, report_name, *args, snapshot=None, **kwargs):
+        """读取或计算报表缓存（可在后台线程中调用）
+
+        报表在 snapshot（默认当前快照）上计算，按快照标识缓存。
+        """
+        snapshot = snapshot if snapshot is not None else self.snapshot
+        if snapshot is None:
+            return getattr(self, report_name)(*args, **kwargs)
+
+        # 报表缓存属于原分析实例（视图中嵌套调用的报表也写入原实例的缓存）
+        owner = self._owner or self
+        # verbose 只影响界面提示，不参与缓存键
+        cache_key = (snapshot.snapshot_id, report_name, args,
+                     tuple(sorted((name, value) for name, value in kwargs.items() if name != 'verbose')))
+        with owner._report_lock:
+            if cache_key in owner._report_cache:
+                return owner._report_cache[cache_key]
+
+        # 计算期间不持有锁，界面和后台预计算可以同时计算不同报表
+        result = getattr(self.for_snapshot(snapshot), report_name)(*args, **kwargs)
+
+        with owner._report_lock:
+            # 只缓存当前数据集的结果，数据集变化后丢弃旧结果
+            if snapshot.snapshot_id == owner.data_fingerprint:
+                for key in [key for key in owner._report_cache if key[0] != snapshot.snapshot_id]:
+                    del owner._report_cache[key]
+                owner._report_cache[cache_key] = result
+        return result
+
+    def _warmup_tasks(self):
+        """后台预计算的报表列表，按使用次数从高到低排列（次数相同时保持默认顺序）"""
+        quiet = {'verbose': False}
+        tasks = [
+            ('generate_airline_model_table', (), quiet),
+            ('generate_market_share_analysis', (), quiet),
+            ('generate_model_list', (), quiet),
+        ]
+        # matplotlib 的 pyplot 不是线程安全的，只预生成 Plotly 图表
+        if self.chart_backends.get('market_share') == 'plotly':
+            tasks.append(('generate_market_share_charts', (), {'backend': 'plotly'}))
+
+        if 'Airline_Normalized' in self.filtered_df.columns:
+            for airline in sorted(self.filtered_df['Airline_Normalized'].dropna().unique()):
+                tasks.append(('generate_airline_age_distribution', (airline,), quiet))
+
+        return sorted(tasks, key=lambda task: -self.report_usage[task[0]])
+
+    def start_warmup(self):
+        """数据加载后在后台线程中预计算常用报表，结果写入报表缓存"""
+        if self.filtered_df is None or len(self.filtered_df) == 0:
+            return None
+
+        tasks = self._warmup_tasks()
+        self.warmup_progress = (0, len(tasks))
+        thread = threading.Thread(target=self._run_warmup, args=(self.snapshot, tasks),
+                                  name='report-warmup', daemon=True)
+        self._warmup_thread = thread
+        thread.start()
+        return thread
+
+    def _run_warmup(self, snapshot, tasks):
+        """在启动时的快照上依次计算预热任务；数据重新加载或切换视图后立即停止"""
+        for done, (report_name, args, kwargs) in enumerate(tasks, start=1):
+            if self.snapshot is not snapshot:
+                return
+            try:
+                self._cached_report(report_name, *args, snapshot=snapshot, **kwargs)
+            except Exception:
+                # 预计算失败不影响正常使用，用户点击时会重新计算并显示错误
+                pass
+            self.warmup_progress = (done, len(tasks))
+
+    def subset_for_airlines(self, airlines):
+        """返回只包含指定航司数据的新分析实例（共用参考数据，报表缓存独立）"""
+        subset = ChinaAircraftAnalysisTool(reference_path=self.reference_path)
+        subset.status_filter = self.status_filter
+        subset.chart_backends = dict(self.chart_backends)
+
+        df = self.filtered_df
+        column = 'Airline_Normalized' if 'Airline_Normalized' in df.columns else 'Operator'
+        frame = df[df[column].isin(list(airlines))]
+        subset.snapshot = DatasetSnapshot(frame, self._compute_fingerprint(frame), region=self.region,
+                                          aircraft_scope=self.current_aircraft_scope(),
+                                          status_filter=self.status_filter)
+        return subset
+
+    @staticmethod
+    def _normalize_sql(query):
+        """去除SQL文本首尾的空白和结尾分号（不改动查询内容，字符串常量中的空白和 -- 保持不变），用作缓存键"""
+        return str(query).strip().rstrip(';').strip()
+
+    def _get_sql_connection(self):
+        """获取DuckDB连接：禁止访问文件系统和网络，并锁定配置（查询中不能重新开启）"""
+        import duckdb
+
+        if self._sql_conn is None:
+            conn = duckdb.connect(database=':memory:', config={'enable_external_access': False})
+            conn.execute("SET lock_configuration=true")
+            self._sql_conn = conn
+        return self._sql_conn
+
+    @staticmethod
+    def _check_sql(conn, query):
+        """只允许单条只读查询（SELECT，包括 WITH ... SELECT）"""
+        import duckdb
+
+        statements = conn.extract_statements(query)
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("只支持单条 SELECT 查询")
+
+    def run_sql_query(self, query, verbose=True):
+        """在筛选后的数据集上执行SQL查询（表名: aircraft）"""
+        snapshot = self.snapshot
+        if snapshot is None or len(snapshot) == 0:
+            if verbose:
+                self.events.message("⚠️ 无数据可分析", 'warning')
+            return None
+
+        normalized_query = self._normalize_sql(query)
+        if not normalized_query:
+            if verbose:
+                self.events.message("⚠️ 请输入SQL查询", 'warning')
+            return None
+
+        cache_key = (snapshot.snapshot_id, normalized_query)
+        if cache_key in self._sql_cache:
+            if verbose:
+                self.events.message("⚡ 命中查询缓存", 'caption')
+            # 返回副本，调用方修改结果不影响缓存
+            return self._sql_cache[cache_key].copy()
+
+        try:
+            start_time = time.perf_counter()
+            conn = self._get_sql_connection()
+            self._check_sql(conn, normalized_query)
+            # 每次查询在独立的游标上注册快照，查询中删除或替换 aircraft 视图不影响其他查询
+            cursor = conn.cursor()
+            try:
+                # register 直接扫描DataFrame内存（经Arrow），不复制整表
+                cursor.register('aircraft', snapshot.frame)
+                result = cursor.execute(normalized_query).df()
+            finally:
+                cursor.close()
+            elapsed = time.perf_counter() - start_time
+        except ImportError:
+            if verbose:
+                self.events.message("❌ 未安装 duckdb，无法执行SQL查询", 'error')
+            return None
+        except Exception as e:
+            if verbose:
+                self.events.message(f"❌ SQL查询失败: {e}", 'error')
+            return None
+
+        # 只缓存当前数据集的结果，超出上限时淘汰最早的查询
+        self._sql_cache = {key: value for key, value in self._sql_cache.items()
+                           if key[0] == snapshot.snapshot_id}
+        while len(self._sql_cache) >= self.sql_cache_size:
+            self._sql_cache.pop(next(iter(self._sql_cache)))
+        self._sql_cache[cache_key] = result
+
+        if verbose:
+            self.events.message(f"✅ 查询完成: {len(result)} 行, 耗时 {elapsed * 1000:.0f} ms", 'success')
+        return result.copy()
+
+    @staticmethod
+    def _map_unique(series, func):
+        """对列中每个不同的值只调用一次 func，再按编码映射回整列"""
+        codes, uniques = pd.factorize(series)
+        # 编码 -1 表示缺失值，对应列表最后一个元素
+        mapped = pd.Series([func(value) for value in uniques] + [func(np.nan)])
+        return pd.Series(mapped.to_numpy()[codes], index=series.index, dtype=mapped.dtype)
 
     def _display_data_overview(self):
         """显示数据概览"""
@@ -516,21 +1162,26 @@ class ChinaAircraftAnalysisTool:
 
             with col2:
                 # 状态分布饼图 - 使用英文标题和标签
-                fig, ax = plt.subplots(figsize=(8, 6))
                 colors = ['#4CAF50', '#FF9800', '#9E9E9E']
-                ax.pie(status_counts.values, labels=status_counts.index, autopct='%1.1f%%',
-                       colors=colors[:len(status_counts)])
-                ax.set_title('Aircraft Status Distribution', fontsize=14, fontweight='bold')
-                st.pyplot(fig)
+                if self.chart_backends.get('status') == 'plotly':
+                    fig = self._plotly_pie(status_counts.index.astype(str).tolist(), status_counts.values.tolist(),
+                                           'Aircraft Status Distribution', colors=colors[:len(status_counts)])
+                else:
+                    plt = get_pyplot()
+                    fig, ax = plt.subplots(figsize=(8, 6))
+                    ax.pie(status_counts.values, labels=status_counts.index, autopct='%1.1f%%',
+                           colors=colors[:len(status_counts)])
+                    ax.set_title('Aircraft Status Distribution', fontsize=14, fontweight='bold')
+                render_chart(fig)
 
     def generate_airline_model_table(self, verbose=True):
         """生成航司x机型交叉表"""
         if verbose:
-            st.write("📊 生成航司x机型交叉表...")
+            self.events.message("📊 生成航司x机型交叉表...")
 
         if self.filtered_df is None or len(self.filtered_df) == 0:
             if verbose:
-                st.warning("⚠️ 无数据可分析")
+                self.events.message("⚠️ 无数据可分析", 'warning')
             return None
 
         # 创建交叉表
@@ -591,7 +1242,7 @@ class ChinaAircraftAnalysisTool:
             cross_table = cross_table.sort_values('Total', ascending=False)
 
             if verbose:
-                st.success(f"✅ 交叉表生成完成: {cross_table.shape}")
+                self.events.message(f"✅ 交叉表生成完成: {cross_table.shape}", 'success')
             return cross_table
 
         return None
@@ -599,66 +1250,24 @@ class ChinaAircraftAnalysisTool:
     def generate_airline_age_distribution(self, airline_name, verbose=True):
         """生成指定航司的机型x机龄分布表"""
         if verbose:
-            st.write(f"📈 生成航司 {airline_name} 的机型x机龄分布表...")
+            self.events.message(f"📈 生成航司 {airline_name} 的机型x机龄分布表...")
 
         if self.filtered_df is None or len(self.filtered_df) == 0:
             if verbose:
-                st.warning("⚠️ 无数据可分析")
+                self.events.message("⚠️ 无数据可分析", 'warning')
             return None
 
         # 筛选指定航司
-        if 'Airline_Normalized' in self.filtered_df.columns:
-            airline_df = self.filtered_df[self.filtered_df['Airline_Normalized'] == airline_name].copy()
-        else:
-            airline_df = self.filtered_df[self.filtered_df['Operator'] == airline_name].copy()
+        airline_df = self._airline_rows(airline_name)
 
         if len(airline_df) == 0:
             if verbose:
-                st.warning(f"⚠️ 未找到航司: {airline_name}")
+                self.events.message(f"⚠️ 未找到航司: {airline_name}", 'warning')
             return None
 
-        # 标准化机型名称
-        def normalize_model_for_table(model):
-            if pd.isna(model):
-                return 'Unknown'
-
-            model_str = str(model).strip()
-
-            # 简化机型名称
-            if '737-700' in model_str:
-                return '737-700'
-            elif '737-800' in model_str:
-                return '737-800'
-            elif '737-900' in model_str:
-                return '737-900'
-            elif '737 MAX' in model_str:
-                return '737 MAX'
-            elif 'A319' in model_str and 'neo' not in model_str.lower():
-                return 'A319'
-            elif 'A320' in model_str and 'neo' not in model_str.lower():
-                return 'A320'
-            elif 'A321' in model_str and 'neo' not in model_str.lower():
-                return 'A321'
-            elif 'A319neo' in model_str:
-                return 'A319neo'
-            elif 'A320neo' in model_str:
-                return 'A320neo'
-            elif 'A321neo' in model_str:
-                return 'A321neo'
-            elif 'E190' in model_str:
-                return 'E190'
-            elif 'E195' in model_str:
-                return 'E195'
-            elif 'CRJ' in model_str:
-                return 'CRJ Series'
-            elif 'ARJ21' in model_str:
-                return 'ARJ21'
-            elif 'C919' in model_str:
-                return 'C919'
-            else:
-                return model_str
-
-        airline_df['Model_Normalized'] = airline_df['Master Series'].apply(normalize_model_for_table)
+        # 标准化机型名称（数据增强时已生成）
+        if 'Model_Normalized' not in airline_df.columns:
+            airline_df['Model_Normalized'] = airline_df['Master Series'].apply(self._normalize_model_name)
 
         # 计算机龄整数（向下取整）
         if 'Age' in airline_df.columns:
@@ -678,67 +1287,90 @@ class ChinaAircraftAnalysisTool:
         age_table = age_table.sort_values('Total', ascending=False)
 
         if verbose:
-            st.success(f"✅ 已生成 {airline_name} 的机龄分布: {len(airline_df)} 架飞机")
+            self.events.message(f"✅ 已生成 {airline_name} 的机龄分布: {len(airline_df)} 架飞机", 'success')
         return age_table
 
-    def generate_airline_age_chart(self, airline_name):
-        """生成单个航司的机龄分布图表"""
+    def _airline_age_groups(self, airline_name):
+        """统计单个航司各机龄段的飞机数量，无数据时返回 None"""
         if self.filtered_df is None or len(self.filtered_df) == 0:
             return None
 
         # 筛选航司数据
-        if 'Airline_Normalized' in self.filtered_df.columns:
-            airline_df = self.filtered_df[self.filtered_df['Airline_Normalized'] == airline_name].copy()
-        else:
-            airline_df = self.filtered_df[self.filtered_df['Operator'] == airline_name].copy()
+        airline_df = self._airline_rows(airline_name)
 
-        if len(airline_df) == 0:
+        if len(airline_df) == 0 or 'Age' not in airline_df.columns:
             return None
 
-        # 计算机龄分布
-        if 'Age' in airline_df.columns:
-            # 按机龄分类
-            age_bins = [0, 5, 10, 15, 20, 100]
-            age_labels = ['<5', '5-10', '10-15', '15-20', '≥20']
-            airline_df['Age_Group'] = pd.cut(airline_df['Age'].fillna(0), bins=age_bins, labels=age_labels, right=False)
-
-            age_distribution = airline_df['Age_Group'].value_counts().sort_index()
-
-            # 生成机龄分布柱状图 - 使用英文标签
-            fig, ax = plt.subplots(figsize=(12, 8))
-            colors = ['#4ECDC4', '#45B7D1', '#FF6B6B', '#FFE66D', '#96CEB4']
-
-            bars = ax.bar(age_distribution.index, age_distribution.values, color=colors[:len(age_distribution)])
-            ax.set_xlabel('Age (years)', fontsize=14)
-            ax.set_ylabel('Number of Aircraft', fontsize=14)
-            ax.set_title(f'{airline_name} - Age Distribution', fontsize=18, fontweight='bold')
-
-            # 添加数值标签
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width() / 2., height + 0.5,
-                        f'{int(height)}', ha='center', va='bottom', fontsize=12)
-
-            plt.tight_layout()
-            return fig
-        return None
+        # 按机龄分类
+        age_groups = pd.cut(airline_df['Age'].fillna(0), bins=AGE_GROUP_BINS, labels=AGE_GROUP_LABELS, right=False)
+        return age_groups.value_counts().sort_index()
+
+    def generate_airline_age_chart(self, airline_name, backend=None):
+        """生成单个航司的机龄分布图表"""
+        age_distribution = self._airline_age_groups(airline_name)
+        if age_distribution is None:
+            return None
+
+        labels = age_distribution.index.astype(str).tolist()
+        values = age_distribution.values.tolist()
+        title = f'{airline_name} - Age Distribution'
+
+        # Plotly: 只把各机龄段的计数发送到浏览器端渲染
+        if (backend or self.chart_backends.get('age')) == 'plotly':
+            return self._plotly_bar(labels, values, title,
+                                    colors=AGE_GROUP_COLORS[:len(values)],
+                                    x_title='Age (years)', y_title='Number of Aircraft')
+
+        return plot_age_distribution(labels, values, title)
+
+    @staticmethod
+    def _plotly_bar(labels, values, title, colors=None, x_title=None, y_title=None):
+        """生成Plotly柱状图（仅包含聚合后的数据）"""
+        import plotly.graph_objects as go
+
+        fig = go.Figure(go.Bar(x=labels, y=values, marker_color=colors,
+                               text=values, textposition='outside'))
+        fig.update_layout(title=dict(text=f'<b>{title}</b>', font=dict(size=18)),
+                          xaxis_title=x_title, yaxis_title=y_title,
+                          margin=dict(t=60, b=40, l=40, r=20))
+        return fig
+
+    @staticmethod
+    def _plotly_pie(labels, values, title, colors=None):
+        """生成Plotly饼图（仅包含聚合后的数据）"""
+        import plotly.graph_objects as go
+
+        fig = go.Figure(go.Pie(labels=labels, values=values, marker=dict(colors=colors),
+                               textinfo='percent', sort=False, direction='clockwise', rotation=90))
+        fig.update_layout(title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
+                          legend=dict(title=dict(text='Categories')),
+                          margin=dict(t=60, b=20, l=20, r=20))
+        return fig
 
     def generate_market_share_analysis(self, verbose=True):
         """生成市场占有率分析"""
         if verbose:
-            st.write("📊 生成市场占有率分析...")
+            self.events.message("📊 生成市场占有率分析...")
 
         if self.filtered_df is None or len(self.filtered_df) == 0:
             if verbose:
-                st.warning("⚠️ 无数据可分析")
+                self.events.message("⚠️ 无数据可分析", 'warning')
             return None
 
+        analysis_results = self._engine().market_share_tables(self.filtered_df)
+
+        if verbose:
+            self.events.message("✅ 市场占有率分析完成", 'success')
+        return analysis_results
+
+    def _market_share_tables(self, df):
+        """市场占有率表（pandas 实现），所有表都由 df 计算"""
         analysis_results = {}
 
         # 1. 制造商市场占有率（所有窄体机）
-        if 'Manufacturer_Category' in self.filtered_df.columns:
-            manufacturer_counts = self.filtered_df['Manufacturer_Category'].value_counts()
-            manufacturer_share = (manufacturer_counts / len(self.filtered_df) * 100).round(2)
+        if 'Manufacturer_Category' in df.columns:
+            manufacturer_counts = df['Manufacturer_Category'].value_counts()
+            manufacturer_share = (manufacturer_counts / len(df) * 100).round(2)
 
             analysis_results['制造商全部'] = pd.DataFrame({
                 '制造商': manufacturer_counts.index,
@@ -747,11 +1379,11 @@ class ChinaAircraftAnalysisTool:
             })
 
         # 2. 按座位等级的制造商市场占有率
-        if 'Manufacturer_Category' in self.filtered_df.columns and 'Seat_Category' in self.filtered_df.columns:
+        if 'Manufacturer_Category' in df.columns and 'Seat_Category' in df.columns:
             seat_categories = ['Under 100 seats', '100-150 seats', 'Over 150 seats']
 
             for seat_cat in seat_categories:
-                seat_df = self.filtered_df[self.filtered_df['Seat_Category'] == seat_cat]
+                seat_df = df[df['Seat_Category'] == seat_cat]
 
                 if len(seat_df) > 0:
                     manufacturer_counts = seat_df['Manufacturer_Category'].value_counts()
@@ -764,7 +1396,7 @@ class ChinaAircraftAnalysisTool:
                     })
 
         # 3. 机型市场占有率（所有窄体机）
-        if 'Master Series' in self.filtered_df.columns:
+        if 'Master Series' in df.columns:
             # 标准化机型名称
             def normalize_model_for_market_share(model):
                 if pd.isna(model):
@@ -806,7 +1438,7 @@ class ChinaAircraftAnalysisTool:
                 else:
                     return model_str
 
-            df_copy = self.filtered_df.copy()
+            df_copy = df.copy()
             df_copy['Model_Normalized'] = df_copy['Master Series'].apply(normalize_model_for_market_share)
 
             model_counts = df_copy['Model_Normalized'].value_counts()
@@ -819,17 +1451,16 @@ class ChinaAircraftAnalysisTool:
             })
 
         # 4. 按座位等级的机型市场占有率
-        if 'Master Series' in self.filtered_df.columns and 'Seat_Category' in self.filtered_df.columns:
+        if 'Master Series' in df.columns and 'Seat_Category' in df.columns:
             seat_categories = ['Under 100 seats', '100-150 seats', 'Over 150 seats']
 
             for seat_cat in seat_categories:
-                seat_df = self.filtered_df[self.filtered_df['Seat_Category'] == seat_cat].copy()
-
-                if len(seat_df) > 0:
-                    seat_df['Model_Normalized'] = seat_df['Master Series'].apply(normalize_model_for_market_share)
+                # 沿用上面标准化后的机型名称
+                seat_models = df_copy.loc[df_copy['Seat_Category'] == seat_cat, 'Model_Normalized']
 
-                    model_counts = seat_df['Model_Normalized'].value_counts()
-                    model_share = (model_counts / len(seat_df) * 100).round(2)
+                if len(seat_models) > 0:
+                    model_counts = seat_models.value_counts()
+                    model_share = (model_counts / len(seat_models) * 100).round(2)
 
                     analysis_results[f'机型 {seat_cat}'] = pd.DataFrame({
                         '机型': model_counts.index,
@@ -837,19 +1468,18 @@ class ChinaAircraftAnalysisTool:
                         '占比 (%)': model_share.values
                     })
 
-        if verbose:
-            st.success("✅ 市场占有率分析完成")
         return analysis_results
 
-    def generate_market_share_charts(self):
+    def generate_market_share_charts(self, backend=None):
         """生成市场占有率图表"""
         charts = {}
+        backend = backend or self.chart_backends.get('market_share')
 
         if self.filtered_df is None or len(self.filtered_df) == 0:
             return charts
 
         # 首先获取市场占有率分析结果
-        market_share_data = self.generate_market_share_analysis(verbose=False)
+        market_share_data = self._cached_report('generate_market_share_analysis', verbose=False)
 
         if not market_share_data:
             return charts
@@ -888,9 +1518,6 @@ class ChinaAircraftAnalysisTool:
                 labels = df[category_col].astype(str).tolist()
                 sizes = df[count_col].astype(float).tolist()
 
-                # 创建饼图
-                fig, ax = plt.subplots(figsize=(12, 9))
-
                 # 限制显示的项目数量，合并小项目为"其他"
                 if len(labels) > 8:
                     # 按大小排序
@@ -908,6 +1535,17 @@ class ChinaAircraftAnalysisTool:
                     labels = top_labels
                     sizes = top_sizes
 
+                # Plotly: 只发送合并后的各类占比数据
+                if backend == 'plotly':
+                    import plotly.colors
+
+                    colors = plotly.colors.qualitative.Set3[:len(labels)]
+                    charts[chart_name] = self._plotly_pie(labels, sizes, chart_title, colors=colors)
+                    continue
+
+                plt = get_pyplot()
+                fig, ax = plt.subplots(figsize=(12, 9))
+
                 # 生成颜色
                 colors = plt.cm.Set3(np.linspace(0, 1, len(labels)))
 
@@ -941,19 +1579,19 @@ class ChinaAircraftAnalysisTool:
 
         # 如果没有生成任何图表，回退到原有的两个图表
         if not charts:
-            charts = self._generate_default_market_share_charts()
+            charts = self._generate_default_market_share_charts(backend=backend)
 
         return charts
 
-    def _generate_default_market_share_charts(self):
+    def _generate_default_market_share_charts(self, backend=None):
         """生成默认的市场占有率图表（原有的两个图表）"""
         charts = {}
+        backend = backend or self.chart_backends.get('market_share')
 
         # 1. 制造商市场份额饼图（所有窄体机）
         if 'Manufacturer_Category' in self.filtered_df.columns:
             manufacturer_counts = self.filtered_df['Manufacturer_Category'].value_counts()
 
-            fig, ax = plt.subplots(figsize=(12, 10))
             colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFE66D', '#96CEB4', '#DDA0DD']
 
             # 只显示主要制造商
@@ -963,12 +1601,20 @@ class ChinaAircraftAnalysisTool:
             if other_count > 0:
                 main_manufacturers = pd.concat([main_manufacturers, pd.Series([other_count], index=['Other'])])
 
-            ax.pie(main_manufacturers.values, labels=main_manufacturers.index,
-                   autopct='%1.1f%%', colors=colors[:len(main_manufacturers)], textprops={'fontsize': 12})
-            ax.set_title('Manufacturer Market Share (Narrow-body Aircraft)', fontsize=18, fontweight='bold')
+            title = 'Manufacturer Market Share (Narrow-body Aircraft)'
+            if backend == 'plotly':
+                charts['manufacturer_market_share'] = self._plotly_pie(
+                    main_manufacturers.index.astype(str).tolist(), main_manufacturers.values.tolist(),
+                    title, colors=colors[:len(main_manufacturers)])
+            else:
+                plt = get_pyplot()
+                fig, ax = plt.subplots(figsize=(12, 10))
+                ax.pie(main_manufacturers.values, labels=main_manufacturers.index,
+                       autopct='%1.1f%%', colors=colors[:len(main_manufacturers)], textprops={'fontsize': 12})
+                ax.set_title(title, fontsize=18, fontweight='bold')
 
-            charts['manufacturer_market_share'] = fig
-            plt.close()
+                charts['manufacturer_market_share'] = fig
+                plt.close()
 
         # 2. 机型市场占有率饼图（所有窄体机，前10个机型）
         if 'Master Series' in self.filtered_df.columns:
@@ -1016,9 +1662,6 @@ class ChinaAircraftAnalysisTool:
 
             model_counts = df_copy['Model_Normalized'].value_counts()
 
-            fig, ax = plt.subplots(figsize=(14, 10))
-            colors = plt.cm.Set3(np.linspace(0, 1, len(model_counts.head(10))))
-
             # 显示前10个机型
             top_models = model_counts.head(10)
             other_count = model_counts.sum() - top_models.sum()
@@ -1026,95 +1669,370 @@ class ChinaAircraftAnalysisTool:
             if other_count > 0:
                 top_models = pd.concat([top_models, pd.Series([other_count], index=['Other'])])
 
-            ax.pie(top_models.values, labels=top_models.index,
-                   autopct='%1.1f%%', colors=colors[:len(top_models)], textprops={'fontsize': 12})
-            ax.set_title('Model Market Share (Top 10, Narrow-body Aircraft)', fontsize=18, fontweight='bold')
+            title = 'Model Market Share (Top 10, Narrow-body Aircraft)'
+            if backend == 'plotly':
+                import plotly.colors
 
-            charts['model_market_share'] = fig
-            plt.close()
+                charts['model_market_share'] = self._plotly_pie(
+                    top_models.index.astype(str).tolist(), top_models.values.tolist(),
+                    title, colors=plotly.colors.qualitative.Set3[:len(top_models)])
+            else:
+                plt = get_pyplot()
+                fig, ax = plt.subplots(figsize=(14, 10))
+                colors = plt.cm.Set3(np.linspace(0, 1, len(model_counts.head(10))))
+
+                ax.pie(top_models.values, labels=top_models.index,
+                       autopct='%1.1f%%', colors=colors[:len(top_models)], textprops={'fontsize': 12})
+                ax.set_title(title, fontsize=18, fontweight='bold')
+
+                charts['model_market_share'] = fig
+                plt.close()
 
         return charts
 
+    @staticmethod
+    def _normalize_model_name(model):
+        """标准化机型名称（用于机型列表和机型目录）"""
+        if pd.isna(model):
+            return 'Unknown'
+
+        model_str = str(model).strip()
+
+        # 简化机型名称
+        if '737-700' in model_str:
+            return '737-700'
+        elif '737-800' in model_str:
+            return '737-800'
+        elif '737-900' in model_str:
+            return '737-900'
+        elif '737 MAX' in model_str:
+            return '737 MAX'
+        elif 'A319' in model_str and 'neo' not in model_str.lower():
+            return 'A319'
+        elif 'A320' in model_str and 'neo' not in model_str.lower():
+            return 'A320'
+        elif 'A321' in model_str and 'neo' not in model_str.lower():
+            return 'A321'
+        elif 'A319neo' in model_str:
+            return 'A319neo'
+        elif 'A320neo' in model_str:
+            return 'A320neo'
+        elif 'A321neo' in model_str:
+            return 'A321neo'
+        elif 'E190' in model_str:
+            return 'E190'
+        elif 'E195' in model_str:
+            return 'E195'
+        elif 'CRJ' in model_str:
+            return 'CRJ Series'
+        elif 'ARJ21' in model_str:
+            return 'ARJ21'
+        elif 'C919' in model_str:
+            return 'C919'
+        else:
+            return model_str
+
+    @property
+    def model_catalog(self):
+        """当前快照的机型目录"""
+        return None if self.snapshot is None else self._model_catalog_for(self.snapshot)
+
+    def _model_catalog_for(self, snapshot):
+        """快照的机型目录（每个快照只构建一次）"""
+        return snapshot.derived('model_catalog', self._build_model_catalog)
+
+    def _build_model_catalog(self, snapshot):
+        """一次遍历构建机型目录: 原始机型 -> 标准化机型、数量、占比、平均机龄、估算座位数"""
+        df = snapshot.frame
+        if len(df) == 0 or 'Master Series' not in df.columns:
+            return None
+
+        # factorize 一次得到每行的机型编号，之后全部按编号聚合
+        codes, raw_models = pd.factorize(df['Master Series'], sort=True)
+        valid = codes >= 0
+        codes = codes[valid]
+        counts = np.bincount(codes, minlength=len(raw_models))
+
+        def mean_by_model(column):
+            if column not in df.columns:
+                return np.full(len(raw_models), np.nan)
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)[valid]
+            has_value = ~np.isnan(values)
+            totals = np.bincount(codes[has_value], weights=values[has_value], minlength=len(raw_models))
+            value_counts = np.bincount(codes[has_value], minlength=len(raw_models))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return totals / value_counts
+
+        total = len(df)
+        catalog = pd.DataFrame({
+            '原始机型': raw_models,
+            '标准化机型': [self._normalize_model_name(model) for model in raw_models],
+            '数量': counts,
+            '占比 (%)': np.round(counts / total * 100, 2),
+            '平均机龄': np.round(mean_by_model('Age'), 1),
+            '估算座位数': np.round(mean_by_model('Estimated_Seats'), 0)
+        })
+
+        return catalog.sort_values('数量', ascending=False, kind='stable').reset_index(drop=True)
+
     def generate_model_list(self, verbose=True):
         """生成机型列表"""
         if self.filtered_df is None or len(self.filtered_df) == 0:
             return None
 
         if 'Master Series' in self.filtered_df.columns:
-            # 获取所有机型
-            all_models = self.filtered_df['Master Series'].dropna().unique()
+            # 机型目录在发布快照时构建
+            model_list_df = self.model_catalog.copy()
 
-            # 标准化机型名称
-            def normalize_model_for_list(model):
-                if pd.isna(model):
-                    return 'Unknown'
+            if verbose:
+                self.events.message(f"📋 已生成机型列表，包含 {len(model_list_df)} 个机型")
+            return model_list_df
 
-                model_str = str(model).strip()
+        return None
 
-                # 简化机型名称
-                if '737-700' in model_str:
-                    return '737-700'
-                elif '737-800' in model_str:
-                    return '737-800'
-                elif '737-900' in model_str:
-                    return '737-900'
-                elif '737 MAX' in model_str:
-                    return '737 MAX'
-                elif 'A319' in model_str and 'neo' not in model_str.lower():
-                    return 'A319'
-                elif 'A320' in model_str and 'neo' not in model_str.lower():
-                    return 'A320'
-                elif 'A321' in model_str and 'neo' not in model_str.lower():
-                    return 'A321'
-                elif 'A319neo' in model_str:
-                    return 'A319neo'
-                elif 'A320neo' in model_str:
-                    return 'A320neo'
-                elif 'A321neo' in model_str:
-                    return 'A321neo'
-                elif 'E190' in model_str:
-                    return 'E190'
-                elif 'E195' in model_str:
-                    return 'E195'
-                elif 'CRJ' in model_str:
-                    return 'CRJ Series'
-                elif 'ARJ21' in model_str:
-                    return 'ARJ21'
-                elif 'C919' in model_str:
-                    return 'C919'
-                else:
-                    return model_str
+    def generate_fleet_projection(self, years, policies=None, base_year=None, verbose=True):
+        """推算各航司在目标年份的机队规模和机龄（不引进新飞机），policies 为 RETIREMENT_POLICIES 中的政策名称"""
+        if self.filtered_df is None or len(self.filtered_df) == 0:
+            if verbose:
+                self.events.message("⚠️ 无数据可分析", 'warning')
+            return None
+        columns = set(self.filtered_df.columns)
+        if 'Model_Normalized' not in columns or not {'Airline_Normalized', 'Operator'} & columns:
+            if verbose:
+                self.events.message("⚠️ 数据缺少航司或机型信息，无法推算机队机龄", 'warning')
+            return None
 
-            # 统计每个机型的数量
-            model_stats = []
-            for model in sorted(all_models):
-                model_count = len(self.filtered_df[self.filtered_df['Master Series'] == model])
-                normalized_model = normalize_model_for_list(model)
-                model_stats.append({
-                    '原始机型': model,
-                    '标准化机型': normalized_model,
-                    '数量': model_count,
-                    '占比 (%)': round(model_count / len(self.filtered_df) * 100, 2) if len(self.filtered_df) > 0 else 0
-                })
-
-            model_list_df = pd.DataFrame(model_stats)
-            model_list_df = model_list_df.sort_values('数量', ascending=False)
+        policies = list(policies) if policies else list(RETIREMENT_POLICIES)
+        base_year = base_year or datetime.now().year
+        with self.events.stage('fleet_projection', rows_in=len(self.filtered_df)):
+            projection = FleetAgeProjection(self.filtered_df, years,
+                                            {name: RETIREMENT_POLICIES[name] for name in policies},
+                                            base_year, AGE_GROUP_BINS, AGE_GROUP_LABELS)
 
+        if verbose:
+            self.events.message(f"✅ 已推算 {len(projection.years)} 个年份 x {len(policies)} 种退役政策的机队机龄", 'success')
+        return projection
+
+    def simulate_market_share(self, target_year, trials=10000, seed=0, retirement_age=DEFAULT_RETIREMENT_AGE,
+                              retirement_by_model=None, replacement_manufacturer=None, replacement_share=None,
+                              base_year=None, workers=None, verbose=True):
+        """蒙特卡洛模拟目标年份的制造商市场占有率分布（均值和P10/P90）
+
+        retirement_by_model 为按机型（Model_Normalized）设定的退役机龄 {机型: (均值, 标准差)}，
+        也可以是 (机型, (均值, 标准差)) 序列（可作为报表缓存键），其它机型使用 retirement_age。
+        退役飞机按座位等级一对一替换；指定 replacement_manufacturer 时该制造商在替换中的份额为
+        replacement_share，其它制造商按当前份额分配剩余部分。
+        workers 为进程数（默认使用 simulation_workers），不影响结果。
+        """
+        if self.filtered_df is None or len(self.filtered_df) == 0:
             if verbose:
-                st.write(f"📋 已生成机型列表，包含 {len(model_list_df)} 个机型")
-            return model_list_df
+                self.events.message("⚠️ 无数据可分析", 'warning')
+            return None
+        if not {'Manufacturer_Category', 'Seat_Category'} <= set(self.filtered_df.columns):
+            return None
 
-        return None
+        replacement_shares = None
+        if replacement_manufacturer is not None:
+            market_share = self._cached_report('generate_market_share_analysis', verbose=False) or {}
+            replacement_shares = {}
+            for seat_category in SEAT_CATEGORIES:
+                table = market_share.get(f'制造商 {seat_category}')
+                if table is not None:
+                    current = dict(zip(table['制造商'], table['数量']))
+                    replacement_shares[seat_category] = shift_shares(current, replacement_manufacturer,
+                                                                     replacement_share)
+
+        years = target_year - (base_year or datetime.now().year)
+        with self.events.stage('market_share_simulation', rows_in=len(self.filtered_df)):
+            inputs = prepare_simulation(self.filtered_df, years, retirement_age=retirement_age,
+                                        retirement_by_model=dict(retirement_by_model or {}),
+                                        replacement_shares=replacement_shares)
+            workers = workers if workers is not None else self.simulation_workers
+            counts = simulate_fleet_replacement(inputs, trials=trials, seed=seed, workers=workers)
+            results = share_distributions(counts, inputs['seat_categories'], inputs['manufacturers'])
+
+        if verbose:
+            self.events.message(f"✅ 已完成 {trials} 次模拟（{target_year} 年）", 'success')
+        return results
+
+    @staticmethod
+    def _registration_key(registration):
+        """注册号查询键：大写并去掉空格和连字符（"b-30ab" 与 "B30AB" 等价）"""
+        return re.sub(r'[\s\-]', '', str(registration)).upper()
+
+    def _registration_lookup(self, snapshot):
+        """快照的注册号索引（每个快照只构建一次）"""
+        return snapshot.derived('registration_index', self._build_registration_index)
+
+    def _build_registration_index(self, snapshot):
+        """构建注册号索引，返回 (查询键 -> 行位置 哈希表, 有序查询键数组, 对应的行位置)
+
+        哈希表用于精确查询，有序键数组用于前缀查询。
+        """
+        df = snapshot.frame
+        if 'Registration' not in df.columns:
+            return None, None, None
+
+        registrations = df['Registration']
+        valid = registrations.notna().to_numpy()
+        keys = (registrations[valid].astype(str).str.replace(r'[\s\-]', '', regex=True)
+                .str.upper().to_numpy(dtype=str))
+        positions = np.flatnonzero(valid)
+
+        order = np.argsort(keys, kind='stable')
+        return dict(zip(keys.tolist(), positions.tolist())), keys[order], positions[order]
+
+    @staticmethod
+    def _registration_records(df, positions):
+        """按行位置取出飞机记录（增强后的字段）"""
+        columns = [column for column in REGISTRATION_RECORD_COLUMNS if column in df.columns]
+        return df.iloc[positions][columns].reset_index(drop=True)
+
+    def lookup_registration(self, registration):
+        """按注册号精确查询飞机记录（哈希查找），未找到返回 None"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        registration_index, _, _ = self._registration_lookup(snapshot)
+        if not registration_index:
+            return None
+
+        position = registration_index.get(self._registration_key(registration))
+        if position is None:
+            return None
+        return self._registration_records(snapshot.frame, [position]).iloc[0].to_dict()
+
+    def search_registrations(self, prefix, limit=20):
+        """按注册号前缀查询（有序数组二分查找），返回 (前 limit 条记录, 匹配总数)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None, 0
+        _, keys, sorted_positions = self._registration_lookup(snapshot)
+
+        key = self._registration_key(prefix)
+        if not key or keys is None:
+            return None, 0
+
+        # 以 key 为前缀的键在有序数组中连续排列
+        start = int(np.searchsorted(keys, key, side='left'))
+        end = int(np.searchsorted(keys, key + '\U0010ffff', side='left'))
+        positions = sorted_positions[start:min(end, start + limit)]
+        return self._registration_records(snapshot.frame, positions), end - start
+
+    def _row_lookup(self, snapshot):
+        """快照的维度行号索引（每个快照只构建一次）"""
+        return snapshot.derived('row_index', self._build_row_index)
+
+    def _build_row_index(self, snapshot):
+        """为常用维度构建行号索引：每个取值对应的行位置，一次排序完成
+
+        返回 (行号索引 {列名: {取值: 有序行位置}}, 各列的 (编码, 取值), 位图缓存)，位图按需生成。
+        """
+        df = snapshot.frame
+        row_index = {}
+        row_codes = {}
+        for column in ROW_INDEX_COLUMNS:
+            if column not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[column])
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+            # 按取值编码稳定排序后，每个取值的行位置是连续的一段（缺失值编码为 -1，排在最前）
+            order = np.argsort(codes, kind='stable')[int((codes < 0).sum()):]
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            row_index[column] = {value: order[offsets[i]:offsets[i + 1]] for i, value in enumerate(uniques)}
+            row_codes[column] = (codes, uniques)
+        return row_index, row_codes, {}
+
+    def _value_bitmap(self, snapshot, column, values):
+        """某一维度取指定值（任一）的行位图"""
+        row_index, _, bitmap_cache = self._row_lookup(snapshot)
+        cache_key = (column, values)
+        bitmap = bitmap_cache.get(cache_key)
+        if bitmap is None:
+            bitmap = np.zeros(len(snapshot.frame), dtype=bool)
+            for value in values:
+                rows = row_index[column].get(value)
+                if rows is not None:
+                    bitmap[rows] = True
+            # 位图缓存只保留最近使用的组合
+            if len(bitmap_cache) >= 256:
+                bitmap_cache.clear()
+            bitmap_cache[cache_key] = bitmap
+        return bitmap
+
+    @staticmethod
+    def _criteria_values(values):
+        """筛选条件取值统一为元组；None 或空列表表示不限"""
+        if values is None:
+            return ()
+        if isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+            return tuple(values)
+        return (values,)
+
+    def _criteria_bitmap(self, snapshot, criteria, exclude=None):
+        """多条件位图（各维度位图按位与），没有任何条件时返回 None"""
+        row_index, _, _ = self._row_lookup(snapshot)
+        bitmap = None
+        for column, values in criteria.items():
+            values = self._criteria_values(values)
+            if column == exclude or not values:
+                continue
+            if column in row_index:
+                column_bitmap = self._value_bitmap(snapshot, column, values)
+            else:
+                column_bitmap = snapshot.frame[column].isin(values).to_numpy()
+            bitmap = column_bitmap if bitmap is None else bitmap & column_bitmap
+        return bitmap
+
+    def select_rows(self, criteria, snapshot=None):
+        """按 {列名: 取值或取值列表} 多条件筛选，返回满足全部条件的行位置"""
+        snapshot = snapshot if snapshot is not None else self.snapshot
+        if snapshot is None:
+            return np.array([], dtype=np.intp)
+        bitmap = self._criteria_bitmap(snapshot, criteria)
+        if bitmap is None:
+            return np.arange(len(snapshot.frame))
+        return np.flatnonzero(bitmap)
+
+    def filter_rows(self, criteria):
+        """按多条件取出数据行"""
+        snapshot = self.snapshot
+        return snapshot.frame.take(self.select_rows(criteria, snapshot))
+
+    def _airline_rows(self, airline_name):
+        """单个航司的数据（按行号索引直接取行，不做全表比较）"""
+        snapshot = self.snapshot
+        df = snapshot.frame
+        if 'Airline_Normalized' not in df.columns:
+            return df.take(np.flatnonzero(df['Operator'] == airline_name))
+
+        row_index, _, _ = self._row_lookup(snapshot)
+        rows = row_index['Airline_Normalized'].get(airline_name)
+        if rows is None:
+            return df.iloc[:0]
+        return df.take(rows)
+
+    def cross_filter_counts(self, criteria, columns=None):
+        """交叉筛选计数：每个维度在其它维度条件下各取值的飞机数量"""
+        snapshot = self.snapshot
+        row_index, row_codes, _ = self._row_lookup(snapshot)
+        counts = {}
+        for column in columns or row_index:
+            codes, uniques = row_codes[column]
+            # 本维度的条件不参与自身计数，这样已选取值之外的选项仍显示可选数量
+            bitmap = self._criteria_bitmap(snapshot, criteria, exclude=column)
+            selected_codes = codes if bitmap is None else codes[bitmap]
+            column_counts = np.bincount(selected_codes[selected_codes >= 0], minlength=len(uniques))
+            counts[column] = pd.Series(column_counts, index=uniques).sort_values(ascending=False)
+        return counts
 
     def export_airline_analysis(self, selected_airlines):
         """导出航司机龄分布分析到Excel"""
-        st.write("💾 正在导出航司机龄分布分析到Excel...")
+        self.events.message("💾 正在导出航司机龄分布分析到Excel...")
 
-        # 创建一个进度容器
-        progress_container = st.container()
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        # 进度通过事件显示，阶段结束时清除
+        with self.events.stage('export_airline'):
 
             try:
                 # 创建Excel写入器
@@ -1136,8 +2054,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤1: 数据说明
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)  # 确保不超过1.0
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建数据信息...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建数据信息...")
 
                     info_data = {
                         '项目': [
@@ -1166,10 +2083,9 @@ class ChinaAircraftAnalysisTool:
                     # 步骤2: 机型列表
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建机型列表...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建机型列表...")
 
-                    model_list_df = self.generate_model_list(verbose=False)
+                    model_list_df = self._cached_report('generate_model_list', verbose=False)
                     if model_list_df is not None:
                         model_list_df.to_excel(writer, sheet_name='机型列表', index=False)
 
@@ -1190,10 +2106,9 @@ class ChinaAircraftAnalysisTool:
                     # 步骤3: 航司x机型交叉表
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建航司x机型表...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建航司x机型表...")
 
-                    airline_model_table = self.generate_airline_model_table(verbose=False)
+                    airline_model_table = self._cached_report('generate_airline_model_table', verbose=False)
                     if airline_model_table is not None:
                         airline_model_table.to_excel(writer, sheet_name='航司x机型')
 
@@ -1202,11 +2117,12 @@ class ChinaAircraftAnalysisTool:
                         for i, airline in enumerate(selected_airlines):
                             current_step += 1
                             progress_value = min(current_step / total_steps, 1.0)
-                            progress_bar.progress(progress_value)
-                            status_text.text(
+                            self.events.progress(
+                                progress_value,
                                 f"步骤 {current_step}/{total_steps}: 处理航司 {airline} ({i + 1}/{len(selected_airlines)})...")
 
-                            airline_age_table = self.generate_airline_age_distribution(airline, verbose=False)
+                            airline_age_table = self._cached_report('generate_airline_age_distribution', airline,
+                                                                    verbose=False)
                             if airline_age_table is not None:
                                 # 简化sheet名称（Excel限制31个字符）
                                 safe_sheet_name = airline[:28].replace('/', '_').replace('\\', '_').replace(':', '_')
@@ -1217,16 +2133,12 @@ class ChinaAircraftAnalysisTool:
                     # 步骤5: 航司汇总信息
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建航司汇总...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建航司汇总...")
 
                     if selected_airlines:
                         summary_data = []
                         for airline in selected_airlines:
-                            if 'Airline_Normalized' in self.filtered_df.columns:
-                                airline_df = self.filtered_df[self.filtered_df['Airline_Normalized'] == airline].copy()
-                            else:
-                                airline_df = self.filtered_df[self.filtered_df['Operator'] == airline].copy()
+                            airline_df = self._airline_rows(airline)
 
                             if len(airline_df) > 0:
                                 total_aircraft = len(airline_df)
@@ -1248,8 +2160,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤6: 制造商详细数据
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建制造商详情...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建制造商详情...")
 
                     if 'Manufacturer_Category' in self.filtered_df.columns:
                         manufacturer_summary = self.filtered_df.groupby('Manufacturer_Category').agg({
@@ -1265,8 +2176,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤7: 机型详细数据
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建机型详情...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建机型详情...")
 
                     if 'Master Series' in self.filtered_df.columns:
                         # 标准化机型名称
@@ -1326,15 +2236,7 @@ class ChinaAircraftAnalysisTool:
                 output.seek(0)
 
                 # 完成进度条
-                progress_bar.progress(1.0)
-                status_text.text("✅ Excel文件生成成功!")
-
-                # 稍等一下，让用户看到完成状态
-                import time
-                time.sleep(0.5)
-
-                # 清空进度容器
-                progress_container.empty()
+                self.events.progress(1.0, "✅ Excel文件生成成功!")
 
                 # 显示下载按钮
                 st.success("✅ Excel文件已准备好下载")
@@ -1349,21 +2251,65 @@ class ChinaAircraftAnalysisTool:
                 return output
 
             except Exception as e:
-                progress_container.empty()
                 st.error(f"❌ 导出Excel失败: {e}")
                 import traceback
                 st.code(traceback.format_exc())
                 return None
 
+    def export_airline_report(self, selected_airlines):
+        """导出所选航司的HTML报告（机龄分布图、交叉表和市场占有率表）"""
+        from batch_report import build_reports
+
+        with st.spinner("正在生成HTML报告..."):
+            try:
+                [(_, html_text)] = build_reports(self.for_snapshot(), {'所选航司': list(selected_airlines)})
+            except Exception as e:
+                st.error(f"❌ 生成报告时出错: {str(e)}")
+                return None
+
+        st.success(f"✅ 已生成 {len(selected_airlines)} 个航司的报告")
+        st.download_button(
+            label="📥 下载HTML报告",
+            data=html_text.encode('utf-8'),
+            file_name=f"机队机龄报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+            mime="text/html",
+            use_container_width=True,
+            key="download_report_btn"
+        )
+        return html_text
+
+    def export_columnar(self, fmt):
+        """导出增强数据和所有报表表格（Parquet / Arrow / zstd压缩CSV，打包为zip）"""
+        from columnar_export import export_tables, write_bundle
+
+        with st.spinner(f"正在导出 {COLUMNAR_FORMATS[fmt][0]}..."):
+            try:
+                output = BytesIO()
+                # 导出期间固定在当前快照上
+                write_bundle(export_tables(self.for_snapshot()), fmt, output)
+            except ImportError:
+                st.error("❌ 导出列式格式需要安装 pyarrow")
+                return None
+            except Exception as e:
+                st.error(f"❌ 导出时出错: {str(e)}")
+                return None
+
+        st.download_button(
+            label=f"📥 下载 {COLUMNAR_FORMATS[fmt][0]}",
+            data=output.getvalue(),
+            file_name=f"飞机数据_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{fmt.replace('.', '_')}.zip",
+            mime="application/zip",
+            use_container_width=True,
+            key="download_columnar_btn"
+        )
+        return output
+
     def export_market_share_analysis(self):
         """导出市场占有率分析到Excel"""
-        st.write("💾 正在导出市场占有率分析到Excel...")
+        self.events.message("💾 正在导出市场占有率分析到Excel...")
 
-        # 创建一个进度容器
-        progress_container = st.container()
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        # 进度通过事件显示，阶段结束时清除
+        with self.events.stage('export_market_share'):
 
             try:
                 # 创建Excel写入器
@@ -1377,8 +2323,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤1: 数据说明
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建数据信息...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建数据信息...")
 
                     info_data = {
                         '项目': [
@@ -1407,10 +2352,9 @@ class ChinaAircraftAnalysisTool:
                     # 步骤2: 机型列表
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建机型列表...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建机型列表...")
 
-                    model_list_df = self.generate_model_list(verbose=False)
+                    model_list_df = self._cached_report('generate_model_list', verbose=False)
                     if model_list_df is not None:
                         model_list_df.to_excel(writer, sheet_name='机型列表', index=False)
 
@@ -1431,10 +2375,9 @@ class ChinaAircraftAnalysisTool:
                     # 步骤3: 市场占有率分析
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建市场占有率分析...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建市场占有率分析...")
 
-                    market_share = self.generate_market_share_analysis(verbose=False)
+                    market_share = self._cached_report('generate_market_share_analysis', verbose=False)
                     if market_share:
                         for sheet_name, df in market_share.items():
                             safe_sheet_name = sheet_name[:31]
@@ -1443,8 +2386,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤4: 制造商详细数据
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建制造商详情...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建制造商详情...")
 
                     if 'Manufacturer_Category' in self.filtered_df.columns:
                         manufacturer_summary = self.filtered_df.groupby('Manufacturer_Category').agg({
@@ -1460,8 +2402,7 @@ class ChinaAircraftAnalysisTool:
                     # 步骤5: 机型详细数据
                     current_step += 1
                     progress_value = min(current_step / total_steps, 1.0)
-                    progress_bar.progress(progress_value)
-                    status_text.text(f"步骤 {current_step}/{total_steps}: 创建机型详情...")
+                    self.events.progress(progress_value, f"步骤 {current_step}/{total_steps}: 创建机型详情...")
 
                     if 'Master Series' in self.filtered_df.columns:
                         # 标准化机型名称
@@ -1521,15 +2462,7 @@ class ChinaAircraftAnalysisTool:
                 output.seek(0)
 
                 # 完成进度条
-                progress_bar.progress(1.0)
-                status_text.text("✅ Excel文件生成成功!")
-
-                # 稍等一下，让用户看到完成状态
-                import time
-                time.sleep(0.5)
-
-                # 清空进度容器
-                progress_container.empty()
+                self.events.progress(1.0, "✅ Excel文件生成成功!")
 
                 # 显示下载按钮
                 st.success("✅ Excel文件已准备好下载")
@@ -1544,13 +2477,201 @@ class ChinaAircraftAnalysisTool:
                 return output
 
             except Exception as e:
-                progress_container.empty()
                 st.error(f"❌ 导出Excel失败: {e}")
                 import traceback
                 st.code(traceback.format_exc())
                 return None
 
 
+def lazy_tabs(labels, key):
+    """创建按需计算的标签页，返回 (标签页列表, 各标签页是否打开)"""
+    try:
+        tabs = st.tabs(labels, key=key, on_change="rerun")
+        return tabs, [tab.open is not False for tab in tabs]
+    except TypeError:
+        # 旧版Streamlit不支持标签页状态跟踪，所有标签页照常执行
+        tabs = st.tabs(labels)
+        return tabs, [True] * len(tabs)
+
+
+def lazy_expander(label, key):
+    """创建按需计算的折叠区域，返回 (折叠区域, 是否展开)"""
+    try:
+        expander = st.expander(label, expanded=False, key=key, on_change="rerun")
+        return expander, bool(expander.open)
+    except TypeError:
+        # 旧版Streamlit无法获知展开状态，改用开关控制是否计算
+        expander = st.expander(label, expanded=False)
+        return expander, expander.toggle("显示内容", key=f"{key}_toggle")
+
+
+def _gradient_styles(df, cmap, text_color_threshold=0.408):
+    """向量化计算背景渐变CSS（按列归一化，效果与 Styler.background_gradient 一致）"""
+    from matplotlib import colormaps
+
+    styles = np.full(df.shape, '', dtype=object)
+    numeric_mask = np.array([pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes])
+    if len(df) == 0 or not numeric_mask.any():
+        return styles
+
+    values = df.loc[:, numeric_mask].to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    col_min = np.nanmin(np.where(valid, values, np.inf), axis=0)
+    col_max = np.nanmax(np.where(valid, values, -np.inf), axis=0)
+    span = np.where(col_max > col_min, col_max - col_min, 1.0)
+    normalized = np.clip((values - col_min) / span, 0, 1)
+
+    rgba = colormaps[cmap](np.nan_to_num(normalized))
+    rgb = np.round(rgba[..., :3] * 255).astype(int)
+    hex_colors = np.char.mod('#%06x', rgb[..., 0] * 65536 + rgb[..., 1] * 256 + rgb[..., 2])
+
+    # 深色背景使用白色文字（WCAG相对亮度）
+    linear = np.where(rgba[..., :3] <= 0.04045, rgba[..., :3] / 12.92, ((rgba[..., :3] + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+    text_colors = np.where(luminance < text_color_threshold, '#f1f1f1', '#000000')
+
+    numeric_styles = np.char.add(np.char.add(np.char.add('background-color: ', hex_colors), '; color: '),
+                                 text_colors).astype(object)
+    numeric_styles[~valid] = ''
+    styles[:, numeric_mask] = numeric_styles
+    return styles
+
+
+# 渐变表格的颜色和分页HTML缓存（按表格内容指纹，内容相同的表格在各会话间共用）
+TABLE_CACHE_SIZE = 128
+_table_cache = OrderedDict()
+_table_cache_lock = threading.Lock()
+
+
+def _cached_table_part(key, build):
+    """读取或生成表格缓存项（最近最少使用的项超出上限时淘汰）"""
+    with _table_cache_lock:
+        if key in _table_cache:
+            _table_cache.move_to_end(key)
+            return _table_cache[key]
+
+    value = build()
+    with _table_cache_lock:
+        _table_cache[key] = value
+        while len(_table_cache) > TABLE_CACHE_SIZE:
+            _table_cache.popitem(last=False)
+    return value
+
+
+def _format_cell(value):
+    """单元格文本: 缺失值为空，浮点数使用最短的精确表示"""
+    if pd.isna(value):
+        return ''
+    if isinstance(value, (float, np.floating)):
+        return np.format_float_positional(value, trim='-')
+    return str(value)
+
+
+def _table_page_html(df, styles, start, stop):
+    """把表格的一页（含行索引）和预先计算的单元格样式生成为HTML表格"""
+    page_df = df.iloc[start:stop]
+    numeric = [pd.api.types.is_numeric_dtype(dtype) for dtype in page_df.dtypes]
+    cell_style = 'padding: 4px 8px; border: 1px solid #e6e9ef; white-space: nowrap;'
+
+    header = ''.join(f'<th style="{cell_style} background: #f0f2f6;">{html.escape(str(column))}</th>'
+                     for column in [page_df.index.name or ''] + list(page_df.columns))
+    rows = []
+    for label, values, row_styles in zip(page_df.index, page_df.itertuples(index=False, name=None), styles[start:stop]):
+        cells = ''.join(
+            f'<td style="{cell_style} text-align: {"right" if is_numeric else "left"}; {style}">'
+            f'{html.escape(_format_cell(value))}</td>'
+            for value, style, is_numeric in zip(values, row_styles, numeric))
+        rows.append(f'<tr><th style="{cell_style} background: #f0f2f6; text-align: left;">'
+                    f'{html.escape(_format_cell(label))}</th>{cells}</tr>')
+    return (f'<div style="overflow-x: auto;"><table style="border-collapse: collapse; font-size: 14px;">'
+            f'<thead><tr>{header}</tr></thead><tbody>{"".join(rows)}</tbody></table></div>')
+
+
+def render_table(df, cmap, key, page_size=50):
+    """分页渲染带渐变色的表格：颜色整表向量化计算，只把当前页发送到浏览器
+
+    颜色和每页的HTML按表格内容指纹缓存，重新运行页面时直接使用缓存，不经过 pandas Styler。
+    """
+    total_rows = len(df)
+    page_count = max(1, -(-total_rows // page_size))
+
+    start = 0
+    if page_count > 1:
+        col_page, col_info = st.columns([1, 3])
+        with col_page:
+            page = st.number_input("页码", min_value=1, max_value=page_count, value=1, step=1,
+                                   key=f"{key}_page")
+        with col_info:
+            st.write("")
+            st.caption(f"第 {page}/{page_count} 页，共 {total_rows} 行")
+        start = (page - 1) * page_size
+
+    # 按整表计算归一化范围，保证翻页前后颜色一致
+    fingerprint = ChinaAircraftAnalysisTool._compute_fingerprint(df)
+    styles = _cached_table_part((fingerprint, cmap), lambda: _gradient_styles(df, cmap))
+    st.html(_cached_table_part((fingerprint, cmap, start, page_size),
+                               lambda: _table_page_html(df, styles, start, start + page_size)))
+
+
+def render_chart(fig):
+    """按图表类型渲染: Plotly图表交给浏览器端渲染，matplotlib图表渲染为PNG"""
+    if hasattr(fig, 'to_plotly_json'):
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.pyplot(fig)
+
+
+class StreamlitEventRenderer:
+    """在页面上显示计算事件: 阶段内的消息在阶段结束时批量输出（同级别的连续消息合并为一个元素），
+    进度条原地更新并按最小步长节流；只处理本次脚本运行所在线程的事件（后台线程的事件只写日志）"""
+
+    def __init__(self, min_progress_step=0.01):
+        self.thread_id = threading.get_ident()
+        self.min_progress_step = min_progress_step
+        self._pending = []
+        self._depth = 0
+        # 进度显示: [占位元素, 进度条, 状态文本, 上次显示的进度, 所在阶段深度]
+        self._progress = None
+
+    def __call__(self, event):
+        if event.thread_id != self.thread_id:
+            return
+        if event.kind == 'stage_started':
+            self._depth += 1
+        elif event.kind == 'stage_finished':
+            self._depth = max(self._depth - 1, 0)
+            self.flush()
+            # 进度条所在的阶段结束后清除进度显示
+            if self._progress is not None and self._depth < self._progress[4]:
+                self._progress[0].empty()
+                self._progress = None
+        elif event.kind == 'message':
+            self._pending.append(event)
+            if self._depth == 0:
+                self.flush()
+        elif event.kind == 'progress':
+            self._show_progress(event)
+
+    def flush(self):
+        """输出缓存的消息"""
+        for level, events in groupby(self._pending, key=lambda event: event.level):
+            getattr(st, level)("  \n".join(event.message for event in events))
+        self._pending = []
+
+    def _show_progress(self, event):
+        percent = min(max(event.percent, 0.0), 1.0)
+        if self._progress is None:
+            placeholder = st.empty()
+            container = placeholder.container()
+            self._progress = [placeholder, container.progress(0.0), container.empty(), -1.0, self._depth]
+        if percent - self._progress[3] < self.min_progress_step and percent < 1.0:
+            return
+        self._progress[1].progress(percent)
+        if event.message:
+            self._progress[2].text(event.message)
+        self._progress[3] = percent
+
+
 def main():
     # 页面配置
     st.set_page_config(
@@ -1608,20 +2729,21 @@ def main():
         st.session_state.analyzer = ChinaAircraftAnalysisTool()
         st.session_state.selected_airlines = []
 
+    # 本次运行的计算事件显示在页面上（替换上次运行的渲染器）
+    st.session_state.analyzer.events.subscribe(StreamlitEventRenderer(), key='streamlit')
+
+    # 参考数据文件修改后自动热加载
+    st.session_state.analyzer.reload_reference_if_changed()
+
     # 侧边栏
     with st.sidebar:
         st.header("📁 文件设置")
 
         # 文件上传
-        uploaded_file = st.file_uploader("上传数据文件", type=['xlsx', 'xls'], help="上传包含飞机数据的Excel文件")
-
-        if uploaded_file is not None:
-            # 保存上传的文件到临时位置
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            temp_file.write(uploaded_file.getbuffer())
-            temp_file_path = temp_file.name
-            temp_file.close()
+        uploaded_files = st.file_uploader("上传数据文件", type=['xlsx', 'xls'], accept_multiple_files=True,
+                                          help="上传包含飞机数据的Excel文件，可同时上传多个文件，所有工作表都会被读取")
 
+        if uploaded_files:
             # 状态筛选
             status_filter = st.selectbox(
                 "状态筛选",
@@ -1629,23 +2751,131 @@ def main():
                 index=0
             )
 
+            # 已加载数据时切换状态只重新取视图，无需重新加载
+            analyzer = st.session_state.analyzer
+            if st.session_state.get('file_loaded') and analyzer.filtered_df is not None:
+                if analyzer.set_status_filter(status_filter, verbose=False):
+                    # 重置航司选择
+                    st.session_state.selected_airlines = []
+                    st.session_state.airline_selector = []
+                    st.session_state.show_cross_table = False
+
+            # 后台预计算
+            st.session_state.analyzer.warmup_enabled = st.checkbox(
+                "⚡ 加载后后台预计算报表",
+                value=st.session_state.analyzer.warmup_enabled,
+                help="加载完成后在后台计算交叉表、市场占有率、机型列表和各航司机龄分布，点击时直接显示"
+            )
+
+            # 计算引擎（安装 polars 后可选择，结果相同）
+            engines = available_engines()
+            if len(engines) > 1:
+                selected_engine = st.selectbox(
+                    "🧮 计算引擎",
+                    options=engines,
+                    index=engines.index(analyzer.dataframe_engine),
+                    format_func=lambda engine: DATAFRAME_ENGINES[engine],
+                    help="数据清洗、增强和市场占有率汇总使用的引擎"
+                )
+                analyzer.set_dataframe_engine(selected_engine, verbose=False)
+
             # 加载数据按钮
             if st.button("加载数据", type="primary", use_container_width=True, key="load_data_btn"):
                 with st.spinner("正在加载和筛选数据..."):
-                    success = st.session_state.analyzer.load_and_filter_data(temp_file_path, status_filter)
+                    # 直接从上传文件的内存缓冲区读取，不写临时文件
+                    success = st.session_state.analyzer.load_and_filter_data(uploaded_files, status_filter)
                     if success:
+                        # 显示数据概览
+                        st.session_state.analyzer._display_data_overview()
                         st.session_state.file_loaded = True
                         # 重置航司选择
                         st.session_state.selected_airlines = []
+                        st.session_state.airline_selector = []
+                        st.session_state.show_cross_table = False
+
+                        if st.session_state.analyzer.warmup_enabled:
+                            st.session_state.analyzer.start_warmup()
+
+        if st.session_state.get('file_loaded') and st.session_state.analyzer.filtered_df is not None:
+            st.markdown("---")
 
-                        # 清理临时文件
-                        import os
-                        os.unlink(temp_file_path)
+            # 区域切换（所有区域已在加载时完成增强，切换只取对应的行）
+            analyzer = st.session_state.analyzer
+            region_counts = analyzer.region_counts()
+            region_options = list(region_counts)
+            selected_region = st.selectbox(
+                "🌏 分析区域",
+                options=region_options,
+                index=region_options.index(analyzer.region),
+                format_func=lambda region: f"{region} ({region_counts[region]} 架)",
+                help="区域定义见参考数据文件中的 china_states / china_operators / regions"
+            )
+
+            # 机型范围（所有类别已在加载时完成增强，切换只取对应的行）
+            class_counts = analyzer.aircraft_class_counts()
+            selected_scope = st.multiselect(
+                "✈️ 机型范围",
+                options=list(class_counts),
+                default=list(analyzer.current_aircraft_scope()),
+                format_func=lambda aircraft_class: f"{aircraft_class} ({class_counts[aircraft_class]} 架)",
+                help="默认为窄体机（含支线机），可加入宽体机或只看支线机"
+            )
+
+            region_changed = analyzer.set_region(selected_region, verbose=False)
+            scope_changed = analyzer.set_aircraft_scope(
+                [aircraft_class for aircraft_class in class_counts if aircraft_class in selected_scope], verbose=False)
+            if region_changed or scope_changed:
+                # 重置航司选择
+                st.session_state.selected_airlines = []
+                st.session_state.airline_selector = []
+                st.session_state.show_cross_table = False
+
+            # 注册号查询（精确匹配或前缀匹配，如 "B-30"）
+            registration_query = st.text_input("🔍 注册号查询", key="registration_search",
+                                               placeholder="如 B-30AB 或 B-30",
+                                               help="输入完整注册号精确查询，或输入开头部分查询所有匹配的飞机")
+            if registration_query.strip():
+                analyzer = st.session_state.analyzer
+                record = analyzer.lookup_registration(registration_query)
+                if record is not None:
+                    st.success(f"✈️ {record.get('Registration')}")
+                    st.dataframe(pd.DataFrame({'字段': list(record.keys()),
+                                               '值': [str(value) for value in record.values()]}),
+                                 hide_index=True, use_container_width=True)
+                else:
+                    matches, total = analyzer.search_registrations(registration_query)
+                    if total:
+                        st.caption(f"找到 {total} 架飞机" + (f"，显示前 {len(matches)} 架" if total > len(matches) else ""))
+                        st.dataframe(matches, hide_index=True, use_container_width=True)
+                    else:
+                        st.warning("⚠️ 未找到匹配的注册号")
+
+            # 列式格式导出（供数据仓库直接读取）
+            with st.expander("📦 导出数据（Parquet / Arrow / CSV）", expanded=False):
+                export_format = st.selectbox("格式", options=list(COLUMNAR_FORMATS),
+                                             format_func=lambda fmt: COLUMNAR_FORMATS[fmt][0], key="columnar_format")
+                if st.button("导出数据和报表", use_container_width=True, key="export_columnar_btn"):
+                    analyzer.export_columnar(export_format)
+
+        # 图表引擎设置（按图表类型选择）
+        with st.expander("📈 图表设置", expanded=False):
+            backend_options = {'Plotly (交互式)': 'plotly', 'Matplotlib (静态图片)': 'matplotlib'}
+            backend_labels = list(backend_options.keys())
+            chart_types = {'status': '状态分布图', 'age': '机龄分布图', 'market_share': '市场占有率图'}
+            for chart_type, chart_label in chart_types.items():
+                current_backend = st.session_state.analyzer.chart_backends.get(chart_type, 'plotly')
+                selected_label = st.selectbox(
+                    chart_label,
+                    options=backend_labels,
+                    index=list(backend_options.values()).index(current_backend),
+                    key=f"chart_backend_{chart_type}"
+                )
+                st.session_state.analyzer.chart_backends[chart_type] = backend_options[selected_label]
 
         st.markdown("---")
         st.info("""
         **使用说明:**
-        1. 上传数据文件 (如: AircraftDetail221225.xlsx)
+        1. 上传数据文件 (如: AircraftDetail221225.xlsx，可多选，读取所有工作表)
         2. 选择状态筛选
         3. 点击"加载数据"
         4. 在主页面选择分析类型
@@ -1660,215 +2890,438 @@ def main():
     if hasattr(st.session_state, 'file_loaded') and st.session_state.analyzer.filtered_df is not None:
         analyzer = st.session_state.analyzer
 
+        # 后台预计算进度
+        if analyzer._warmup_thread is not None and analyzer._warmup_thread.is_alive():
+            done, total = analyzer.warmup_progress
+            st.caption(f"⚡ 后台预计算报表中: {done}/{total}")
+
         # 创建标签页 - 移除侧边栏的分析类型选择，改用标签页
-        tab1, tab2 = st.tabs(["✈️ 航司机龄分布分析", "📊 市场占有率分析"])
+        (tab1, tab2, tab3, tab4, tab5), tabs_open = lazy_tabs(["✈️ 航司机龄分布分析", "📊 市场占有率分析",
+                                                              "🎛️ 交叉筛选", "🔎 SQL查询", "🔮 机队预测"],
+                                                             key="main_tabs")
 
         with tab1:
-            st.header("航司机龄分布分析")
-
-            # 初始化 selected_airlines
-            if 'selected_airlines' not in st.session_state:
-                st.session_state.selected_airlines = []
+            if tabs_open[0]:
+                st.header("航司机龄分布分析")
 
-            # 航司选择
-            if 'Airline_Normalized' in analyzer.filtered_df.columns:
-                airlines = sorted(analyzer.filtered_df['Airline_Normalized'].unique().tolist())
-
-                # 回调函数定义
-                def select_all_callback():
-                    st.session_state.selected_airlines = airlines.copy()
-
-                def clear_all_callback():
+                # 初始化 selected_airlines
+                if 'selected_airlines' not in st.session_state:
                     st.session_state.selected_airlines = []
 
-                col1, col2 = st.columns([3, 1])
+                # 航司选择
+                if 'Airline_Normalized' in analyzer.filtered_df.columns:
+                    airlines = sorted(analyzer.filtered_df['Airline_Normalized'].unique().tolist())
+
+                    # 回调函数定义（同时更新多选框自身的状态，否则多选框会保留旧的选择）
+                    def set_selection(selection):
+                        st.session_state.selected_airlines = selection
+                        st.session_state.airline_selector = selection
+
+                    def select_all_callback():
+                        set_selection(airlines.copy())
+
+                    def clear_all_callback():
+                        set_selection([])
+
+                    def quick_select_callback():
+                        set_selection(airlines[:5])
+
+                    # 多选框未显示时其状态会被清除，重新显示时从 selected_airlines 恢复
+                    if 'airline_selector' not in st.session_state:
+                        st.session_state.airline_selector = [airline for airline in st.session_state.selected_airlines
+                                                             if airline in airlines]
+
+                    col1, col2 = st.columns([3, 1])
+
+                    with col1:
+                        # 航司多选框
+                        selected_airlines = st.multiselect(
+                            "选择航司 (可多选)",
+                            options=airlines,
+                            key="airline_selector"
+                        )
+
+                        # 更新 session state
+                        if selected_airlines != st.session_state.selected_airlines:
+                            st.session_state.selected_airlines = selected_airlines
+
+                    with col2:
+                        st.write("")
+                        st.write("")
+                        col_select, col_clear = st.columns(2)
+
+                        with col_select:
+                            if st.button("全选航司",
+                                         key="select_all_btn",
+                                         on_click=select_all_callback,
+                                         use_container_width=True):
+                                pass  # 回调函数已经处理
+
+                        with col_clear:
+                            if st.button("清空选择",
+                                         key="clear_all_btn",
+                                         on_click=clear_all_callback,
+                                         use_container_width=True):
+                                pass  # 回调函数已经处理
+
+                    # 显示选择状态
+                    if st.session_state.selected_airlines:
+                        st.success(f"✅ 已选择 {len(st.session_state.selected_airlines)} 个航司")
+
+                        # 三个主要功能按钮
+                        st.markdown("---")
+                        st.subheader("分析功能")
+
+                        col_btn1, col_btn2, col_btn3 = st.columns(3)
+
+                        with col_btn1:
+                            if st.button("📋 生成航司x机型表", type="primary", use_container_width=True,
+                                         key="cross_table_btn"):
+                                st.session_state.show_cross_table = True
+
+                            # 翻页会触发重新运行，因此用 session state 保持表格显示
+                            if st.session_state.get('show_cross_table'):
+                                with st.spinner("正在生成交叉表..."):
+                                    cross_table = analyzer.get_cached_report('generate_airline_model_table')
+                                    if cross_table is not None:
+                                        st.markdown("### 航司x机型交叉表")
+                                        render_table(cross_table, cmap='Blues', key="cross_table")
+
+                        with col_btn2:
+                            if st.button("📈 生成机龄分布图", type="primary", use_container_width=True,
+                                         key="age_charts_btn"):
+                                if st.session_state.selected_airlines:
+                                    st.markdown("### 机龄分布图表")
+                                    for i in range(0, len(st.session_state.selected_airlines), 3):
+                                        cols = st.columns(3)
+                                        for j in range(3):
+                                            if i + j < len(st.session_state.selected_airlines):
+                                                airline = st.session_state.selected_airlines[i + j]
+                                                with cols[j]:
+                                                    st.markdown(f"**{airline}**")
+                                                    fig = analyzer.generate_airline_age_chart(airline)
+                                                    if fig is not None:
+                                                        render_chart(fig)
+
+                        with col_btn3:
+                            if st.button("💾 导出到Excel", type="primary", use_container_width=True,
+                                         key="export_airline_btn"):
+                                excel_data = analyzer.export_airline_analysis(st.session_state.selected_airlines)
+
+                            if st.button("📄 导出HTML报告", use_container_width=True, key="export_report_btn"):
+                                analyzer.export_airline_report(st.session_state.selected_airlines)
+
+                        # 显示各航司机型x机龄表
+                        st.markdown("---")
+                        st.subheader("各航司机型x机龄分布")
+
+                        for airline in st.session_state.selected_airlines:
+                            expander, expander_open = lazy_expander(f"📊 {airline} - 机型x机龄分布",
+                                                                    key=f"age_expander_{airline}")
+                            with expander:
+                                # 只有展开时才计算，结果按数据集指纹缓存
+                                if expander_open:
+                                    age_table = analyzer.get_cached_report('generate_airline_age_distribution',
+                                                                           airline)
+                                    if age_table is not None:
+                                        render_table(age_table, cmap='YlOrRd', key=f"age_table_{airline}")
+                    else:
+                        st.warning("⚠️ 请至少选择一个航司进行分析")
 
-                with col1:
-                    # 航司多选框
-                    selected_airlines = st.multiselect(
-                        "选择航司 (可多选)",
-                        options=airlines,
-                        default=st.session_state.selected_airlines,
-                        key="airline_selector"
-                    )
-
-                    # 更新 session state
-                    if selected_airlines != st.session_state.selected_airlines:
-                        st.session_state.selected_airlines = selected_airlines
+                        # 显示可选航司数量
+                        st.info(f"📋 当前数据中有 {len(airlines)} 个航司可供选择")
 
-                with col2:
-                    st.write("")
-                    st.write("")
-                    col_select, col_clear = st.columns(2)
-
-                    with col_select:
-                        if st.button("全选航司",
-                                     key="select_all_btn",
-                                     on_click=select_all_callback,
-                                     use_container_width=True):
-                            pass  # 回调函数已经处理
-
-                    with col_clear:
-                        if st.button("清空选择",
-                                     key="clear_all_btn",
-                                     on_click=clear_all_callback,
-                                     use_container_width=True):
-                            pass  # 回调函数已经处理
-
-                # 显示选择状态
-                if st.session_state.selected_airlines:
-                    st.success(f"✅ 已选择 {len(st.session_state.selected_airlines)} 个航司")
-
-                    # 三个主要功能按钮
-                    st.markdown("---")
-                    st.subheader("分析功能")
-
-                    col_btn1, col_btn2, col_btn3 = st.columns(3)
-
-                    with col_btn1:
-                        if st.button("📋 生成航司x机型表", type="primary", use_container_width=True,
-                                     key="cross_table_btn"):
-                            with st.spinner("正在生成交叉表..."):
-                                cross_table = analyzer.generate_airline_model_table()
-                                if cross_table is not None:
-                                    st.markdown("### 航司x机型交叉表")
-                                    st.dataframe(cross_table.style.background_gradient(cmap='Blues'),
-                                                 use_container_width=True)
-
-                    with col_btn2:
-                        if st.button("📈 生成机龄分布图", type="primary", use_container_width=True,
-                                     key="age_charts_btn"):
-                            if st.session_state.selected_airlines:
-                                st.markdown("### 机龄分布图表")
-                                for i in range(0, len(st.session_state.selected_airlines), 3):
-                                    cols = st.columns(3)
-                                    for j in range(3):
-                                        if i + j < len(st.session_state.selected_airlines):
-                                            airline = st.session_state.selected_airlines[i + j]
-                                            with cols[j]:
-                                                st.markdown(f"**{airline}**")
-                                                fig = analyzer.generate_airline_age_chart(airline)
-                                                if fig is not None:
-                                                    st.pyplot(fig)
-
-                    with col_btn3:
-                        if st.button("💾 导出到Excel", type="primary", use_container_width=True,
-                                     key="export_airline_btn"):
-                            excel_data = analyzer.export_airline_analysis(st.session_state.selected_airlines)
-
-                    # 显示各航司机型x机龄表
-                    st.markdown("---")
-                    st.subheader("各航司机型x机龄分布")
-
-                    for airline in st.session_state.selected_airlines:
-                        with st.expander(f"📊 {airline} - 机型x机龄分布", expanded=False):
-                            age_table = analyzer.generate_airline_age_distribution(airline)
-                            if age_table is not None:
-                                st.dataframe(age_table.style.background_gradient(cmap='YlOrRd'),
-                                             use_container_width=True)
+                        # 快速选择提示
+                        st.button("点此快速选择前5个航司", key="quick_select_btn", on_click=quick_select_callback)
                 else:
-                    st.warning("⚠️ 请至少选择一个航司进行分析")
-
-                    # 显示可选航司数量
-                    st.info(f"📋 当前数据中有 {len(airlines)} 个航司可供选择")
-
-                    # 快速选择提示
-                    if st.button("点此快速选择前5个航司", key="quick_select_btn"):
-                        st.session_state.selected_airlines = airlines[:5]
-                        st.rerun()
-            else:
-                st.warning("⚠️ 数据中没有找到航司信息")
+                    st.warning("⚠️ 数据中没有找到航司信息")
 
         with tab2:
-            st.header("市场占有率分析")
+            if tabs_open[1]:
+                st.header("市场占有率分析")
 
-            # 创建分析功能区
-            st.markdown("---")
-            st.subheader("分析功能")
+                # 创建分析功能区
+                st.markdown("---")
+                st.subheader("分析功能")
 
-            col1, col2, col3 = st.columns(3)
+                col1, col2, col3 = st.columns(3)
 
-            with col1:
-                if st.button("📊 生成市场占有率表", type="primary", use_container_width=True, key="market_table_btn"):
-                    with st.spinner("正在生成市场占有率分析..."):
-                        market_share = analyzer.generate_market_share_analysis()
-                        if market_share:
-                            for name, df in market_share.items():
-                                st.markdown(f"### {name}")
-                                st.dataframe(df.style.background_gradient(cmap='Greens'), use_container_width=True)
+                with col1:
+                    if st.button("📊 生成市场占有率表", type="primary", use_container_width=True, key="market_table_btn"):
+                        with st.spinner("正在生成市场占有率分析..."):
+                            market_share = analyzer.get_cached_report('generate_market_share_analysis')
+                            if market_share:
+                                for name, df in market_share.items():
+                                    st.markdown(f"### {name}")
+                                    render_table(df, cmap='Greens', key=f"market_table_{name}")
 
-            with col2:
-                if st.button("📈 生成市场占有率图", type="primary", use_container_width=True, key="market_charts_btn"):
-                    st.markdown("### 市场占有率图表")
-
-                    # 获取市场占有率分析数据
-                    market_share_data = analyzer.generate_market_share_analysis(verbose=False)
-
-                    # 生成对应的图表
-                    charts = analyzer.generate_market_share_charts()
-
-                    if charts:
-                        # 使用标签页或可折叠区域来组织多个图表
-                        tab_names = list(charts.keys())
-                        if len(tab_names) <= 4:
-                            # 如果图表数量较少，使用标签页
-                            tabs = st.tabs(tab_names)
-                            for i, (chart_name, fig) in enumerate(charts.items()):
-                                with tabs[i]:
-                                    st.pyplot(fig)
-
-                                    # 显示对应的数据表
-                                    if market_share_data and chart_name in market_share_data:
-                                        st.dataframe(
-                                            market_share_data[chart_name].style.background_gradient(cmap='Greens'),
-                                            use_container_width=True
-                                        )
+                with col2:
+                    if st.button("📈 生成市场占有率图", type="primary", use_container_width=True, key="market_charts_btn"):
+                        st.markdown("### 市场占有率图表")
+
+                        # 获取市场占有率分析数据
+                        market_share_data = analyzer.get_cached_report('generate_market_share_analysis', verbose=False)
+
+                        # 生成对应的图表
+                        charts = analyzer.get_cached_report('generate_market_share_charts',
+                                                            backend=analyzer.chart_backends['market_share'])
+
+                        if charts:
+                            # 使用标签页或可折叠区域来组织多个图表
+                            tab_names = list(charts.keys())
+                            if len(tab_names) <= 4:
+                                # 如果图表数量较少，使用标签页
+                                tabs = st.tabs(tab_names)
+                                for i, (chart_name, fig) in enumerate(charts.items()):
+                                    with tabs[i]:
+                                        render_chart(fig)
+
+                                        # 显示对应的数据表
+                                        if market_share_data and chart_name in market_share_data:
+                                            render_table(market_share_data[chart_name], cmap='Greens',
+                                                         key=f"market_chart_table_{chart_name}")
+                            else:
+                                # 如果图表数量较多，使用可折叠区域
+                                for chart_name, fig in charts.items():
+                                    with st.expander(f"📊 {chart_name}", expanded=False):
+                                        render_chart(fig)
+
+                                        # 显示对应的数据表
+                                        if market_share_data and chart_name in market_share_data:
+                                            render_table(market_share_data[chart_name], cmap='Greens',
+                                                         key=f"market_chart_table_{chart_name}")
                         else:
-                            # 如果图表数量较多，使用可折叠区域
-                            for chart_name, fig in charts.items():
-                                with st.expander(f"📊 {chart_name}", expanded=False):
-                                    st.pyplot(fig)
-
-                                    # 显示对应的数据表
-                                    if market_share_data and chart_name in market_share_data:
-                                        st.dataframe(
-                                            market_share_data[chart_name].style.background_gradient(cmap='Greens'),
-                                            use_container_width=True
-                                        )
-                    else:
-                        st.warning("没有生成市场占有率图表")
+                            st.warning("没有生成市场占有率图表")
 
-            with col3:
-                if st.button("💾 导出到Excel", type="primary", use_container_width=True, key="export_market_btn"):
-                    excel_data = analyzer.export_market_share_analysis()
+                with col3:
+                    if st.button("💾 导出到Excel", type="primary", use_container_width=True, key="export_market_btn"):
+                        excel_data = analyzer.export_market_share_analysis()
 
-            # 显示数据概览
-            st.markdown("---")
-            st.subheader("数据概览")
+                # 显示数据概览
+                st.markdown("---")
+                st.subheader("数据概览")
 
-            col1, col2, col3, col4 = st.columns(4)
+                col1, col2, col3, col4 = st.columns(4)
 
-            with col1:
-                st.metric("总飞机数", len(analyzer.filtered_df))
+                with col1:
+                    st.metric("总飞机数", len(analyzer.filtered_df))
 
-            with col2:
-                if 'Airline_Normalized' in analyzer.filtered_df.columns:
-                    st.metric("航司数量", analyzer.filtered_df['Airline_Normalized'].nunique())
+                with col2:
+                    if 'Airline_Normalized' in analyzer.filtered_df.columns:
+                        st.metric("航司数量", analyzer.filtered_df['Airline_Normalized'].nunique())
+
+                with col3:
+                    if 'Manufacturer_Category' in analyzer.filtered_df.columns:
+                        st.metric("制造商数量", analyzer.filtered_df['Manufacturer_Category'].nunique())
+
+                with col4:
+                    if 'Master Series' in analyzer.filtered_df.columns:
+                        st.metric("机型数量", analyzer.filtered_df['Master Series'].nunique())
+
+                # 显示机型列表
+                st.markdown("---")
+                st.subheader("机型列表")
+                model_list_df = analyzer.get_cached_report('generate_model_list')
+                if model_list_df is not None:
+                    st.dataframe(model_list_df, use_container_width=True)
+
+        with tab3:
+            if tabs_open[2]:
+                st.header("交叉筛选")
+                st.caption("在任一维度中选择取值，其它维度的数量和下方表格随之更新（空选表示不限）")
+
+                dimension_labels = {
+                    'Airline_Group': '航司分组',
+                    'Airline_Normalized': '航司',
+                    'Manufacturer_Category': '制造商',
+                    'Aircraft_Class': '机型类别',
+                    'Model_Normalized': '机型',
+                    'Seat_Category': '座位等级',
+                    'Status': '状态'
+                }
+                dimensions = [column for column in dimension_labels if column in analyzer.filtered_df.columns]
+
+                filter_cols = st.columns(3)
+                for i, column in enumerate(dimensions):
+                    options = sorted(analyzer.filtered_df[column].dropna().unique().tolist(), key=str)
+                    # 重新加载数据后去掉已不存在的取值
+                    widget_key = f"cross_filter_{column}"
+                    if widget_key in st.session_state:
+                        st.session_state[widget_key] = [value for value in st.session_state[widget_key]
+                                                        if value in options]
+                    with filter_cols[i % 3]:
+                        st.multiselect(dimension_labels[column], options=options, key=widget_key)
+
+                criteria = {column: st.session_state.get(f"cross_filter_{column}", []) for column in dimensions}
+
+                # 各维度条件位图按位与，直接得到行位置
+                selected_df = analyzer.filter_rows(criteria)
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("飞机数量", len(selected_df))
+                with col2:
+                    airline_column = 'Airline_Normalized' if 'Airline_Normalized' in selected_df.columns else 'Operator'
+                    st.metric("航司数量", selected_df[airline_column].nunique())
+                with col3:
+                    if 'Age' in selected_df.columns and len(selected_df) > 0:
+                        st.metric("平均机龄", f"{selected_df['Age'].mean():.1f} 年")
+
+                # 每个维度在其它维度条件下的数量分布
+                counts = analyzer.cross_filter_counts(criteria, dimensions)
+                count_cols = st.columns(3)
+                for i, column in enumerate(dimensions):
+                    column_counts = counts[column]
+                    column_counts = column_counts[column_counts > 0]
+                    with count_cols[i % 3]:
+                        st.markdown(f"**{dimension_labels[column]}**")
+                        st.dataframe(pd.DataFrame({dimension_labels[column]: column_counts.index,
+                                                   '数量': column_counts.values}),
+                                     hide_index=True, use_container_width=True, height=220)
+
+                if len(selected_df) > 0 and 'Model_Normalized' in selected_df.columns:
+                    st.markdown("### 航司x机型交叉表")
+                    cross_table = pd.crosstab(selected_df[airline_column], selected_df['Model_Normalized'],
+                                              margins=True, margins_name='Total')
+                    cross_table = cross_table.sort_values('Total', ascending=False)
+                    render_table(cross_table, cmap='Purples', key="cross_filter_table")
+
+        with tab4:
+            if tabs_open[3]:
+                st.header("SQL查询")
+                st.caption("数据表名为 aircraft（只支持单条 SELECT 查询），含空格的列名请用双引号，例如 \"Master Series\"")
+
+                default_query = (
+                    'SELECT "Operator State", Status, COUNT(*) AS "数量"\n'
+                    'FROM aircraft\n'
+                    'WHERE "Master Series" ILIKE \'%A320%N%\'\n'
+                    'GROUP BY 1, 2\n'
+                    'ORDER BY 3 DESC'
+                )
+                sql_query = st.text_area("SQL", value=default_query, height=160, key="sql_query_input")
 
-            with col3:
-                if 'Manufacturer_Category' in analyzer.filtered_df.columns:
-                    st.metric("制造商数量", analyzer.filtered_df['Manufacturer_Category'].nunique())
+                if st.button("▶️ 执行查询", type="primary", use_container_width=True, key="run_sql_btn"):
+                    with st.spinner("正在执行查询..."):
+                        query_result = analyzer.run_sql_query(sql_query)
+                        if query_result is not None:
+                            st.dataframe(query_result, use_container_width=True)
 
-            with col4:
-                if 'Master Series' in analyzer.filtered_df.columns:
-                    st.metric("机型数量", analyzer.filtered_df['Master Series'].nunique())
+                with st.expander("📋 可用字段", expanded=False):
+                    st.write(", ".join(f'"{col}"' for col in analyzer.filtered_df.columns))
 
-            # 显示机型列表
-            st.markdown("---")
-            st.subheader("机型列表")
-            model_list_df = analyzer.generate_model_list()
-            if model_list_df is not None:
-                st.dataframe(model_list_df, use_container_width=True)
+        with tab5:
+            if tabs_open[4]:
+                st.header("机队机龄预测")
+                st.caption("假设不引进新飞机，按退役政策推算各航司在目标年份的机队规模、平均机龄和机龄构成")
+
+                base_year = datetime.now().year
+                col1, col2 = st.columns(2)
+                with col1:
+                    year_range = st.slider("预测年份", min_value=base_year, max_value=base_year + 20,
+                                           value=(base_year, base_year + 10), key="projection_years")
+                with col2:
+                    selected_policies = st.multiselect("退役政策", options=list(RETIREMENT_POLICIES),
+                                                       default=list(RETIREMENT_POLICIES), key="projection_policies")
+
+                projection = None
+                if selected_policies:
+                    # 所有年份和政策一次计算，切换下方的政策、年份和航司时直接取结果
+                    projection = analyzer.get_cached_report(
+                        'generate_fleet_projection', tuple(range(year_range[0], year_range[1] + 1)),
+                        tuple(selected_policies), base_year, verbose=False)
+                    if projection is None:
+                        st.warning("⚠️ 数据缺少航司或机型信息，无法推算机队机龄")
+
+                if projection is not None:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        policy = st.selectbox("查看政策", options=selected_policies, key="projection_policy")
+                    with col2:
+                        year = st.selectbox("查看年份", options=projection.years.tolist(), key="projection_year")
+
+                    st.markdown("### 平均机龄")
+                    render_table(projection.average_age(policy).round(1), cmap='YlOrRd', key="projection_average_age")
+
+                    st.markdown("### 在役飞机数量")
+                    render_table(projection.fleet_size(policy), cmap='Blues', key="projection_fleet_size")
+
+                    st.markdown(f"### {year} 年机龄段构成")
+                    render_table(projection.age_group_mix(policy, year), cmap='YlOrRd', key="projection_age_groups")
+
+                    airline = st.selectbox("航司机型x机龄分布", options=projection.airlines.tolist(),
+                                           key="projection_airline")
+                    age_table = projection.age_distribution(airline, policy, year)
+                    if age_table is not None:
+                        render_table(age_table, cmap='YlOrRd', key="projection_age_table")
+                    else:
+                        st.info(f"{airline} 在 {year} 年没有在役飞机")
+
+                st.markdown("---")
+                st.markdown("### 制造商市场占有率模拟")
+                st.caption("退役机龄服从正态分布，退役飞机按座位等级一对一替换，替换份额每次试验随机抽样；"
+                           "结果为各次试验的均值和P10/P90")
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    target_year = st.number_input("目标年份", min_value=base_year, max_value=base_year + 30,
+                                                  value=base_year + 10, step=1, key="simulation_year")
+                    trials = st.selectbox("模拟次数", options=[1000, 5000, 10000, 50000], index=2,
+                                          key="simulation_trials")
+                with col2:
+                    retirement_mean = st.number_input("平均退役机龄（年）", min_value=10.0, max_value=40.0,
+                                                      value=DEFAULT_RETIREMENT_AGE[0], step=1.0,
+                                                      key="simulation_retirement_mean")
+                    retirement_std = st.number_input("退役机龄标准差（年）", min_value=0.5, max_value=10.0,
+                                                     value=DEFAULT_RETIREMENT_AGE[1], step=0.5,
+                                                     key="simulation_retirement_std")
+                with col3:
+                    seed = st.number_input("随机种子", min_value=0, value=0, step=1, key="simulation_seed")
+                    custom_comac = st.checkbox("指定COMAC替换份额", key="simulation_custom_comac")
+                    comac_share = st.slider("COMAC替换份额 (%)", min_value=0, max_value=100, value=30,
+                                            disabled=not custom_comac, key="simulation_comac_share")
+
+                # 按机型设定退役机龄（未修改的机型使用上面的平均退役机龄和标准差）
+                retirement_by_model = ()
+                if 'Model_Normalized' in analyzer.filtered_df.columns:
+                    with st.expander("按机型设置退役机龄"):
+                        models = analyzer.filtered_df['Model_Normalized'].value_counts().index
+                        edited = st.data_editor(
+                            pd.DataFrame({'机型': models, '平均退役机龄（年）': retirement_mean,
+                                          '标准差（年）': retirement_std}),
+                            column_config={
+                                '机型': st.column_config.TextColumn(disabled=True),
+                                '平均退役机龄（年）': st.column_config.NumberColumn(min_value=10.0, max_value=40.0,
+                                                                                step=1.0),
+                                '标准差（年）': st.column_config.NumberColumn(min_value=0.5, max_value=10.0, step=0.5),
+                            },
+                            hide_index=True, use_container_width=True, key="simulation_retirement_by_model")
+                    edited = edited.dropna()
+                    custom = edited[(edited['平均退役机龄（年）'] != retirement_mean) |
+                                    (edited['标准差（年）'] != retirement_std)]
+                    retirement_by_model = tuple((model, (float(mean), float(std)))
+                                                for model, mean, std in custom.itertuples(index=False))
+
+                analyzer.simulation_workers = st.number_input(
+                    "并行进程数", min_value=1, max_value=os.cpu_count() or 1, value=1, step=1,
+                    help="大规模模拟时试验分块在进程池中运行（结果只取决于随机种子，与进程数无关）",
+                    key="simulation_workers")
+
+                if st.button("▶️ 运行模拟", type="primary", use_container_width=True, key="simulation_btn"):
+                    st.session_state.show_simulation = True
+
+                if st.session_state.get('show_simulation'):
+                    with st.spinner("正在模拟..."):
+                        simulation = analyzer.get_cached_report(
+                            'simulate_market_share', int(target_year), trials=trials, seed=int(seed),
+                            retirement_age=(retirement_mean, retirement_std),
+                            retirement_by_model=retirement_by_model,
+                            replacement_manufacturer='COMAC' if custom_comac else None,
+                            replacement_share=comac_share / 100 if custom_comac else None,
+                            base_year=base_year, verbose=False)
+                    if simulation:
+                        for name, table in simulation.items():
+                            st.markdown(f"**{name}**")
+                            render_table(table, cmap='Greens', key=f"simulation_table_{name}")
 
     else:
         # 显示欢迎信息
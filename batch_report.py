@@ -0,0 +1,301 @@
+"""批量生成机队机龄报告
+
+按航司分组（Airline_Group）或单个航司生成报告，内容包括机龄分布图、航司汇总、航司x机型交叉表、
+机型x机龄分布表和市场占有率表。报告为独立的HTML文件（图表以PNG内嵌，可离线打开），
+也可导出PDF（需安装 weasyprint）。
+机龄分布图在进程池中并行渲染；内容相同的图表只渲染一次，并可缓存到磁盘供下次运行复用。
+
+用法:
+    python batch_report.py AircraftDetail221225.xlsx                 # 每个航司分组一份报告
+    python batch_report.py data.xlsx --by airline --select "Air China" "Spring Airlines"
+    python batch_report.py data.xlsx --format pdf --output reports --chart-cache .chart_cache
+"""
+import argparse
+import base64
+import datetime
+import hashlib
+import html
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from app import ChinaAircraftAnalysisTool
+
+REPORT_CSS = """
+body { font-family: 'Helvetica Neue', Arial, 'PingFang SC', 'Microsoft YaHei', sans-serif; margin: 24px; color: #222; }
+h1 { color: #1f4e79; }
+h2 { border-bottom: 2px solid #1f4e79; padding-bottom: 4px; margin-top: 32px; }
+.meta { color: #666; }
+.table-wrap { overflow-x: auto; margin-bottom: 16px; }
+table.data { border-collapse: collapse; font-size: 12px; }
+table.data th, table.data td { border: 1px solid #ccc; padding: 3px 6px; text-align: right; }
+table.data th { background: #eef3f8; }
+img.chart { max-width: 800px; width: 100%; }
+.airline { page-break-inside: avoid; }
+"""
+
+
+def render_age_chart_png(title, labels, values, dpi=80):
+    """渲染机龄分布图为PNG字节串（在工作进程中运行，同一进程内复用图表模板）"""
+    from app import AGE_GROUP_COLORS
+    from chart_templates import render_age_bars
+
+    return render_age_bars(labels, values, title, AGE_GROUP_COLORS[:len(values)], dpi=dpi)
+
+
+def chart_key(spec):
+    """图表内容哈希：标题和数据相同的图表共用同一张图片"""
+    return hashlib.sha1(json.dumps(spec, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ChartRenderer:
+    """并行渲染图表，按内容哈希缓存（进程内 + 可选磁盘目录）"""
+
+    def __init__(self, workers=None, cache_dir=None, parallel_threshold=8):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        # 待渲染图表较少时直接在当前进程渲染，省去启动进程池的开销
+        self.parallel_threshold = parallel_threshold
+        self._cache = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def _read_disk_cache(self, key):
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, f'{key}.png')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        return None
+
+    def _write_disk_cache(self, key, png):
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, f'{key}.png'), 'wb') as f:
+                f.write(png)
+
+    def render(self, specs):
+        """渲染 [(标题, 标签, 数值)]，返回 {内容哈希: PNG字节串}"""
+        pending = {}
+        for spec in specs:
+            key = chart_key(spec)
+            if key in self._cache or key in pending:
+                self.reused += 1
+                continue
+            png = self._read_disk_cache(key)
+            if png is not None:
+                self._cache[key] = png
+                self.reused += 1
+            else:
+                pending[key] = spec
+
+        if pending:
+            keys = list(pending)
+            if len(keys) >= self.parallel_threshold and self.workers > 1:
+                # 使用 spawn 启动子进程，避免在多线程的 Streamlit 服务进程中 fork
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(keys)), mp_context=context) as executor:
+                    chunksize = max(1, len(keys) // (self.workers * 4))
+                    images = list(executor.map(render_age_chart_png, *zip(*[pending[key] for key in keys]),
+                                               chunksize=chunksize))
+            else:
+                images = [render_age_chart_png(*pending[key]) for key in keys]
+
+            for key, png in zip(keys, images):
+                self._cache[key] = png
+                self._write_disk_cache(key, png)
+            self.rendered += len(keys)
+
+        return {chart_key(spec): self._cache[chart_key(spec)] for spec in specs}
+
+
+def report_units(analyzer, by='group', select=None):
+    """确定报告单元，返回 {报告名称: [航司]}，航司按机队规模降序"""
+    df = analyzer.filtered_df
+    airline_column = 'Airline_Normalized' if 'Airline_Normalized' in df.columns else 'Operator'
+    fleet_sizes = df[airline_column].value_counts()
+
+    if by == 'group' and 'Airline_Group' in df.columns:
+        groups = df.groupby('Airline_Group', sort=False)[airline_column].unique()
+        units = {group: sorted(airlines, key=lambda airline: -fleet_sizes[airline])
+                 for group, airlines in groups.items()}
+        # 机队规模大的分组排在前面
+        units = dict(sorted(units.items(), key=lambda item: -fleet_sizes[item[1]].sum()))
+    else:
+        units = {airline: [airline] for airline in fleet_sizes.index}
+
+    if select:
+        selected = set(select)
+        units = {name: airlines for name, airlines in units.items() if name in selected}
+    return units
+
+
+def collect_report(analyzer, title, airlines):
+    """计算一份报告所需的表格和图表数据"""
+    subset = analyzer.subset_for_airlines(airlines)
+    df = subset.filtered_df
+    airline_column = 'Airline_Normalized' if 'Airline_Normalized' in df.columns else 'Operator'
+
+    # 航司汇总：机队规模、平均机龄、机型数量
+    grouped = df.groupby(airline_column)
+    summary = pd.DataFrame({
+        '飞机数量': grouped.size(),
+        '平均机龄': grouped['Age'].mean().round(1) if 'Age' in df.columns else None,
+        '机型数量': grouped['Master Series'].nunique() if 'Master Series' in df.columns else None,
+    }).sort_values('飞机数量', ascending=False)
+    summary.index.name = '航司'
+
+    airline_sections = []
+    for airline in summary.index:
+        age_groups = analyzer._airline_age_groups(airline)
+        chart_spec = None
+        if age_groups is not None:
+            chart_spec = (f'{airline} - Age Distribution',
+                          age_groups.index.astype(str).tolist(),
+                          [int(value) for value in age_groups.values])
+        # 机型x机龄分布表与页面共用原数据集上的报表缓存
+        age_table = analyzer._cached_report('generate_airline_age_distribution', airline, verbose=False)
+        airline_sections.append((airline, chart_spec, age_table))
+
+    return {
+        'title': title,
+        'aircraft': len(df),
+        'summary': summary,
+        'airline_model': subset.generate_airline_model_table(verbose=False) if len(airlines) > 1 else None,
+        'market_share': subset.generate_market_share_analysis(verbose=False) or {},
+        'airlines': airline_sections,
+    }
+
+
+def _table_html(df):
+    if df is None or len(df) == 0:
+        return '<p class="meta">无数据</p>'
+    table = df.to_html(classes='data', border=0, na_rep='', float_format=lambda value: f'{value:.1f}')
+    return f'<div class="table-wrap">{table}</div>'
+
+
+def render_html(report, charts, status_filter=None, generated_at=None):
+    """生成独立的HTML报告（图表以base64内嵌）"""
+    generated_at = generated_at or datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    title = html.escape(str(report['title']))
+    parts = [
+        '<!DOCTYPE html>',
+        '<html lang="zh-CN"><head><meta charset="utf-8">',
+        f'<title>{title} - 机队机龄报告</title>',
+        f'<style>{REPORT_CSS}</style></head><body>',
+        f'<h1>{title} - 中国窄体机机队机龄报告</h1>',
+        f'<p class="meta">生成时间: {generated_at} ｜ 状态筛选: {html.escape(str(status_filter or "All Status"))} ｜ '
+        f'飞机数量: {report["aircraft"]} ｜ 航司数量: {len(report["summary"])}</p>',
+        '<h2>航司汇总</h2>',
+        _table_html(report['summary']),
+    ]
+
+    if report['airline_model'] is not None:
+        parts += ['<h2>航司x机型交叉表</h2>', _table_html(report['airline_model'])]
+
+    parts.append('<h2>航司机龄分布</h2>')
+    for airline, chart_spec, age_table in report['airlines']:
+        parts.append(f'<div class="airline"><h3>{html.escape(str(airline))}</h3>')
+        if chart_spec is not None:
+            png = base64.b64encode(charts[chart_key(chart_spec)]).decode('ascii')
+            parts.append(f'<img class="chart" alt="{html.escape(chart_spec[0])}" src="data:image/png;base64,{png}">')
+        parts.append(_table_html(age_table))
+        parts.append('</div>')
+
+    if report['market_share']:
+        parts.append('<h2>市场占有率分析</h2>')
+        for name, table in report['market_share'].items():
+            parts += [f'<h3>{html.escape(str(name))}</h3>', _table_html(table)]
+
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+
+def write_report(html_text, path, fmt='html'):
+    """写出HTML或PDF文件"""
+    if fmt == 'pdf':
+        try:
+            from weasyprint import HTML
+        except ImportError:
+            raise RuntimeError("导出PDF需要安装 weasyprint: pip install weasyprint")
+        HTML(string=html_text).write_pdf(path)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html_text)
+
+
+def safe_filename(name):
+    """报告名称转为文件名"""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', str(name)).strip('_') or 'report'
+
+
+def build_reports(analyzer, units, renderer=None):
+    """计算所有报告并统一渲染图表，返回 [(报告数据, HTML)]"""
+    renderer = renderer or ChartRenderer()
+    reports = [collect_report(analyzer, title, airlines) for title, airlines in units.items()]
+
+    # 所有报告的图表一次性提交到进程池，重复的图表只渲染一次
+    specs = [chart_spec for report in reports for _, chart_spec, _ in report['airlines'] if chart_spec is not None]
+    charts = renderer.render(specs)
+
+    generated_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    return [(report, render_html(report, charts, analyzer.status_filter, generated_at)) for report in reports]
+
+
+def generate_reports(analyzer, by='group', select=None, output_dir='reports', fmt='html',
+                     workers=None, cache_dir=None):
+    """按航司分组或航司批量生成报告文件，返回写出的文件路径列表"""
+    units = report_units(analyzer, by, select)
+    renderer = ChartRenderer(workers=workers, cache_dir=cache_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for report, html_text in build_reports(analyzer, units, renderer):
+        path = os.path.join(output_dir, f"{safe_filename(report['title'])}.{fmt}")
+        write_report(html_text, path, fmt)
+        paths.append(path)
+    return paths, renderer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量生成机队机龄报告')
+    parser.add_argument('files', nargs='+', help='飞机数据Excel文件')
+    parser.add_argument('--status', default='All Status', choices=['All Status', 'In Service', 'Storage'],
+                        help='状态筛选')
+    parser.add_argument('--by', default='group', choices=['group', 'airline'],
+                        help='每个航司分组（group）或每个航司（airline）生成一份报告')
+    parser.add_argument('--select', nargs='+', help='只生成指定分组/航司的报告')
+    parser.add_argument('--format', default='html', choices=['html', 'pdf'], help='报告格式')
+    parser.add_argument('--output', default='reports', help='输出目录')
+    parser.add_argument('--workers', type=int, help='图表渲染进程数（默认按CPU核数）')
+    parser.add_argument('--chart-cache', help='图表磁盘缓存目录（跨运行复用相同图表）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    # 加载过程（阶段耗时、行数和警告）写入日志
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    analyzer = ChinaAircraftAnalysisTool()
+    if not analyzer.load_and_filter_data(args.files, args.status):
+        raise SystemExit('数据加载失败')
+    loaded = time.perf_counter()
+
+    try:
+        paths, renderer = generate_reports(analyzer, args.by, args.select, args.output, args.format,
+                                           args.workers, args.chart_cache)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+
+    print(f"已加载 {len(analyzer.filtered_df)} 架飞机 ({loaded - start:.1f} s)")
+    print(f"已生成 {len(paths)} 份报告到 {args.output}/ ({time.perf_counter() - loaded:.1f} s)，"
+          f"图表渲染 {renderer.rendered} 张，复用 {renderer.reused} 张")
+
+
+if __name__ == '__main__':
+    main()
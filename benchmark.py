@@ -0,0 +1,201 @@
+"""性能基准测试工具
+
+用法:
+    python benchmark.py                     # 运行全部基准测试
+    python benchmark.py --only import       # 只测量启动导入耗时
+    python benchmark.py --only engines --aircraft 500000
+    python benchmark.py --only charts --charts 50
+    python benchmark.py --import-budget-ms 200
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# app.py 自身的导入耗时预算（不含 streamlit/pandas/numpy 的基础导入）
+IMPORT_BUDGET_MS = 150
+
+# 导入 app 时不应额外加载的绘图/查询库
+DEFERRED_MODULES = ['matplotlib', 'seaborn', 'plotly', 'duckdb', 'pyarrow.parquet', 'pyarrow.csv', 'polars']
+
+# 计算引擎基准测试的合成机队规模
+ENGINE_AIRCRAFT = 200000
+
+# 图表模板基准测试每轮生成的图表数量（批量报告的机龄分布图）
+CHART_COUNT = 20
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit, pandas, numpy
+base = time.perf_counter()
+already_loaded = set(sys.modules)
+import app
+end = time.perf_counter()
+print(json.dumps({
+    'base_ms': (base - start) * 1000,
+    'app_ms': (end - base) * 1000,
+    'loaded': [name for name in %r if name in sys.modules and name not in already_loaded],
+}))
+"""
+
+
+def measure_import_time(runs=5):
+    """在独立进程中冷启动导入 app，返回各次测量结果"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _IMPORT_PROBE % DEFERRED_MODULES],
+            cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def bench_import(args):
+    """启动导入耗时与预算检查"""
+    results = measure_import_time(args.runs)
+    app_ms = statistics.median(r['app_ms'] for r in results)
+    base_ms = statistics.median(r['base_ms'] for r in results)
+    loaded = sorted({name for r in results for name in r['loaded']})
+
+    print(f"import streamlit/pandas/numpy:  {base_ms:8.1f} ms (median of {args.runs})")
+    print(f"import app:                     {app_ms:8.1f} ms (budget {args.import_budget_ms} ms)")
+    print(f"deferred modules loaded by app: {', '.join(loaded) if loaded else 'none'}")
+
+    ok = app_ms <= args.import_budget_ms and not loaded
+    print("import budget:                  " + ("OK" if ok else "EXCEEDED"))
+    return ok
+
+
+def _run_engine(tool, engine, raw_df):
+    """用指定引擎完成清洗、增强和市场占有率汇总，返回 (各步骤耗时, 增强数据, 市场占有率表)"""
+    from dataset import DatasetSnapshot
+
+    tool.dataframe_engine = engine
+    timings = {}
+    start = time.perf_counter()
+    cleaned = tool._engine().clean(raw_df, verbose=False)
+    base = tool._select_passenger_aircraft(cleaned)
+    timings['clean'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    enhanced = tool._engine().enhance(base, verbose=False)
+    timings['enhance'] = time.perf_counter() - start
+
+    # 市场占有率在快照上计算（行号索引预先构建，与页面一致）
+    snapshot = DatasetSnapshot(enhanced, tool._compute_fingerprint(enhanced))
+    view = tool.for_snapshot(snapshot)
+    view._row_lookup(snapshot)
+    start = time.perf_counter()
+    market_share = view.generate_market_share_analysis(verbose=False)
+    timings['market_share'] = time.perf_counter() - start
+    return timings, enhanced, market_share
+
+
+def bench_engines(args):
+    """pandas 与 Polars 引擎的耗时对比和结果等价性检查（合成机队数据）"""
+    import pandas as pd
+
+    from app import ChinaAircraftAnalysisTool
+    from engines import available_engines
+    from load_test import make_synthetic_fleet
+
+    if 'polars' not in available_engines():
+        print("polars not installed: skipped")
+        return True
+
+    raw_df = make_synthetic_fleet(args.aircraft)
+    tool = ChinaAircraftAnalysisTool()
+    results = {}
+    for engine in ('pandas', 'polars'):
+        runs = [_run_engine(tool, engine, raw_df) for _ in range(args.runs)]
+        timings = {step: statistics.median(run[0][step] for run in runs) for step in runs[0][0]}
+        results[engine] = (timings, runs[-1][1], runs[-1][2])
+        print(f"{engine:8s} " + "  ".join(f"{step} {seconds * 1000:8.1f} ms" for step, seconds in timings.items())
+              + f"  ({len(raw_df)} rows, median of {args.runs})")
+
+    # 两种引擎的增强数据和市场占有率表必须完全相同
+    _, pandas_df, pandas_share = results['pandas']
+    _, polars_df, polars_share = results['polars']
+    try:
+        pd.testing.assert_frame_equal(pandas_df, polars_df)
+        assert list(pandas_share) == list(polars_share)
+        for name in pandas_share:
+            pd.testing.assert_frame_equal(pandas_share[name], polars_share[name])
+    except AssertionError as e:
+        print(f"equivalence:    FAILED\n{e}")
+        return False
+
+    speedup = sum(results['pandas'][0].values()) / sum(results['polars'][0].values())
+    print(f"equivalence:    OK (speedup {speedup:.1f}x)")
+    return True
+
+
+def _render_charts(count, templates):
+    """按批量报告的方式生成 count 张机龄分布图（PNG），templates 为 False 时每张图新建 Figure"""
+    from io import BytesIO
+
+    from app import AGE_GROUP_LABELS, plot_age_distribution
+    from batch_report import render_age_chart_png
+    from chart_templates import get_pyplot
+
+    plt = get_pyplot()
+    start = time.perf_counter()
+    for index in range(count):
+        title, values = f'Airline {index} - Age Distribution', [70 + index, 49, 47, 62, 96]
+        if templates:
+            render_age_chart_png(title, AGE_GROUP_LABELS, values)
+        else:
+            fig = plot_age_distribution(AGE_GROUP_LABELS, values, title)
+            fig.savefig(BytesIO(), format='png', dpi=80)
+            plt.close(fig)
+    return time.perf_counter() - start
+
+
+def bench_charts(args):
+    """批量报告的机龄分布图: 每张图新建 Figure 与复用图表模板的耗时对比"""
+    _render_charts(1, templates=True)  # 预热: 导入 matplotlib、加载字体、创建模板
+    _render_charts(1, templates=False)
+    cold = statistics.median(_render_charts(args.charts, templates=False) for _ in range(args.runs))
+    warm = statistics.median(_render_charts(args.charts, templates=True) for _ in range(args.runs))
+    print(f"new figure:     {cold * 1000 / args.charts:8.1f} ms/chart")
+    print(f"templates:      {warm * 1000 / args.charts:8.1f} ms/chart  (speedup {cold / warm:.1f}x, "
+          f"{args.charts} charts at 80 dpi, median of {args.runs})")
+    return True
+
+
+BENCHMARKS = {
+    'import': bench_import,
+    'engines': bench_engines,
+    'charts': bench_charts,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append',
+                        help='只运行指定的基准测试（可重复）')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS,
+                        help='app.py 导入耗时预算（毫秒）')
+    parser.add_argument('--aircraft', type=int, default=ENGINE_AIRCRAFT, help='计算引擎基准测试的飞机数量')
+    parser.add_argument('--charts', type=int, default=CHART_COUNT, help='图表模板基准测试每轮的图表数量')
+    args = parser.parse_args()
+
+    all_ok = True
+    for name in args.only or BENCHMARKS:
+        print(f"== {name} ==")
+        all_ok = BENCHMARKS[name](args) and all_ok
+        print()
+
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
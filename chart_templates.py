@@ -0,0 +1,129 @@
+"""matplotlib 静态图表模板
+
+批量报告按航司分组或航司生成大量同类的机龄分布图（PNG）。图表模板保留已完成布局的 Figure，
+每张图只更新数据相关的元素（柱高、颜色、数值标签、刻度和标题）后编码为 PNG，省去每张图创建 Figure、
+坐标轴和 tight_layout 的开销；内容超出布局时预留的范围（更大的数量、更长的刻度标签）时重新计算布局。
+
+模板放在池中按需取用（每个模板同一时间只由一个线程使用）。页面上的图表仍然每次生成新的 Figure。
+"""
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+
+# 模板首次布局时预留的内容（纵轴刻度按该数值、横轴刻度按该长度的标签预留空间）
+_LAYOUT_SAMPLE_HEIGHT = 1000
+_LAYOUT_SAMPLE_LABEL = '00-00'
+
+_pyplot = None
+_template_pool = {}
+_pool_lock = threading.Lock()
+
+
+def get_pyplot():
+    """按需导入matplotlib并设置图表样式，返回 pyplot 模块（首次生成静态图表时才导入，加快应用启动）"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        # 设置图表样式（与 seaborn whitegrid 一致）
+        plt.style.use('seaborn-v0_8-whitegrid')
+        plt.rcParams['patch.edgecolor'] = 'white'
+        plt.rcParams['patch.force_edgecolor'] = True
+
+        # 设置图表字体为英文，避免中文字符问题
+        plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Helvetica', 'sans-serif']
+        plt.rcParams['axes.unicode_minus'] = False
+        plt.rcParams['figure.figsize'] = (14, 9)  # 增加图表尺寸
+        plt.rcParams['axes.titlesize'] = 16
+        plt.rcParams['axes.labelsize'] = 14
+        plt.rcParams['xtick.labelsize'] = 12
+        plt.rcParams['ytick.labelsize'] = 12
+        plt.rcParams['legend.fontsize'] = 12
+        _pyplot = plt
+    return _pyplot
+
+
+def _new_figure(figsize):
+    """创建不由 pyplot 管理的 Figure（不需要 plt.close，可在任意线程中使用）"""
+    get_pyplot()
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+@contextmanager
+def _template(key, build):
+    """从池中取出模板（没有空闲的模板时新建），用完放回"""
+    with _pool_lock:
+        pool = _template_pool.setdefault(key, [])
+        template = pool.pop() if pool else None
+    if template is None:
+        template = build()
+    try:
+        yield template
+    finally:
+        with _pool_lock:
+            _template_pool[key].append(template)
+
+
+def clear_templates():
+    """丢弃所有模板（下次生成图表时重新创建）"""
+    with _pool_lock:
+        _template_pool.clear()
+
+
+class AgeBarTemplate:
+    """机龄分布柱状图模板（与页面的 plot_age_distribution 相同的样式）: 固定数量的柱子和数值标签"""
+
+    def __init__(self, n_bars):
+        self.fig = _new_figure((12, 8))
+        self.ax = self.fig.subplots()
+        positions = np.arange(n_bars)
+        self.bars = self.ax.bar(positions, np.full(n_bars, _LAYOUT_SAMPLE_HEIGHT))
+        self.ax.set_xticks(positions, [_LAYOUT_SAMPLE_LABEL] * n_bars)
+        self.ax.set_xlabel('Age (years)', fontsize=14)
+        self.ax.set_ylabel('Number of Aircraft', fontsize=14)
+        self.title = self.ax.set_title(' ', fontsize=18, fontweight='bold')
+        self.value_labels = [self.ax.text(position, 0, '', ha='center', va='bottom', fontsize=12)
+                             for position in positions]
+        self.fig.tight_layout()
+        # 当前布局可容纳的最大数值和最长的刻度标签
+        self.layout_height = _LAYOUT_SAMPLE_HEIGHT
+        self.layout_label_length = len(_LAYOUT_SAMPLE_LABEL)
+
+    def render(self, labels, values, title, colors, dpi):
+        for bar, value, color, value_label in zip(self.bars, values, colors, self.value_labels):
+            bar.set_height(value)
+            bar.set_facecolor(color)
+            # 添加数值标签
+            value_label.set_position((bar.get_x() + bar.get_width() / 2., value + 0.5))
+            value_label.set_text(f'{int(value)}')
+        self.ax.set_xticks(np.arange(len(labels)), labels)
+        self.title.set_text(title)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+        # 刻度标签可能比布局时更宽时按新的内容重新计算布局（与每张图新建 Figure 的布局相同）
+        height = max(values, default=0)
+        label_length = max((len(str(label)) for label in labels), default=0)
+        if height > self.layout_height or label_length > self.layout_label_length:
+            self.fig.tight_layout()
+            self.layout_height = max(self.layout_height, height)
+            self.layout_label_length = max(self.layout_label_length, label_length)
+
+        buffer = BytesIO()
+        self.fig.savefig(buffer, format='png', dpi=dpi)
+        return buffer.getvalue()
+
+
+def render_age_bars(labels, values, title, colors, dpi=80):
+    """机龄分布柱状图，返回 PNG 字节串"""
+    with _template(('age', len(values)), lambda: AgeBarTemplate(len(values))) as template:
+        return template.render(labels, values, title, colors, dpi)
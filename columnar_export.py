@@ -0,0 +1,97 @@
+"""列式格式导出（Parquet / Arrow IPC / zstd压缩CSV）
+
+把增强后的飞机数据和所有报表表格打包为一个zip文件，各表以 pyarrow 直接写入zip条目，
+不经过 openpyxl，也不生成中间文件。各格式本身已压缩，zip 只做归档（不再压缩）。
+"""
+import re
+import zipfile
+
+import pandas as pd
+
+# 格式 -> (显示名称, 文件扩展名)
+COLUMNAR_FORMATS = {
+    'parquet': ('Parquet (zstd)', '.parquet'),
+    'arrow': ('Arrow IPC (zstd)', '.arrow'),
+    'csv.zst': ('CSV (zstd)', '.csv.zst'),
+}
+
+
+def export_tables(analyzer):
+    """收集要导出的表格: {表名: DataFrame}，报表结果与页面共用缓存"""
+    df = analyzer.filtered_df
+    # 行索引只是内部行号，不导出
+    tables = {'aircraft': df.reset_index(drop=True)}
+
+    airline_model = analyzer._cached_report('generate_airline_model_table', verbose=False)
+    if airline_model is not None:
+        tables['airline_model'] = airline_model
+
+    market_share = analyzer._cached_report('generate_market_share_analysis', verbose=False) or {}
+    for name, table in market_share.items():
+        tables[f'market_share_{name}'] = table
+
+    model_list = analyzer._cached_report('generate_model_list', verbose=False)
+    if model_list is not None:
+        tables['model_list'] = model_list
+
+    # 各航司机型x机龄分布：长表（航司, 机型, 机龄, 数量）一次分组得到，便于入库
+    if {'Airline_Normalized', 'Model_Normalized'} <= set(df.columns) and len(df) > 0:
+        age_integer = df['Age'].fillna(0).astype(int) if 'Age' in df.columns else 0
+        tables['airline_age_distribution'] = (
+            df.assign(Age_Integer=age_integer)
+            .groupby(['Airline_Normalized', 'Model_Normalized', 'Age_Integer'])
+            .size()
+            .rename('Count')
+            .reset_index()
+        )
+    return tables
+
+
+def _to_arrow(df):
+    """DataFrame 转为 Arrow 表：有意义的索引转为列，列名转为字符串，混合类型的列转为字符串"""
+    import pyarrow as pa
+
+    if not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index()
+    df = df.rename(columns=str)
+
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed')]
+    if mixed:
+        df = df.assign(**{column: df[column].astype('string') for column in mixed})
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_table(table, handle, fmt):
+    """把一个 Arrow 表写入已打开的文件对象"""
+    import pyarrow as pa
+
+    sink = pa.PythonFile(handle, mode='w')
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression='zstd')
+    elif fmt == 'arrow':
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    elif fmt == 'csv.zst':
+        import pyarrow.csv as pa_csv
+        with pa.CompressedOutputStream(sink, 'zstd') as stream:
+            pa_csv.write_csv(table, stream)
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def safe_table_name(name):
+    """表名转为文件名"""
+    return re.sub(r'[\\/:*?"<>|\s()%]+', '_', str(name)).strip('_') or 'table'
+
+
+def write_bundle(tables, fmt, output):
+    """把所有表格按指定格式写入zip归档（output 为文件路径或可写缓冲区）"""
+    extension = COLUMNAR_FORMATS[fmt][1]
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as bundle:
+        for name, df in tables.items():
+            with bundle.open(f'{safe_table_name(name)}{extension}', 'w', force_zip64=True) as handle:
+                _write_table(_to_arrow(df), handle, fmt)
+    return output
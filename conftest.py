@@ -0,0 +1,21 @@
+"""测试共用的数据: 按参考数据生成的合成机队（见 load_test.make_synthetic_fleet）"""
+from io import BytesIO
+
+import pytest
+
+from app import ChinaAircraftAnalysisTool
+from load_test import fleet_to_xlsx, make_synthetic_fleet
+
+
+@pytest.fixture(scope='session')
+def fleet_xlsx():
+    """合成机队的Excel字节串"""
+    return fleet_to_xlsx(make_synthetic_fleet(3000, seed=1))
+
+
+@pytest.fixture
+def analyzer(fleet_xlsx):
+    """已加载合成机队的分析工具"""
+    tool = ChinaAircraftAnalysisTool()
+    assert tool.load_and_filter_data(BytesIO(fleet_xlsx), verbose=False)
+    return tool
@@ -0,0 +1,42 @@
+"""不可变的数据集快照
+
+加载数据、切换区域/机型范围/状态时不修改已有数据，而是生成新的快照并整体替换当前快照。
+报表按快照计算、按快照标识（内容指纹）缓存；后台线程或进程池拿到的快照在计算期间不会变化。
+快照中的数据表不可修改，需要修改时先复制。
+"""
+import itertools
+import threading
+
+_versions = itertools.count(1)
+
+
+class DatasetSnapshot:
+    """一个数据集版本: 当前视图的数据表、视图参数、内容指纹，以及按需构建的派生结构（索引、目录等）"""
+
+    __slots__ = ('version', 'snapshot_id', 'frame', 'region', 'aircraft_scope', 'status_filter',
+                 '_derived', '_lock')
+
+    def __init__(self, frame, snapshot_id, region=None, aircraft_scope=None, status_filter=None):
+        for name, value in (('version', next(_versions)), ('snapshot_id', snapshot_id), ('frame', frame),
+                            ('region', region), ('aircraft_scope', aircraft_scope),
+                            ('status_filter', status_filter), ('_derived', {}), ('_lock', threading.Lock())):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("数据集快照不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("数据集快照不可修改")
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __repr__(self):
+        return f"DatasetSnapshot(version={self.version}, id={str(self.snapshot_id)[:12]}, rows={len(self.frame)})"
+
+    def derived(self, name, build):
+        """取派生结构，首次使用时由 build(snapshot) 构建；每个快照只构建一次（线程安全）"""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
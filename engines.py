@@ -0,0 +1,254 @@
+"""数据处理引擎
+
+加载流程的清洗和增强阶段、市场占有率汇总可以由不同的引擎执行（分析工具的 dataframe_engine 设置）:
+- 'pandas': 默认引擎，即分析工具中的 pandas 实现；
+- 'polars': Polars 惰性查询，多线程执行，只投影需要的列。文本列先编码为整数（pd.factorize），
+  查询中的解析、去重、分组和计数都在编码上完成；关键字匹配等业务规则仍由分析工具定义，
+  每组不同的取值只调用一次，再按编码映射回所有行，没有逐行的 Python 回调。
+
+两种引擎的输出相同（都是 pandas 数据表，行索引、列顺序和数据类型一致），页面、报表和导出不受影响；
+等价性测试见 test_engines.py（含各类不规整的输入），benchmark.py 的 engines 基准测试也会核对结果。
+Polars 为可选依赖，只在选择该引擎时导入。
+"""
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# 引擎名称 -> 显示名称
+DATAFRAME_ENGINES = {
+    'pandas': 'pandas',
+    'polars': 'Polars (惰性查询)',
+}
+
+# 与市场占有率分析相同的座位等级
+SEAT_CATEGORIES = ['Under 100 seats', '100-150 seats', 'Over 150 seats']
+
+# 增强阶段按这些列的取值组合映射（制造商、座位数、航司等只取决于这些列）
+ENHANCE_KEY_COLUMNS = ['Manufacturer', 'Master Series', 'Operator']
+
+
+def available_engines():
+    """当前环境可用的引擎"""
+    return [name for name in DATAFRAME_ENGINES
+            if name == 'pandas' or importlib.util.find_spec(name) is not None]
+
+
+def create_engine(name, tool):
+    """创建分析工具使用的引擎"""
+    if name not in DATAFRAME_ENGINES:
+        raise ValueError(f"未知的计算引擎: {name}")
+    return PolarsEngine(tool) if name == 'polars' else PandasEngine(tool)
+
+
+class PandasEngine:
+    """默认引擎: 分析工具中的 pandas 实现"""
+
+    name = 'pandas'
+
+    def __init__(self, tool):
+        self.tool = tool
+
+    def clean(self, df, verbose=True):
+        return self.tool._clean_data(df, verbose=verbose)
+
+    def enhance(self, df, verbose=True):
+        return self.tool._enhance_data(df, verbose=verbose)
+
+    def market_share_tables(self, df):
+        return self.tool._market_share_tables(df)
+
+
+def _codes(series):
+    """文本列编码为整数（缺失值为 -1），返回 (编码, 不同取值)"""
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), uniques
+
+
+class PolarsEngine:
+    """Polars 惰性查询引擎"""
+
+    name = 'polars'
+
+    def __init__(self, tool):
+        import polars
+
+        self.pl = polars
+        self.tool = tool
+
+    def clean(self, df, verbose=True):
+        """数据清洗（与 pandas 实现的规则和提示相同），返回清洗后的新数据表"""
+        pl, events = self.pl, self.tool.events
+        age_column = self.tool._find_age_column(df)
+
+        columns = {'_row': np.arange(len(df), dtype=np.int64)}
+        if age_column:
+            # 机龄按 pd.to_numeric 解析（与 pandas 实现的规则相同，如文本首尾的空白、科学计数法），无法解析的为空
+            ages = pd.to_numeric(df[age_column], errors='coerce')
+            columns['Age'] = ages.to_numpy(dtype=float, na_value=np.nan)
+        if 'Registration' in df.columns:
+            columns['Registration'] = _codes(df['Registration'])[0]
+        query = pl.from_pandas(pd.DataFrame(columns)).lazy()
+
+        # 机龄统计和去重后的行一起计算
+        plans = [query.select(valid=pl.col('Age').is_not_null().sum(), abnormal=(pl.col('Age') > 50).sum())] \
+            if age_column else []
+        if 'Registration' in df.columns:
+            query = query.unique(subset=['Registration'], keep='first', maintain_order=True)
+        plans.append(query.select('_row'))
+        results = pl.collect_all(plans)
+        kept = results[-1]
+
+        if age_column:
+            valid, abnormal = results[0].row(0)
+            if verbose:
+                events.message(f"📝 使用列 '{age_column}' 作为年龄列")
+                events.message(f"  • 有效机龄数据: {valid} 行")
+                if abnormal:
+                    events.message(f"⚠️ 发现 {abnormal} 个异常机龄值 (>50年)", 'warning', stage='clean',
+                                   count=int(abnormal))
+        elif verbose:
+            events.message("⚠️ 未找到年龄列，将创建空Age列", 'warning')
+
+        rows = kept['_row'].to_numpy()
+        cleaned = df.take(rows)
+        if age_column:
+            # 与 pandas 实现的类型相同: 有异常机龄时转为浮点数并置空，否则保留解析结果的类型
+            ages = ages.take(rows)
+            if abnormal:
+                ages = ages.astype(float).mask(ages > 50)
+            cleaned['Age'] = ages.to_numpy()
+        else:
+            cleaned['Age'] = np.nan
+        # 没有数据行时状态列保持原样（与 pandas 实现的 apply 相同）
+        if 'Status' in df.columns and len(cleaned):
+            codes, uniques = _codes(df['Status'].take(rows))
+            cleaned['Status'] = pd.Series(self._normalize_status(uniques).take(codes), index=cleaned.index)
+
+        if 'Registration' in df.columns and len(df) > len(cleaned) and verbose:
+            events.message(f"  • 移除 {len(df) - len(cleaned)} 个重复记录")
+        return cleaned
+
+    def _normalize_status(self, uniques):
+        """标准化状态名称（与 pandas 实现相同的规则），返回与 uniques 对应的数组，最后一个元素对应缺失值"""
+        pl = self.pl
+        text = pl.Series('Status', [str(value).strip() for value in uniques], dtype=pl.String)
+        lower = text.str.to_lowercase()
+        normalized = pl.select(
+            pl.when(text.is_in(['In Service', 'Storage', 'Unknown'])).then(text)
+            .when(lower.str.contains('service', literal=True)).then(pl.lit('In Service'))
+            .when(lower.str.contains('storage', literal=True)).then(pl.lit('Storage'))
+            .otherwise(text)
+        ).to_series()
+        return np.array(normalized.to_list() + ['Unknown'], dtype=object)
+
+    def enhance(self, df, verbose=True):
+        """数据增强（与 pandas 实现的结果相同），返回增强后的新数据表"""
+        pl, tool = self.pl, self.tool
+        if verbose:
+            tool.events.message("🔧 增强数据...")
+        if df is None or len(df) == 0:
+            return df
+
+        # 按 (制造商, 机型, 航司) 的编码分组，每组取值只做一次关键字匹配
+        key_columns = [column for column in ENHANCE_KEY_COLUMNS if column in df.columns]
+        encoded = {column: _codes(df[column]) for column in key_columns}
+        columns = {f'_{position}': encoded[column][0] for position, column in enumerate(key_columns)}
+        columns['_row'] = np.arange(len(df), dtype=np.int64)
+        query = pl.from_pandas(pd.DataFrame(columns)).lazy()
+        code_columns = [f'_{position}' for position in range(len(key_columns))]
+
+        age_category = None
+        plans = []
+        if code_columns:
+            groups = query.select(code_columns).unique(maintain_order=True).with_row_index('_group')
+            plans += [groups, query.join(groups, on=code_columns, how='left').sort('_row').select('_group')]
+        if 'Age' in df.columns:
+            age = pl.col('Age')
+            plans.append(pl.from_pandas(df[['Age']]).lazy().select(
+                pl.when(age.is_null() | age.is_nan()).then(pl.lit('Unknown'))
+                .when(age < 5).then(pl.lit('<5 years'))
+                .when(age < 10).then(pl.lit('5-10 years'))
+                .when(age < 15).then(pl.lit('10-15 years'))
+                .when(age < 20).then(pl.lit('15-20 years'))
+                .otherwise(pl.lit('≥20 years')).alias('Age_Category')))
+        results = pl.collect_all(plans)
+
+        if code_columns:
+            group_keys, row_groups = results[0], results[1]['_group'].to_numpy()
+            # 各组的取值（保留原始值和类型，缺失值为 NaN）
+            keys = pd.DataFrame({
+                column: pd.Series(encoded[column][1]).reindex(group_keys[code_column].to_numpy()).to_numpy()
+                for column, code_column in zip(key_columns, code_columns)
+            })
+            enhanced_keys = tool._enhance_data(keys, verbose=False)
+        else:
+            row_groups = np.zeros(len(df), dtype=np.int64)
+            enhanced_keys = tool._enhance_data(pd.DataFrame(index=[0]), verbose=False)
+        if 'Age' in df.columns:
+            age_category = results[-1]['Age_Category'].to_numpy()
+
+        df = df.copy(deep=False)
+        for column in enhanced_keys.columns.difference(key_columns, sort=False):
+            if column == 'Age_Category':
+                values = age_category if age_category is not None else np.full(len(df), 'Unknown', dtype=object)
+                df[column] = pd.Series(values, index=df.index, dtype=enhanced_keys[column].dtype)
+            else:
+                df[column] = pd.Series(enhanced_keys[column].to_numpy()[row_groups], index=df.index,
+                                       dtype=enhanced_keys[column].dtype)
+
+        if verbose:
+            tool.events.message("✅ 数据增强完成", 'success')
+        return df
+
+    def market_share_tables(self, df):
+        """市场占有率表（与 pandas 实现相同的表、顺序和舍入），所有表在一次 collect_all 中计算"""
+        pl, tool = self.pl, self.tool
+        columns, labels = {}, {}
+        if 'Manufacturer_Category' in df.columns:
+            columns['manufacturer'], labels['manufacturer'] = _codes(df['Manufacturer_Category'])
+        if 'Master Series' in df.columns:
+            # 机型名称按不同取值标准化后重新编码（不同型号可能标准化为同一机型）
+            series_codes, series_values = _codes(df['Master Series'])
+            normalized = [tool._normalize_model_name(value) for value in series_values] \
+                + [tool._normalize_model_name(np.nan)]
+            model_codes, labels['model'] = pd.factorize(pd.Series(normalized))
+            columns['model'] = model_codes.astype(np.int64)[series_codes]
+        has_seats = 'Seat_Category' in df.columns
+        if has_seats:
+            columns['seat'] = pd.Categorical(df['Seat_Category'], categories=SEAT_CATEGORIES).codes.astype(np.int64)
+        query = pl.from_pandas(pd.DataFrame(columns, index=pd.RangeIndex(len(df)))).lazy()
+
+        # (表名, 分组列, 座位等级)，顺序与 pandas 实现一致
+        tables = []
+        if 'manufacturer' in columns:
+            tables.append(('制造商全部', 'manufacturer', None))
+            if has_seats:
+                tables += [(f'制造商 {seat}', 'manufacturer', seat) for seat in SEAT_CATEGORIES]
+        if 'model' in columns:
+            tables.append(('机型全部', 'model', None))
+            if has_seats:
+                tables += [(f'机型 {seat}', 'model', seat) for seat in SEAT_CATEGORIES]
+
+        plans = []
+        for _, column, seat in tables:
+            subset = query if seat is None else query.filter(pl.col('seat') == SEAT_CATEGORIES.index(seat))
+            # value_counts: 按首次出现的顺序计数，再按数量稳定降序排序；缺失值不计数
+            plans.append(subset.filter(pl.col(column) >= 0).group_by(column, maintain_order=True).len()
+                         .sort('len', descending=True, maintain_order=True))
+            plans.append(subset.select(pl.len()))
+
+        results = {}
+        collected = pl.collect_all(plans)
+        for (name, column, _), counts, total in zip(tables, collected[::2], collected[1::2]):
+            total = total.item()
+            if total == 0:
+                continue
+            values = counts['len'].to_numpy().astype(np.int64)
+            share = (pd.Series(values) / total * 100).round(2)
+            results[name] = pd.DataFrame({
+                '制造商' if column == 'manufacturer' else '机型': labels[column].take(counts[column].to_numpy()),
+                '数量': values,
+                '占比 (%)': share.to_numpy()
+            })
+        return results
@@ -0,0 +1,135 @@
+"""机队机龄预测
+
+按目标年份和退役政策推算各航司的机队规模、平均机龄、机龄段构成和机型x机龄分布（假设不引进新飞机）。
+所有年份和政策在一次广播计算中完成: 机龄矩阵为 (飞机, 年份)，在役矩阵为 (政策, 飞机, 年份)，
+各航司的汇总由一次 bincount 得到。
+"""
+import numpy as np
+import pandas as pd
+
+# 退役政策: None 为不退役；数字为退役机龄（达到即退役）；
+# 字典按座位等级（Seat_Category）指定退役机龄，'default' 用于其它座位等级
+RETIREMENT_POLICIES = {
+    '不退役': None,
+    '满25年退役': 25,
+    '满30年退役': 30,
+    '100座以下满20年、其它满25年退役': {'Under 100 seats': 20, 'default': 25},
+}
+
+
+def retirement_ages(policy, seat_categories):
+    """把退役政策展开为每架飞机的退役机龄数组（不退役为 inf）"""
+    n = len(seat_categories)
+    if policy is None:
+        return np.full(n, np.inf)
+    if not isinstance(policy, dict):
+        return np.full(n, float(policy))
+    default = policy.get('default')
+    limits = seat_categories.map(lambda category: policy.get(category, default))
+    return limits.astype(float).fillna(np.inf).to_numpy()
+
+
+class FleetAgeProjection:
+    """机队机龄预测结果: 保存每架飞机的编码和 (政策, 飞机, 年份) 在役矩阵，按需输出各种表格"""
+
+    def __init__(self, df, years, policies, base_year, age_group_bins, age_group_labels):
+        self.age_group_bins = age_group_bins
+        self.age_group_labels = list(age_group_labels)
+        self.years = np.array(sorted(set(int(year) for year in years)))
+        self.policies = dict(policies)
+        self.policy_names = list(self.policies)
+        self.base_year = int(base_year)
+
+        airline_column = 'Airline_Normalized' if 'Airline_Normalized' in df.columns else 'Operator'
+        self.airline_codes, self.airlines = pd.factorize(df[airline_column], sort=True)
+        self.model_codes, self.models = pd.factorize(df['Model_Normalized'], sort=True)
+
+        # 缺失机龄按0处理（与航司机型x机龄分布表一致）
+        base_ages = df['Age'].fillna(0).to_numpy(dtype=float) if 'Age' in df.columns else np.zeros(len(df))
+        seat_categories = df['Seat_Category'] if 'Seat_Category' in df.columns else pd.Series([None] * len(df))
+
+        # (飞机, 年份) 机龄矩阵和 (政策, 飞机, 年份) 在役矩阵
+        self.ages = base_ages[:, None] + (self.years - self.base_year)[None, :]
+        limits = np.stack([retirement_ages(policy, seat_categories.reset_index(drop=True))
+                           for policy in self.policies.values()]) if self.policies else np.empty((0, len(df)))
+        # 航司缺失的飞机不参与统计
+        self.active = (self.ages[None, :, :] < limits[:, :, None]) & (self.airline_codes >= 0)[None, :, None]
+
+        self._summarize()
+
+    def _summarize(self):
+        """一次 bincount 得到各 (政策, 年份, 航司) 的飞机数量、机龄合计和各机龄段数量"""
+        n_policies, n_years, n_airlines = len(self.policy_names), len(self.years), len(self.airlines)
+        n_groups = len(self.age_group_labels)
+
+        # 分组键: ((政策 x 年份) x 航司) x 机龄段；机龄段与 pd.cut(right=False) 相同，超出范围的不计入机龄段
+        cell = (np.arange(n_policies)[:, None, None] * n_years + np.arange(n_years)[None, None, :]) * n_airlines \
+            + self.airline_codes[None, :, None]
+        cell = np.broadcast_to(cell, self.active.shape)[self.active]
+        ages = np.broadcast_to(self.ages, self.active.shape)[self.active]
+
+        size = n_policies * n_years * n_airlines
+        shape = (n_policies, n_years, n_airlines)
+        self.fleet_counts = np.bincount(cell, minlength=size).reshape(shape)
+        self.age_sums = np.bincount(cell, weights=ages, minlength=size).reshape(shape)
+
+        age_groups = np.searchsorted(self.age_group_bins, ages, side='right') - 1
+        in_range = (age_groups >= 0) & (age_groups < n_groups)
+        self.age_group_counts = np.bincount(cell[in_range] * n_groups + age_groups[in_range],
+                                            minlength=size * n_groups).reshape(shape + (n_groups,))
+
+    def _policy_index(self, policy):
+        return self.policy_names.index(policy)
+
+    def _year_index(self, year):
+        positions = np.flatnonzero(self.years == int(year))
+        if len(positions) == 0:
+            raise KeyError(f"未计算年份: {year}")
+        return positions[0]
+
+    def fleet_size(self, policy):
+        """各航司各年份的在役飞机数量（航司 x 年份）"""
+        counts = self.fleet_counts[self._policy_index(policy)].T
+        return pd.DataFrame(counts, index=pd.Index(self.airlines, name='航司'),
+                            columns=pd.Index(self.years, name='年份'))
+
+    def average_age(self, policy):
+        """各航司各年份在役飞机的平均机龄（航司 x 年份，无在役飞机为空）"""
+        policy_index = self._policy_index(policy)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.age_sums[policy_index] / self.fleet_counts[policy_index]
+        return pd.DataFrame(mean.T, index=pd.Index(self.airlines, name='航司'),
+                            columns=pd.Index(self.years, name='年份'))
+
+    def age_group_mix(self, policy, year):
+        """指定年份各航司的机龄段构成（航司 x 机龄段）"""
+        counts = self.age_group_counts[self._policy_index(policy), self._year_index(year)]
+        return pd.DataFrame(counts, index=pd.Index(self.airlines, name='航司'),
+                            columns=pd.Index(self.age_group_labels, name='机龄段'))
+
+    def age_distribution(self, airline, policy, year):
+        """指定航司、政策和年份的机型x机龄分布表（与航司机型x机龄分布表格式相同），无在役飞机时返回 None"""
+        airline_positions = np.flatnonzero(self.airlines == airline)
+        if len(airline_positions) == 0:
+            return None
+        year_index = self._year_index(year)
+        rows = (self.airline_codes == airline_positions[0]) & (self.model_codes >= 0) \
+            & self.active[self._policy_index(policy), :, year_index]
+        if not rows.any():
+            return None
+
+        # 机型 x 机龄整数 的计数
+        model_codes = self.model_codes[rows]
+        age_integers = self.ages[rows, year_index].astype(int)
+        models, model_positions = np.unique(model_codes, return_inverse=True)
+        age_values, age_positions = np.unique(age_integers, return_inverse=True)
+        counts = np.bincount(model_positions * len(age_values) + age_positions,
+                             minlength=len(models) * len(age_values)).reshape(len(models), len(age_values))
+
+        age_table = pd.DataFrame(counts, index=pd.Index(self.models[models], name='Model_Normalized'),
+                                 columns=pd.Index(age_values.tolist(), name='Age_Integer'))
+        age_table['Total'] = age_table.sum(axis=1)
+        age_table.loc['Total'] = age_table.sum(axis=0)
+
+        # 按总数排序
+        return age_table.sort_values('Total', ascending=False)
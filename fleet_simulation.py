@@ -0,0 +1,177 @@
+"""机队替换蒙特卡洛模拟
+
+估计目标年份各制造商的市场占有率分布。每次试验中:
+1. 每架飞机按退役概率抽样是否退役（退役机龄服从正态分布，可按机型设定均值和标准差，以当前仍在役为条件）；
+2. 每个座位等级的替换份额从以基准份额为中心的 Dirichlet 分布抽样，退役飞机按该份额一对一替换为同座位等级的新飞机。
+
+试验按块批量计算（每块为 (试验, 飞机) 矩阵），块大小限制内存占用；每块使用由种子派生的独立随机数流，
+结果只取决于种子和块大小，与是否使用进程池无关。
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 退役机龄的默认均值和标准差（年）
+DEFAULT_RETIREMENT_AGE = (25.0, 3.0)
+
+# 与市场占有率分析相同的座位等级
+SEAT_CATEGORIES = ['Under 100 seats', '100-150 seats', 'Over 150 seats']
+
+# 抽样次数（试验数 x 飞机数）少于该值时直接在当前进程运行，省去启动进程池和传输数据的开销
+PARALLEL_MIN_DRAWS = 200_000_000
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+# 超过该值时标准正态分布的生存函数用渐近展开计算（erfc 在 z≈37.5 之后下溢为0）
+_TAIL_Z = 30.0
+
+
+def _log_survival(z):
+    """标准正态分布的对数生存函数 log P(Z > z)，尾部不损失精度"""
+    z = np.asarray(z, dtype=float)
+    direct = np.log(0.5 * _erfc(np.minimum(z, _TAIL_Z) / math.sqrt(2.0)))
+    tail_z = np.maximum(z, _TAIL_Z)
+    tail = (-0.5 * tail_z ** 2 - np.log(tail_z * math.sqrt(2.0 * math.pi))
+            + np.log1p(-1.0 / tail_z ** 2 + 3.0 / tail_z ** 4))
+    return np.where(z > _TAIL_Z, tail, direct)
+
+
+def retirement_probabilities(ages, models, years, retirement_age=DEFAULT_RETIREMENT_AGE, retirement_by_model=None):
+    """每架飞机在 years 年内退役的概率: P(退役机龄 <= 当前机龄+years | 退役机龄 > 当前机龄)
+
+    按生存函数之比 1 - S(当前机龄+years) / S(当前机龄) 计算，已远超退役机龄的飞机也不损失精度。
+    """
+    ages = np.asarray(ages, dtype=float)
+    if years <= 0:
+        return np.zeros(len(ages))
+
+    retirement_by_model = retirement_by_model or {}
+    parameters = [retirement_by_model.get(model, retirement_age) for model in models]
+    means = np.array([mean for mean, _ in parameters], dtype=float)
+    deviations = np.maximum(np.array([deviation for _, deviation in parameters], dtype=float), 1e-6)
+
+    survival_now = _log_survival((ages - means) / deviations)
+    survival_later = _log_survival((ages + years - means) / deviations)
+    probabilities = -np.expm1(survival_later - survival_now)
+    return np.clip(probabilities, 0.0, 1.0)
+
+
+def shift_shares(shares, manufacturer, share):
+    """把某制造商的份额设为 share（0~1），其它制造商按原比例分配剩余份额"""
+    shares = dict(shares)
+    others = {name: value for name, value in shares.items() if name != manufacturer}
+    others_total = sum(others.values())
+    shifted = {name: (1.0 - share) * value / others_total if others_total > 0 else 0.0
+               for name, value in others.items()}
+    shifted[manufacturer] = share
+    return shifted
+
+
+def prepare_simulation(df, years, retirement_age=DEFAULT_RETIREMENT_AGE, retirement_by_model=None,
+                       replacement_shares=None, share_concentration=50.0):
+    """把数据整理为模拟所需的数组（可传给工作进程）
+
+    replacement_shares 为 {座位等级: {制造商: 份额}}，未指定的座位等级使用该等级当前的制造商份额；
+    share_concentration 越大，每次试验抽到的替换份额越接近基准份额。
+    """
+    df = df[df['Seat_Category'].isin(SEAT_CATEGORIES) & df['Manufacturer_Category'].notna()]
+    seat_categories = [category for category in SEAT_CATEGORIES if (df['Seat_Category'] == category).any()]
+    manufacturer_codes, manufacturers = pd.factorize(df['Manufacturer_Category'], sort=True)
+    seat_codes = pd.Categorical(df['Seat_Category'], categories=seat_categories).codes.astype(np.intp)
+    n_seats, n_manufacturers = len(seat_categories), len(manufacturers)
+
+    ages = df['Age'].fillna(0).to_numpy(dtype=float)
+    models = df['Model_Normalized'].to_numpy() if 'Model_Normalized' in df.columns else [None] * len(df)
+
+    # 基准份额: 默认取各座位等级当前的制造商份额
+    current = np.zeros((n_seats, n_manufacturers))
+    np.add.at(current, (seat_codes, manufacturer_codes), 1.0)
+    base_shares = current / np.maximum(current.sum(axis=1, keepdims=True), 1.0)
+    for seat_index, category in enumerate(seat_categories):
+        scenario = (replacement_shares or {}).get(category)
+        if scenario:
+            weights = np.array([scenario.get(name, 0.0) for name in manufacturers], dtype=float)
+            if weights.sum() > 0:
+                base_shares[seat_index] = weights / weights.sum()
+
+    return {
+        'probabilities': retirement_probabilities(ages, models, years, retirement_age, retirement_by_model),
+        'group_codes': seat_codes * n_manufacturers + manufacturer_codes,
+        'seat_codes': seat_codes,
+        'seat_categories': seat_categories,
+        'manufacturers': list(manufacturers),
+        'alpha': base_shares * share_concentration,
+    }
+
+
+def simulate_chunk(inputs, trials, seed):
+    """运行一块试验，返回各次试验的机队数量 (试验, 座位等级, 制造商)"""
+    rng = np.random.default_rng(seed)
+    n_seats, n_manufacturers = inputs['alpha'].shape
+
+    # (试验, 飞机) 退役抽样，按 (座位等级, 制造商) 汇总保留的飞机和按座位等级汇总退役的飞机
+    retired = rng.random((trials, len(inputs['probabilities'])), dtype=np.float32) < inputs['probabilities']
+    group_onehot = np.eye(n_seats * n_manufacturers, dtype=np.float32)[inputs['group_codes']]
+    seat_onehot = np.eye(n_seats, dtype=np.float32)[inputs['seat_codes']]
+    retained = np.rint((~retired).astype(np.float32) @ group_onehot).astype(np.int64)
+    retired_by_seat = np.rint(retired.astype(np.float32) @ seat_onehot).astype(np.int64)
+
+    # 每次试验的替换份额 ~ Dirichlet(alpha)，用 Gamma 抽样后归一化；份额为0的制造商不参与
+    gamma = rng.standard_gamma(np.broadcast_to(inputs['alpha'], (trials, n_seats, n_manufacturers)))
+    totals = gamma.sum(axis=2, keepdims=True)
+    shares = np.divide(gamma, totals, out=np.full_like(gamma, 1.0 / n_manufacturers), where=totals > 0)
+
+    replacements = rng.multinomial(retired_by_seat, shares)
+    return retained.reshape(trials, n_seats, n_manufacturers) + replacements
+
+
+def _chunk_plan(trials, chunk_size, seed):
+    """把试验划分为块，每块分配一个由种子派生的独立随机数种子"""
+    chunks = [min(chunk_size, trials - start) for start in range(0, trials, chunk_size)]
+    return chunks, np.random.SeedSequence(seed).spawn(len(chunks))
+
+
+def simulate_fleet_replacement(inputs, trials=10000, seed=None, chunk_size=1000, workers=1,
+                               parallel_threshold=PARALLEL_MIN_DRAWS):
+    """按块运行全部试验，返回 (试验, 座位等级, 制造商) 机队数量
+
+    workers > 1 且抽样次数不少于 parallel_threshold 时各块在进程池中运行。
+    """
+    chunks, seeds = _chunk_plan(trials, chunk_size, seed)
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers > 1 and trials * len(inputs['probabilities']) >= parallel_threshold:
+        # 使用 spawn 启动子进程，避免在多线程的 Streamlit 服务进程中 fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            results = list(executor.map(simulate_chunk, [inputs] * len(chunks), chunks, seeds))
+    else:
+        results = [simulate_chunk(inputs, chunk, chunk_seed) for chunk, chunk_seed in zip(chunks, seeds)]
+    return np.concatenate(results)
+
+
+def _share_table(counts, manufacturers):
+    """由各次试验的 (试验, 制造商) 数量生成占有率分布表，格式与市场占有率表相同并增加 P10/P90"""
+    totals = counts.sum(axis=1, keepdims=True)
+    shares = np.divide(counts * 100.0, totals, out=np.zeros(counts.shape), where=totals > 0)
+    table = pd.DataFrame({
+        '制造商': manufacturers,
+        '数量': counts.mean(axis=0).round(1),
+        '占比 (%)': shares.mean(axis=0).round(2),
+        'P10 (%)': np.percentile(shares, 10, axis=0).round(2),
+        'P90 (%)': np.percentile(shares, 90, axis=0).round(2),
+    })
+    table = table[table['数量'] > 0]
+    return table.sort_values('数量', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def share_distributions(counts, seat_categories, manufacturers):
+    """汇总模拟结果: {'制造商全部': 表, '制造商 <座位等级>': 表}"""
+    results = {'制造商全部': _share_table(counts.sum(axis=1), manufacturers)}
+    for seat_index, category in enumerate(seat_categories):
+        if counts[:, seat_index].sum() > 0:
+            results[f'制造商 {category}'] = _share_table(counts[:, seat_index], manufacturers)
+    return results
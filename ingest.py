@@ -0,0 +1,98 @@
+"""多文件、多工作表并行导入
+
+每个工作表在独立进程中读取并完成数据清洗，
+主进程只负责合并结果、按注册号去重、筛选客机和后续的标注与数据增强阶段。
+上传文件的内容只放入一次共享内存，各工作进程直接从共享内存读取，避免重复传输。
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import shared_memory
+
+import pandas as pd
+
+
+def source_display_name(source):
+    """数据源的显示名称"""
+    return os.path.basename(str(getattr(source, 'name', source)))
+
+
+def list_sheet_names(source):
+    """列出工作簿中的所有工作表"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    with pd.ExcelFile(source) as workbook:
+        return list(workbook.sheet_names)
+
+
+def _open_shared_source(shm_name, size):
+    """从共享内存中读取工作簿内容"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return BytesIO(bytes(shm.buf[:size]))
+    finally:
+        shm.close()
+
+
+def load_sheet(source, sheet_name, reference_path=None, dataframe_engine='pandas'):
+    """读取单个工作表并完成数据清洗，返回 (清洗结果, 原始行数)
+
+    source 为文件路径，或 ('shm', 共享内存名, 字节数)；dataframe_engine 为清洗使用的计算引擎。
+    """
+    from app import ChinaAircraftAnalysisTool
+
+    if isinstance(source, tuple) and source[0] == 'shm':
+        source = _open_shared_source(source[1], source[2])
+
+    tool = ChinaAircraftAnalysisTool(reference_path=reference_path)
+    tool.dataframe_engine = dataframe_engine
+    raw_df = pd.read_excel(source, sheet_name=sheet_name)
+
+    return tool._engine().clean(raw_df, verbose=False), len(raw_df)
+
+
+def ingest_sheets(sheet_tasks, max_workers=None, reference_path=None, dataframe_engine='pandas'):
+    """在进程池中并行处理所有工作表
+
+    sheet_tasks 为 [(数据源, 工作表名)]，数据源可以是文件路径或上传文件对象；
+    reference_path 为参考数据文件、dataframe_engine 为计算引擎，与主进程保持一致。
+    返回 [(数据源名称, 工作表名, (清洗结果, 原始行数) 或异常)]，顺序与输入一致。
+    """
+    if max_workers is None:
+        max_workers = min(len(sheet_tasks), os.cpu_count() or 1)
+
+    shared_blocks = {}
+    try:
+        # 每个上传文件只复制一次到共享内存，供该文件的所有工作表任务使用
+        jobs = []
+        for source, sheet_name in sheet_tasks:
+            if hasattr(source, 'getbuffer'):
+                if id(source) not in shared_blocks:
+                    with source.getbuffer() as buffer:
+                        shm = shared_memory.SharedMemory(create=True, size=max(buffer.nbytes, 1))
+                        shm.buf[:buffer.nbytes] = buffer
+                        shared_blocks[id(source)] = (shm, buffer.nbytes)
+                shm, size = shared_blocks[id(source)]
+                jobs.append((source, sheet_name, ('shm', shm.name, size)))
+            else:
+                jobs.append((source, sheet_name, source))
+
+        # 使用 spawn 启动子进程，避免在多线程的 Streamlit 服务进程中 fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = [executor.submit(load_sheet, job_source, sheet_name, reference_path, dataframe_engine)
+                       for _, sheet_name, job_source in jobs]
+
+            results = []
+            for (source, sheet_name, _), future in zip(jobs, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                results.append((source_display_name(source), sheet_name, result))
+            return results
+    finally:
+        for shm, _ in shared_blocks.values():
+            shm.close()
+            shm.unlink()
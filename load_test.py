@@ -0,0 +1,211 @@
+"""并发会话负载测试
+
+使用 Streamlit 的 AppTest 在同一进程中模拟多个分析人员同时使用 main()：
+上传文件、加载数据、全选航司、生成表格和图表、导出Excel。
+每次交互都是一次真实的脚本重新运行，统计交互延迟的 p50/p95/p99 和每个会话的内存占用。
+
+用法:
+    python load_test.py --users 8 --aircraft 20000
+    python load_test.py --users 4 --file AircraftDetail221225.xlsx
+"""
+import argparse
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+TAB_AIRLINE = "✈️ 航司机龄分布分析"
+TAB_MARKET = "📊 市场占有率分析"
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def make_synthetic_fleet(n_aircraft=20000, seed=0):
+    """按参考数据生成合成机队数据（含中国内地、境外、宽体机和货机记录），返回DataFrame"""
+    from app import ChinaAircraftAnalysisTool
+
+    rng = np.random.default_rng(seed)
+    reference = ChinaAircraftAnalysisTool()
+
+    operators = reference.all_airlines + ['Lufthansa', 'Cathay Pacific', 'Singapore Airlines', 'Delta Air Lines']
+    states = reference.china_states[:-1]
+    operator_states = [states[i % len(states)] for i in range(len(reference.all_airlines))] + \
+        ['Hesse', 'Hong Kong', 'Singapore', 'Georgia']
+    series = ['737-700', '737-800', '737 MAX 8', 'A319-100', 'A320-200', 'A320-200N', 'A321-200',
+              'A321-200NX', 'ARJ21-700', 'C919', 'E190', 'E195', 'CRJ900', 'A330-300', '787-9']
+    manufacturers = {'7': 'BOEING', 'A': 'AIRBUS', 'C': 'COMAC', 'E': 'EMBRAER'}
+
+    operator_index = rng.integers(0, len(operators), n_aircraft)
+    series_index = rng.integers(0, len(series), n_aircraft)
+    master_series = np.array(series, dtype=object)[series_index]
+
+    return pd.DataFrame({
+        'Registration': [f'B-{i:06d}' for i in rng.permutation(n_aircraft)],
+        'Operator': np.array(operators, dtype=object)[operator_index],
+        'Operator State': np.array(operator_states, dtype=object)[operator_index],
+        'Master Series': master_series,
+        'Manufacturer': ['BOMBARDIER' if model.startswith('CRJ') else manufacturers[model[0]]
+                         for model in master_series],
+        'Age': np.round(rng.uniform(0, 30, n_aircraft), 1),
+        'Status': rng.choice(['In Service', 'Storage'], n_aircraft, p=[0.85, 0.15]),
+        'Primary Usage': rng.choice(['Passenger', 'Freight'], n_aircraft, p=[0.95, 0.05]),
+    })
+
+
+def fleet_to_xlsx(df):
+    """DataFrame 写为Excel字节串"""
+    output = BytesIO()
+    df.to_excel(output, index=False)
+    return output.getvalue()
+
+
+def session_memory_bytes(analyzer):
+    """估算一个会话持有的数据量（原始数据、全部增强数据、当前视图和缓存的报表表格）"""
+    frames = [analyzer.df, analyzer.global_df, analyzer.filtered_df, analyzer.model_catalog]
+    for result in list(analyzer._report_cache.values()) + list(analyzer._sql_cache.values()):
+        if isinstance(result, dict):
+            frames.extend(value for value in result.values() if isinstance(value, pd.DataFrame))
+        elif isinstance(result, pd.DataFrame):
+            frames.append(result)
+    return sum(int(frame.memory_usage(deep=True).sum()) for frame in frames if isinstance(frame, pd.DataFrame))
+
+
+class SimulatedUser:
+    """一个模拟分析人员：按固定步骤操作页面，记录每次交互的耗时"""
+
+    def __init__(self, user_id, file_name, file_bytes, timeout, warmup=False):
+        from streamlit.testing.v1 import AppTest
+
+        self.user_id = user_id
+        self.file = (file_name, file_bytes, XLSX_MIME)
+        self.warmup = warmup
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.timings = []
+        self.errors = []
+        self.memory_bytes = 0
+
+    def _step(self, name, action):
+        start = time.perf_counter()
+        action()
+        self.timings.append((name, time.perf_counter() - start))
+        if self.at.exception:
+            self.errors.append(f"{name}: {self.at.exception[0].message}")
+
+    def _click(self, key):
+        return lambda: self.at.button(key=key).click().run()
+
+    def _switch_tab(self, label):
+        def action():
+            self.at.session_state['main_tabs'] = label
+            self.at.run()
+        return action
+
+    def run(self):
+        at = self.at
+        self._step('open', at.run)
+        self._step('upload', lambda: at.sidebar.file_uploader[0].set_value(self.file).run())
+        if self.warmup:
+            at.sidebar.checkbox[0].check()
+        self._step('load_data', self._click('load_data_btn'))
+        self._step('select_all', self._click('select_all_btn'))
+        self._step('cross_table', self._click('cross_table_btn'))
+        self._step('age_charts', self._click('age_charts_btn'))
+
+        airlines = at.session_state['selected_airlines']
+        if airlines:
+            def open_expander():
+                at.session_state[f"age_expander_{airlines[0]}"] = True
+                at.run()
+            self._step('open_age_table', open_expander)
+
+        self._step('export_airline', self._click('export_airline_btn'))
+        self._step('tab_market', self._switch_tab(TAB_MARKET))
+        self._step('market_table', self._click('market_table_btn'))
+        self._step('market_charts', self._click('market_charts_btn'))
+        self._step('export_market', self._click('export_market_btn'))
+        self._step('tab_airline', self._switch_tab(TAB_AIRLINE))
+
+        self.memory_bytes = session_memory_bytes(at.session_state['analyzer'])
+
+
+def run_load_test(users, file_name, file_bytes, timeout=300, warmup=False):
+    """并发运行多个模拟用户，返回用户列表和总耗时"""
+    simulated_users = [SimulatedUser(i, file_name, file_bytes, timeout, warmup) for i in range(users)]
+    threads = [threading.Thread(target=user.run, name=f'user-{user.user_id}') for user in simulated_users]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return simulated_users, time.perf_counter() - start
+
+
+def format_percentiles(samples):
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+    return f"{p50:9.0f} {p95:9.0f} {p99:9.0f} {max(samples) * 1000:9.0f}"
+
+
+def report(simulated_users, elapsed):
+    """输出交互延迟分位数和内存统计"""
+    by_step = defaultdict(list)
+    for user in simulated_users:
+        for name, seconds in user.timings:
+            by_step[name].append(seconds)
+    all_samples = [seconds for samples in by_step.values() for seconds in samples]
+
+    print(f"{'step':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, samples in by_step.items():
+        print(f"{name:<16} {format_percentiles(samples)}")
+    print(f"{'ALL':<16} {format_percentiles(all_samples)}")
+
+    memory = [user.memory_bytes / 1024 ** 2 for user in simulated_users]
+    print()
+    print(f"sessions: {len(simulated_users)}, wall time: {elapsed:.1f} s")
+    print(f"per-session data: mean {np.mean(memory):.1f} MB, max {np.max(memory):.1f} MB")
+    # Linux 上 ru_maxrss 单位为KB
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    errors = [f"user-{user.user_id} {error}" for user in simulated_users for error in user.errors]
+    for error in errors:
+        print(f"ERROR {error}")
+    return not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发会话负载测试')
+    parser.add_argument('--users', type=int, default=4, help='并发模拟用户数')
+    parser.add_argument('--aircraft', type=int, default=20000, help='合成机队规模（未指定 --file 时）')
+    parser.add_argument('--file', help='使用指定的Excel文件代替合成数据')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help='单次交互超时（秒）')
+    parser.add_argument('--warmup', action='store_true', help='加载时开启后台预计算')
+    args = parser.parse_args()
+
+    # 只保留错误日志，避免弃用提示淹没统计结果
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    if args.file:
+        file_name = os.path.basename(args.file)
+        with open(args.file, 'rb') as f:
+            file_bytes = f.read()
+    else:
+        file_name = 'synthetic_fleet.xlsx'
+        file_bytes = fleet_to_xlsx(make_synthetic_fleet(args.aircraft, args.seed))
+    print(f"data: {file_name} ({len(file_bytes) / 1024 ** 2:.1f} MB), users: {args.users}")
+
+    simulated_users, elapsed = run_load_test(args.users, file_name, file_bytes, args.timeout, args.warmup)
+    sys.exit(0 if report(simulated_users, elapsed) else 1)
+
+
+if __name__ == '__main__':
+    main()
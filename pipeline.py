@@ -0,0 +1,48 @@
+"""按依赖关系缓存的计算阶段
+
+每个阶段声明上游阶段和参数（返回可哈希值的函数），结果按 (上游阶段的键, 参数) 缓存。
+取某个阶段的结果时先取上游结果，只有键变化的阶段才重新计算；
+因此修改一个参数只会重新计算依赖它的阶段及其下游阶段。
+"""
+from collections import Counter
+
+
+class StagePipeline:
+    """计算阶段有向无环图，每个阶段保留最近一次结果"""
+
+    def __init__(self, events):
+        self.events = events
+        self._stages = {}
+        self._results = {}
+        # 各阶段实际计算的次数
+        self.runs = Counter()
+
+    def add(self, name, compute, inputs=(), params=None):
+        """添加阶段: compute(*上游结果, verbose=...) 计算结果，params() 返回本阶段参数"""
+        missing = [stage for stage in inputs if stage not in self._stages]
+        if missing:
+            raise ValueError(f"阶段 {name} 的上游阶段未定义: {', '.join(missing)}")
+        self._stages[name] = (tuple(inputs), compute, params)
+
+    def get(self, name, verbose=True):
+        """取阶段结果（必要时重新计算该阶段和上游阶段）"""
+        return self._evaluate(name, verbose)[1]
+
+    def _evaluate(self, name, verbose):
+        inputs, compute, params = self._stages[name]
+        upstream = [self._evaluate(stage, verbose) for stage in inputs]
+        key = (tuple(stage_key for stage_key, _ in upstream), params() if params else None)
+
+        cached = self._results.get(name)
+        if cached is not None and cached[0] == key:
+            return cached
+
+        values = [value for _, value in upstream]
+        rows_in = getattr(values[0], 'shape', (None,))[0] if values else None
+        with self.events.stage(name, rows_in=rows_in) as stage:
+            value = compute(*values, verbose=verbose)
+            stage.rows_out = getattr(value, 'shape', (None,))[0]
+
+        self._results[name] = (key, value)
+        self.runs[name] += 1
+        return key, value
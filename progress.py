@@ -0,0 +1,91 @@
+"""计算过程事件
+
+计算代码只向 EventBus 发出事件（阶段开始/结束及行数、进度、提示和警告），不直接调用界面。
+Streamlit 页面通过渲染器批量显示事件；命令行、后台线程和工作进程中的事件写入日志。
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+logger = logging.getLogger('aircraft_analysis')
+
+# kind: 'stage_started' / 'stage_finished' / 'message' / 'progress'
+# level: 消息级别，与页面显示方式对应（write / caption / info / success / warning / error）
+ProgressEvent = namedtuple('ProgressEvent', ['kind', 'stage', 'message', 'level', 'rows_in', 'rows_out',
+                                             'percent', 'elapsed', 'thread_id', 'details'])
+
+LOG_LEVELS = {'warning': logging.WARNING, 'error': logging.ERROR}
+
+
+def log_event(event):
+    """把事件写入日志"""
+    if event.kind == 'message':
+        logger.log(LOG_LEVELS.get(event.level, logging.INFO), event.message.strip())
+    elif event.kind == 'progress':
+        logger.debug("%.0f%% %s", event.percent * 100, event.message)
+    elif event.kind == 'stage_started':
+        logger.debug("[%s] 开始", event.stage)
+    elif event.kind == 'stage_finished':
+        if event.rows_out is None:
+            rows = ""
+        elif event.rows_in is None:
+            rows = f", {event.rows_out} 行"
+        else:
+            rows = f", {event.rows_in} → {event.rows_out} 行"
+        logger.info("[%s] 完成 (%.2f s%s)", event.stage, event.elapsed, rows)
+
+
+class EventBus:
+    """事件总线：计算阶段发出事件，监听器负责显示或记录（可在任意线程中发出）"""
+
+    def __init__(self, log=True):
+        self._listeners = {}
+        self._lock = threading.Lock()
+        if log:
+            self.subscribe(log_event, key='log')
+
+    def subscribe(self, listener, key=None):
+        """添加监听器；同一 key 只保留最新的监听器（如每次页面运行创建的渲染器）"""
+        with self._lock:
+            self._listeners[id(listener) if key is None else key] = listener
+        return listener
+
+    def unsubscribe(self, key):
+        with self._lock:
+            self._listeners.pop(key, None)
+
+    def emit(self, kind, message='', level='write', stage=None, rows_in=None, rows_out=None,
+             percent=None, elapsed=None, **details):
+        event = ProgressEvent(kind, stage, message, level, rows_in, rows_out, percent, elapsed,
+                              threading.get_ident(), details)
+        with self._lock:
+            listeners = list(self._listeners.values())
+        for listener in listeners:
+            listener(event)
+        return event
+
+    def message(self, message, level='write', stage=None, **details):
+        """提示、结果或警告消息"""
+        return self.emit('message', message, level=level, stage=stage, **details)
+
+    def progress(self, percent, message='', stage=None):
+        """进度（0~1）"""
+        return self.emit('progress', message, stage=stage, percent=percent)
+
+    @contextmanager
+    def stage(self, stage, rows_in=None):
+        """计算阶段：进入时发出开始事件，退出时发出结束事件（含耗时和输出行数）
+
+        用法: with bus.stage('clean', rows_in=n) as result: ...; result.rows_out = m
+        """
+        start = time.perf_counter()
+        result = SimpleNamespace(rows_out=None)
+        self.emit('stage_started', stage=stage, rows_in=rows_in)
+        try:
+            yield result
+        finally:
+            self.emit('stage_finished', stage=stage, rows_in=rows_in, rows_out=result.rows_out,
+                      elapsed=time.perf_counter() - start)
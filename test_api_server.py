@@ -0,0 +1,145 @@
+"""HTTP/JSON 分析接口测试（ETag、条件请求、gzip 和响应缓存）"""
+import gzip
+import json
+import threading
+from http.client import HTTPConnection
+from urllib.parse import quote
+
+import pytest
+
+from api_server import AnalysisService, accepts_gzip, create_server
+
+
+@pytest.fixture
+def server(analyzer):
+    server = create_server(analyzer, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, path, **headers):
+    """发送 GET 请求，返回 (状态码, 响应头, 响应体)"""
+    connection = HTTPConnection(*server.server_address[:2], timeout=30)
+    try:
+        connection.request('GET', quote(path), headers=headers)
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    (None, False),
+    ('', False),
+    ('gzip', True),
+    ('gzip, deflate, br', True),
+    ('GZIP;q=0.5', True),
+    ('gzip;q=0', False),
+    ('gzip; q=0.0, *;q=1', False),
+    ('br, *;q=0.1', True),
+    ('*;q=0', False),
+    ('identity', False),
+    ('x-gzip', True),
+    ('gzip;q=abc', False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    assert accepts_gzip(accept_encoding) is expected
+
+
+def test_etag_and_not_modified(server, analyzer):
+    status, headers, body = request(server, '/api/info')
+    assert status == 200
+    assert headers['ETag'] == f'"{analyzer.data_fingerprint}:/api/info"'
+    assert json.loads(body)['rows'] == len(analyzer.filtered_df)
+
+    status, headers, body = request(server, '/api/info', **{'If-None-Match': headers['ETag']})
+    assert status == 304 and body == b''
+    status, _, _ = request(server, '/api/info', **{'If-None-Match': '"other"'})
+    assert status == 200
+
+
+def test_unknown_paths_are_not_found_before_conditional_check(server, analyzer):
+    airline = analyzer.filtered_df['Airline_Normalized'].iloc[0]
+    assert request(server, f'/api/airlines/{airline}/age-distribution')[0] == 200
+    for path in ['/api/unknown', '/api/market-share/No Such Table', '/api/airlines/No Such Airline/age-distribution']:
+        for headers in [{}, {'If-None-Match': '*'}]:
+            status, _, body = request(server, path, **headers)
+            assert status == 404
+            assert 'error' in json.loads(body)
+
+
+def test_gzip_response(server):
+    _, _, plain = request(server, '/api/market-share')
+    status, headers, body = request(server, '/api/market-share', **{'Accept-Encoding': 'gzip'})
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip' and headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(body) == plain
+    assert '制造商全部' in json.loads(plain)
+
+    _, plain_headers, body = request(server, '/api/market-share', **{'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in plain_headers and body == plain
+
+    # 压缩和未压缩的响应是不同的表示，使用不同的ETag
+    assert headers['ETag'] != plain_headers['ETag']
+    assert request(server, '/api/market-share', **{'Accept-Encoding': 'gzip',
+                                                    'If-None-Match': headers['ETag']})[0] == 304
+    assert request(server, '/api/market-share', **{'Accept-Encoding': 'gzip',
+                                                    'If-None-Match': plain_headers['ETag']})[0] == 200
+
+
+def test_conditional_request_does_not_compute_reports(server, analyzer):
+    # 请求行中的路径经过百分号编码，ETag 使用编码后的路径
+    etag = f'"{analyzer.data_fingerprint}:{quote("/api/market-share/制造商全部")}"'
+    assert request(server, '/api/market-share/制造商全部', **{'If-None-Match': etag})[0] == 304
+    assert request(server, '/api/market-share', **{'If-None-Match': '*'})[0] == 304
+    assert not any(key[1] == 'generate_market_share_analysis' for key in analyzer._report_cache)
+
+
+def test_response_cache(analyzer):
+    service = AnalysisService(analyzer, cache_size=2)
+    first = service.get_response('/api/models')
+    assert service.get_response('/api/models') is first
+    assert service.get_response('/api/unknown') is None
+
+    service.get_response('/api/airlines')
+    service.get_response('/api/info')
+    assert len(service._cache) == 2
+    assert (analyzer.data_fingerprint, '/api/models') not in service._cache
+
+    # 数据集变化后按新的指纹生成响应和 ETag
+    previous_etag = service.etag_for('/api/info')
+    analyzer.set_status_filter('In Service', verbose=False)
+    fingerprint, body, _ = service.get_response('/api/info')
+    assert fingerprint == analyzer.data_fingerprint
+    assert service.etag_for('/api/info', fingerprint=fingerprint) != previous_etag
+    assert json.loads(body)['rows'] == len(analyzer.filtered_df)
+
+
+def test_computation_does_not_block_other_requests(analyzer):
+    service = AnalysisService(analyzer)
+    service.get_response('/api/info')
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_route():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return {'slow': True}
+
+    threads = [threading.Thread(target=service.get_response, args=('/api/slow', slow_route)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(10)
+    # 计算期间缓存命中的请求不需要等待
+    assert service.get_response('/api/info') is not None
+    release.set()
+    for thread in threads:
+        thread.join()
+    # 同一响应只计算一次
+    assert len(calls) == 1
+    assert service.get_response('/api/slow')[1] == b'{"slow": true}'
+    assert not service._computing
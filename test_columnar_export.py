@@ -0,0 +1,74 @@
+"""列式格式导出测试（未安装 pyarrow 时跳过）"""
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from columnar_export import COLUMNAR_FORMATS, _to_arrow, export_tables, safe_table_name, write_bundle
+
+pa = pytest.importorskip('pyarrow')
+
+
+def read_entry(bundle, name, fmt):
+    """从zip归档中读回一个表（Arrow 表）"""
+    data = bundle.read(name)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(data))
+    if fmt == 'arrow':
+        return pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    import pyarrow.csv as pa_csv
+    return pa_csv.read_csv(pa.CompressedInputStream(pa.BufferReader(data), 'zstd'))
+
+
+@pytest.fixture
+def tables(analyzer):
+    return export_tables(analyzer.for_snapshot())
+
+
+def test_export_tables(analyzer, tables):
+    assert len(tables['aircraft']) == len(analyzer.filtered_df)
+    assert {'airline_model', 'model_list', 'market_share_制造商全部'} <= set(tables)
+    distribution = tables['airline_age_distribution']
+    assert distribution['Count'].sum() == len(analyzer.filtered_df)
+
+    # 长表与单个航司的机型x机龄分布表一致
+    airline = distribution['Airline_Normalized'].iloc[0]
+    expected = analyzer.generate_airline_age_distribution(airline, verbose=False)
+    wide = (distribution[distribution['Airline_Normalized'] == airline]
+            .pivot(index='Model_Normalized', columns='Age_Integer', values='Count'))
+    assert wide.sum(axis=1).sort_index().tolist() == expected['Total'].drop('Total').sort_index().tolist()
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_bundle_round_trip(tables, fmt):
+    output = write_bundle(tables, fmt, BytesIO())
+    with zipfile.ZipFile(output) as bundle:
+        extension = COLUMNAR_FORMATS[fmt][1]
+        assert sorted(bundle.namelist()) == sorted(f'{safe_table_name(name)}{extension}' for name in tables)
+        for name, df in tables.items():
+            assert read_entry(bundle, f'{safe_table_name(name)}{extension}', fmt).equals(_to_arrow(df))
+
+
+def test_csv_round_trip(tables):
+    output = write_bundle(tables, 'csv.zst', BytesIO())
+    with zipfile.ZipFile(output) as bundle:
+        for name in ['market_share_制造商全部', 'airline_age_distribution']:
+            expected = _to_arrow(tables[name]).to_pandas()
+            actual = read_entry(bundle, f'{safe_table_name(name)}.csv.zst', 'csv.zst').to_pandas()
+            pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+        assert read_entry(bundle, 'aircraft.csv.zst', 'csv.zst').num_rows == len(tables['aircraft'])
+
+
+def test_mixed_columns_and_index():
+    df = pd.DataFrame({'value': [1, 'a', None], 2: [1.0, 2.0, 3.0]}, index=pd.Index(['x', 'y', 'z'], name='key'))
+    table = _to_arrow(df)
+    assert table.column_names == ['key', 'value', '2']
+    assert table.column('value').to_pylist() == ['1', 'a', None]
+
+
+def test_table_names_and_unknown_format():
+    with pytest.raises(KeyError):
+        write_bundle({'t': pd.DataFrame({'a': [1]})}, 'xlsx', BytesIO())
+    assert safe_table_name('制造商 Under 100 seats (%)') == '制造商_Under_100_seats'
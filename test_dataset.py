@@ -0,0 +1,80 @@
+"""数据集快照和报表缓存测试"""
+import threading
+
+import pandas as pd
+import pytest
+
+from dataset import DatasetSnapshot
+
+
+def test_snapshot_is_immutable():
+    snapshot = DatasetSnapshot(pd.DataFrame({'a': [1, 2]}), 'abc', region='China')
+    with pytest.raises(AttributeError):
+        snapshot.frame = pd.DataFrame()
+    with pytest.raises(AttributeError):
+        snapshot.new_attribute = 1
+    with pytest.raises(AttributeError):
+        del snapshot.region
+    assert (len(snapshot), snapshot.snapshot_id, snapshot.region) == (2, 'abc', 'China')
+    assert DatasetSnapshot(snapshot.frame, 'abc').version > snapshot.version
+
+
+def test_derived_is_built_once():
+    snapshot = DatasetSnapshot(pd.DataFrame({'a': [1, 2]}), 'abc')
+    calls = []
+
+    def build(target):
+        calls.append(target)
+        return len(target.frame)
+
+    threads = [threading.Thread(target=snapshot.derived, args=('size', build)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert snapshot.derived('size', build) == 2
+    assert calls == [snapshot]
+    # 新快照重新构建
+    assert DatasetSnapshot(snapshot.frame, 'abc').derived('size', build) == 2
+    assert len(calls) == 2
+
+
+def test_view_is_pinned_to_snapshot(analyzer):
+    view = analyzer.for_snapshot()
+    snapshot = analyzer.snapshot
+    analyzer.set_status_filter('In Service', verbose=False)
+    assert analyzer.snapshot is not snapshot
+    assert view.snapshot is snapshot and view.filtered_df is snapshot.frame
+    assert len(view.filtered_df) > len(analyzer.filtered_df)
+
+
+def test_report_cache_follows_current_snapshot(analyzer):
+    models = analyzer.get_cached_report('generate_model_list', verbose=False)
+    assert analyzer.get_cached_report('generate_model_list', verbose=True) is models
+
+    # 切换后在旧快照上计算的报表不写入缓存
+    old_snapshot = analyzer.snapshot
+    analyzer.set_status_filter('In Service', verbose=False)
+    keys = set(analyzer._report_cache)
+    analyzer._cached_report('generate_model_list', snapshot=old_snapshot, verbose=False)
+    assert set(analyzer._report_cache) == keys
+
+    # 缓存当前快照的报表时丢弃旧快照的缓存
+    current = analyzer.get_cached_report('generate_model_list', verbose=False)
+    assert current is not models
+    assert {key[0] for key in analyzer._report_cache} == {analyzer.data_fingerprint}
+
+
+def test_nested_reports_are_cached_on_owner(analyzer):
+    pytest.importorskip('plotly')
+    analyzer.get_cached_report('generate_market_share_charts', backend='plotly')
+    fingerprint = analyzer.data_fingerprint
+    assert (fingerprint, 'generate_market_share_charts', (), (('backend', 'plotly'),)) in analyzer._report_cache
+    assert (fingerprint, 'generate_market_share_analysis', (), ()) in analyzer._report_cache
+
+    # 视图上的嵌套报表同样写入原实例的缓存
+    view = analyzer.for_snapshot()
+    analyzer._report_cache.clear()
+    view.get_cached_report('generate_market_share_charts', backend='plotly')
+    assert view._report_cache is analyzer._report_cache
+    assert (fingerprint, 'generate_market_share_analysis', (), ()) in analyzer._report_cache
@@ -0,0 +1,92 @@
+"""Polars 引擎与 pandas 实现的等价性测试（未安装 polars 时跳过）"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import ChinaAircraftAnalysisTool
+from dataset import DatasetSnapshot
+from engines import create_engine
+from load_test import make_synthetic_fleet
+
+pytest.importorskip('polars')
+
+
+@pytest.fixture(scope='module')
+def tool():
+    return ChinaAircraftAnalysisTool()
+
+
+def messy_fleet():
+    """含填充空白/文本机龄、缺失注册号和状态、重复记录的数据"""
+    return pd.DataFrame({
+        'Registration': ['B-1', 'B-2', None, 'B-1', np.nan, 'B-3', 'B-4', 'B-5', 'B-6', 'B-7'],
+        'Operator': ['Air China', 'China Eastern Airlines', None, 'Air China', 'Spring Airlines',
+                     'Hainan Airlines (HU)', 'Sichuan Airlines', 'Unknown Air', 'Air China', np.nan],
+        'Master Series': ['A320-200', '737-800', 'ARJ21-700', 'A320-200', None, 'C919', 'E190',
+                          'Some Long Model', '737 MAX 8', 'A321-200NX'],
+        'Manufacturer': ['AIRBUS', 'BOEING', 'COMAC', 'AIRBUS', None, 'COMAC', 'EMBRAER', 'OTHER',
+                         'BOEING', 'AIRBUS'],
+        'Age': [' 5 ', '7.5', 'abc', '3', None, 60, '\t12\n', '55', 2, '1e1'],
+        'Status': [' in service ', 'STORAGE', None, 'In Service', np.nan, 'Storage', 'Retired',
+                   'Unknown', 'in service', 'Parked'],
+    }, index=pd.RangeIndex(10, 20))
+
+
+def assert_same(tool, df):
+    pandas_engine, polars_engine = create_engine('pandas', tool), create_engine('polars', tool)
+    expected = pandas_engine.clean(df, verbose=False)
+    actual = polars_engine.clean(df, verbose=False)
+    pd.testing.assert_frame_equal(expected, actual)
+
+    expected = pandas_engine.enhance(expected, verbose=False)
+    actual = polars_engine.enhance(actual, verbose=False)
+    pd.testing.assert_frame_equal(expected, actual)
+
+    # 没有数据时不生成市场占有率表（见 generate_market_share_analysis）
+    if len(expected) == 0:
+        return
+    # 市场占有率在快照上计算（与页面相同）
+    view = tool.for_snapshot(DatasetSnapshot(expected, tool._compute_fingerprint(expected)))
+    expected_tables = create_engine('pandas', view).market_share_tables(expected)
+    actual_tables = create_engine('polars', view).market_share_tables(actual)
+    assert list(expected_tables) == list(actual_tables)
+    for name in expected_tables:
+        pd.testing.assert_frame_equal(expected_tables[name], actual_tables[name])
+
+
+def test_messy_input(tool):
+    assert_same(tool, messy_fleet())
+
+
+@pytest.mark.parametrize('ages', [
+    [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+    [1, 2, 3, 4, 5, 6, 7, 8, 9, 70],
+    [1.5, np.nan, 3, 4, 5, 6, 7, 8, 9, 10],
+    ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10'],
+    [' 1', '2 ', None, '4', '5', '6', '7', '8', '9', '10'],
+])
+def test_age_values(tool, ages):
+    df = messy_fleet()
+    df['Age'] = pd.Series(ages, index=df.index)
+    assert_same(tool, df)
+
+
+def test_renamed_age_column(tool):
+    df = messy_fleet().rename(columns={'Age': 'Aircraft Age (years)'})
+    assert_same(tool, df)
+
+
+@pytest.mark.parametrize('dropped', [
+    ['Age'], ['Registration'], ['Status'], ['Master Series'], ['Manufacturer', 'Operator'],
+    ['Age', 'Registration', 'Status'],
+])
+def test_missing_columns(tool, dropped):
+    assert_same(tool, messy_fleet().drop(columns=dropped))
+
+
+def test_empty_input(tool):
+    assert_same(tool, messy_fleet().iloc[:0])
+
+
+def test_synthetic_fleet(tool):
+    assert_same(tool, make_synthetic_fleet(2000))
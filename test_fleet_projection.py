@@ -0,0 +1,65 @@
+"""机队机龄预测测试"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import DatasetSnapshot
+from fleet_projection import retirement_ages
+
+BASE_YEAR = 2025
+
+
+@pytest.fixture
+def projection(analyzer):
+    return analyzer.generate_fleet_projection([BASE_YEAR, BASE_YEAR + 5, BASE_YEAR + 10], base_year=BASE_YEAR,
+                                              verbose=False)
+
+
+def test_base_year_matches_airline_age_distribution(analyzer, projection):
+    for airline in projection.airlines[:5]:
+        expected = analyzer.generate_airline_age_distribution(airline, verbose=False)
+        actual = projection.age_distribution(airline, '不退役', BASE_YEAR)
+        pd.testing.assert_frame_equal(actual, expected, check_names=False, check_index_type=False,
+                                      check_column_type=False)
+
+
+def test_base_year_fleet_size_and_average_age(analyzer, projection):
+    df = analyzer.filtered_df
+    counts = df['Airline_Normalized'].value_counts().sort_index()
+    fleet_size = projection.fleet_size('不退役')[BASE_YEAR]
+    np.testing.assert_array_equal(fleet_size.loc[counts.index].to_numpy(), counts.to_numpy())
+
+    mean_age = df.assign(Age=df['Age'].fillna(0)).groupby('Airline_Normalized')['Age'].mean()
+    np.testing.assert_allclose(projection.average_age('不退役')[BASE_YEAR].loc[mean_age.index], mean_age)
+
+
+def test_retirement_policy_removes_aircraft_at_limit(analyzer, projection):
+    df = analyzer.filtered_df
+    ages = df['Age'].fillna(0)
+    for year in projection.years:
+        expected = (ages + (year - BASE_YEAR) < 25).groupby(df['Airline_Normalized']).sum()
+        actual = projection.fleet_size('满25年退役')[year].loc[expected.index]
+        np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy())
+
+    # 机龄段构成的合计等于在役飞机数量
+    mix = projection.age_group_mix('满25年退役', BASE_YEAR + 10)
+    np.testing.assert_array_equal(mix.sum(axis=1), projection.fleet_size('满25年退役')[BASE_YEAR + 10])
+
+
+def test_retirement_ages_by_seat_category():
+    seats = pd.Series(['Under 100 seats', 'Over 150 seats', None])
+    np.testing.assert_array_equal(retirement_ages(None, seats), [np.inf] * 3)
+    np.testing.assert_array_equal(retirement_ages(30, seats), [30.0] * 3)
+    np.testing.assert_array_equal(retirement_ages({'Under 100 seats': 20, 'default': 25}, seats), [20.0, 25.0, 25.0])
+    np.testing.assert_array_equal(retirement_ages({'Under 100 seats': 20}, seats), [20.0, np.inf, np.inf])
+
+
+def test_missing_model_column(analyzer):
+    view = analyzer.for_snapshot(DatasetSnapshot(analyzer.filtered_df.drop(columns=['Model_Normalized']), 'no-model'))
+    assert view.generate_fleet_projection([BASE_YEAR], base_year=BASE_YEAR, verbose=False) is None
+
+
+def test_unknown_year_and_airline(projection):
+    with pytest.raises(KeyError):
+        projection.age_group_mix('不退役', BASE_YEAR + 1)
+    assert projection.age_distribution('No Such Airline', '不退役', BASE_YEAR) is None
@@ -0,0 +1,89 @@
+"""机队替换蒙特卡洛模拟测试"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fleet_simulation
+from fleet_simulation import (prepare_simulation, retirement_probabilities, shift_shares,
+                              simulate_fleet_replacement)
+
+
+@pytest.fixture
+def inputs(analyzer):
+    return prepare_simulation(analyzer.filtered_df, 10)
+
+
+def test_fixed_seed_is_deterministic(inputs):
+    first = simulate_fleet_replacement(inputs, trials=500, seed=7, chunk_size=200)
+    second = simulate_fleet_replacement(inputs, trials=500, seed=7, chunk_size=200)
+    np.testing.assert_array_equal(first, second)
+    assert not np.array_equal(first, simulate_fleet_replacement(inputs, trials=500, seed=8, chunk_size=200))
+
+
+def test_process_pool_matches_serial(inputs):
+    serial = simulate_fleet_replacement(inputs, trials=300, seed=3, chunk_size=100, workers=1)
+    pooled = simulate_fleet_replacement(inputs, trials=300, seed=3, chunk_size=100, workers=2, parallel_threshold=0)
+    np.testing.assert_array_equal(serial, pooled)
+
+
+def test_small_simulation_runs_in_process(inputs, monkeypatch):
+    monkeypatch.setattr(fleet_simulation, 'ProcessPoolExecutor', None)
+    counts = simulate_fleet_replacement(inputs, trials=300, seed=3, chunk_size=100, workers=4)
+    assert counts.shape[0] == 300
+
+
+def test_replacement_keeps_fleet_size_per_seat_category(analyzer, inputs):
+    counts = simulate_fleet_replacement(inputs, trials=200, seed=0)
+    assert counts.shape == (200, len(inputs['seat_categories']), len(inputs['manufacturers']))
+    # 退役飞机一对一替换，每个座位等级的机队数量不变
+    fleet = analyzer.filtered_df['Seat_Category'].value_counts()
+    expected = [fleet[category] for category in inputs['seat_categories']]
+    np.testing.assert_array_equal(counts.sum(axis=2), np.tile(expected, (200, 1)))
+
+
+def test_market_share_results(analyzer):
+    results = analyzer.simulate_market_share(2035, trials=300, seed=1, base_year=2025, verbose=False)
+    assert '制造商全部' in results
+    for table in results.values():
+        assert table['占比 (%)'].sum() == pytest.approx(100, abs=0.1)
+        assert (table['P10 (%)'] <= table['占比 (%)'] + 1e-9).all()
+        assert (table['占比 (%)'] <= table['P90 (%)'] + 1e-9).all()
+
+    again = analyzer.simulate_market_share(2035, trials=300, seed=1, base_year=2025, verbose=False)
+    pd.testing.assert_frame_equal(results['制造商全部'], again['制造商全部'])
+
+
+def test_retirement_by_model_changes_results(analyzer):
+    model = analyzer.filtered_df['Model_Normalized'].value_counts().index[0]
+    base = analyzer.simulate_market_share(2035, trials=200, seed=1, base_year=2025, verbose=False)
+    changed = analyzer.simulate_market_share(2035, trials=200, seed=1, base_year=2025, verbose=False,
+                                             retirement_by_model=((model, (5.0, 1.0)),))
+    assert not base['制造商全部'].equals(changed['制造商全部'])
+
+
+def test_retirement_probabilities():
+    ages = np.array([0.0, 10.0, 24.0, 60.0])
+    probabilities = retirement_probabilities(ages, ['A', 'A', 'A', 'B'], 5)
+    assert ((probabilities >= 0) & (probabilities <= 1)).all()
+    assert probabilities[0] < probabilities[1] < probabilities[2]
+    # 已远超退役机龄的飞机必定退役
+    assert probabilities[3] == pytest.approx(1.0)
+
+    by_model = retirement_probabilities(ages, ['A', 'A', 'A', 'B'], 5, retirement_by_model={'A': (100.0, 1.0)})
+    np.testing.assert_allclose(by_model[:3], 0.0, atol=1e-12)
+
+    # 0 年内不会退役（包括已远超退役机龄的飞机）
+    assert np.all(retirement_probabilities(ages, ['A', 'A', 'A', 'B'], 0) == 0)
+    # 远超退役机龄的飞机按条件概率计算，短期内不一定退役，且随时间增加
+    over_age = [retirement_probabilities([60.0, 200.0], ['A', 'A'], years) for years in (0.01, 0.1, 1)]
+    assert ((over_age[0] > 0) & (over_age[0] < 1)).all()
+    assert np.all(over_age[0] < over_age[1]) and np.all(over_age[1] <= over_age[2])
+    assert over_age[0][0] == pytest.approx(1 - math.erfc(35.01 / 3 / math.sqrt(2)) / math.erfc(35 / 3 / math.sqrt(2)))
+
+
+def test_shift_shares():
+    shifted = shift_shares({'COMAC': 10, 'AIRBUS': 60, 'BOEING': 30}, 'COMAC', 0.5)
+    assert shifted == pytest.approx({'COMAC': 0.5, 'AIRBUS': 60 / 90 * 0.5, 'BOEING': 30 / 90 * 0.5})
+    assert shift_shares({'COMAC': 5}, 'COMAC', 0.3) == {'COMAC': 0.3}
@@ -0,0 +1,68 @@
+"""多工作表并行导入测试"""
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from app import ChinaAircraftAnalysisTool
+from ingest import ingest_sheets, list_sheet_names, load_sheet
+from load_test import make_synthetic_fleet
+
+
+def workbook_bytes(sheets):
+    """{工作表名: 数据表} 写成 Excel 字节串"""
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def sheets():
+    fleet = make_synthetic_fleet(1200, seed=5)
+    # 两个工作表有 100 条相同注册号的记录
+    return {'East': fleet.iloc[:700], 'West': fleet.iloc[600:]}
+
+
+def test_shared_memory_ingest_matches_serial(sheets, tmp_path):
+    content = workbook_bytes(sheets)
+    path = tmp_path / 'fleet.xlsx'
+    path.write_bytes(content)
+    upload = BytesIO(content)
+    upload.name = 'upload.xlsx'  # 与 Streamlit 上传文件一样带文件名
+    assert list_sheet_names(upload) == ['East', 'West']
+
+    tasks = [(upload, 'East'), (upload, 'West'), (str(path), 'West')]
+    results = ingest_sheets(tasks, max_workers=2)
+    names = [(name, sheet) for name, sheet, _ in results]
+    assert names == [('upload.xlsx', 'East'), ('upload.xlsx', 'West'), ('fleet.xlsx', 'West')]
+    for (_, sheet_name, (sheet_df, raw_rows)) in results:
+        expected_df, expected_rows = load_sheet(str(path), sheet_name)
+        assert raw_rows == expected_rows == len(sheets[sheet_name])
+        pd.testing.assert_frame_equal(sheet_df, expected_df)
+
+
+def test_failed_sheet_is_reported_in_order(sheets, tmp_path):
+    path = tmp_path / 'fleet.xlsx'
+    path.write_bytes(workbook_bytes(sheets))
+    results = ingest_sheets([(str(path), 'Missing'), (str(path), 'East')], max_workers=1)
+    assert isinstance(results[0][2], Exception)
+    assert results[1][2][1] == len(sheets['East'])
+
+
+def test_multi_sheet_load_deduplicates_registrations(sheets):
+    tool = ChinaAircraftAnalysisTool()
+    tool.ingest_workers = 2
+    assert tool.load_and_filter_data(BytesIO(workbook_bytes(sheets)), verbose=False)
+    assert tool.raw_row_count == sum(len(df) for df in sheets.values())
+    assert tool.df['Registration'].is_unique
+
+    single = ChinaAircraftAnalysisTool()
+    merged = pd.concat(sheets.values()).drop_duplicates(subset=['Registration'])
+    assert single.load_and_filter_data(BytesIO(workbook_bytes({'All': merged})), verbose=False)
+    assert len(tool.filtered_df) == len(single.filtered_df)
+    assert sorted(tool.filtered_df['Registration']) == sorted(single.filtered_df['Registration'])
+    # 与单个工作表一样，清洗结果包含非客机，客机在合并后筛选
+    assert sorted(tool.df['Registration']) == sorted(single.df['Registration'])
+    assert (tool.df['Primary Usage'] != 'Passenger').any()
@@ -0,0 +1,22 @@
+"""市场占有率表测试"""
+import pandas as pd
+
+from dataset import DatasetSnapshot
+
+
+def test_tables_are_built_from_given_frame(analyzer):
+    df = analyzer.filtered_df
+    subset = df[df['Airline_Normalized'] == df['Airline_Normalized'].value_counts().index[0]]
+    tables = analyzer._market_share_tables(subset)
+
+    # 与在该子集的快照上计算的结果相同，不混入当前快照的数据
+    view = analyzer.for_snapshot(DatasetSnapshot(subset, analyzer._compute_fingerprint(subset)))
+    expected = view._market_share_tables(subset)
+    assert list(tables) == list(expected)
+    for name in tables:
+        pd.testing.assert_frame_equal(tables[name], expected[name])
+
+    for name, table in tables.items():
+        if name.startswith('机型 '):
+            seat_category = name.removeprefix('机型 ')
+            assert table['数量'].sum() == (subset['Seat_Category'] == seat_category).sum()
@@ -0,0 +1,60 @@
+"""按依赖关系缓存的计算阶段测试"""
+import pytest
+
+from pipeline import StagePipeline
+from progress import EventBus
+
+
+@pytest.fixture
+def params():
+    return {'a': 1, 'b': 10, 'c': 100}
+
+
+@pytest.fixture
+def pipeline(params):
+    """a → b → d、a → c → d 的菱形依赖，各阶段的参数取自 params"""
+    pipeline = StagePipeline(EventBus(log=False))
+    pipeline.add('a', lambda verbose: params['a'], params=lambda: params['a'])
+    pipeline.add('b', lambda a, verbose: a + params['b'], inputs=('a',), params=lambda: params['b'])
+    pipeline.add('c', lambda a, verbose: a + params['c'], inputs=('a',), params=lambda: params['c'])
+    pipeline.add('d', lambda b, c, verbose: (b, c), inputs=('b', 'c'))
+    return pipeline
+
+
+def test_only_changed_stages_rerun(pipeline, params):
+    assert pipeline.get('d') == (11, 101)
+    assert pipeline.get('d') == (11, 101)
+    assert pipeline.runs == {'a': 1, 'b': 1, 'c': 1, 'd': 1}
+
+    params['c'] = 200
+    assert pipeline.get('d') == (11, 201)
+    assert pipeline.runs == {'a': 1, 'b': 1, 'c': 2, 'd': 2}
+
+    params['a'] = 2
+    assert pipeline.get('d') == (12, 202)
+    assert pipeline.runs == {'a': 2, 'b': 2, 'c': 3, 'd': 3}
+
+
+def test_undefined_inputs(pipeline):
+    with pytest.raises(ValueError):
+        pipeline.add('e', lambda x, verbose: x, inputs=('x',))
+
+
+def test_stage_events(pipeline):
+    events = []
+    pipeline.events.subscribe(events.append)
+    pipeline.get('b')
+    assert [(event.kind, event.stage) for event in events] == [
+        ('stage_started', 'a'), ('stage_finished', 'a'), ('stage_started', 'b'), ('stage_finished', 'b')]
+
+
+def test_status_change_reruns_only_view(analyzer):
+    runs = analyzer.pipeline.runs.copy()
+    assert analyzer.set_status_filter('In Service', verbose=False)
+    assert analyzer.pipeline.runs - runs == {'view': 1}
+    assert set(analyzer.filtered_df['Status']) == {'In Service'}
+
+    # 只改变机型范围时同样只重新取视图
+    runs = analyzer.pipeline.runs.copy()
+    assert analyzer.set_aircraft_scope(analyzer.current_aircraft_scope()[:1], verbose=False)
+    assert analyzer.pipeline.runs - runs == {'view': 1}
@@ -0,0 +1,39 @@
+"""SQL即席查询测试（未安装 duckdb 时跳过）"""
+import pytest
+
+pytest.importorskip('duckdb')
+
+
+def test_select_query(analyzer):
+    result = analyzer.run_sql_query('WITH t AS (SELECT * FROM aircraft) SELECT COUNT(*) AS n FROM t;', verbose=False)
+    assert result['n'].iloc[0] == len(analyzer.filtered_df)
+
+    # 返回副本，修改结果不影响缓存
+    result.loc[0, 'n'] = -1
+    assert analyzer.run_sql_query('WITH t AS (SELECT * FROM aircraft) SELECT COUNT(*) AS n FROM t',
+                                  verbose=False)['n'].iloc[0] == len(analyzer.filtered_df)
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "COPY (SELECT 42) TO 'sql_export.csv'",
+    "SET enable_external_access = true",
+    "SELECT 1; SELECT 2",
+    "DROP VIEW aircraft",
+    "CREATE TABLE copy AS SELECT * FROM aircraft",
+    "ATTACH 'other.db'",
+])
+def test_rejected_queries(analyzer, query, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert analyzer.run_sql_query(query, verbose=False) is None
+    assert not list(tmp_path.iterdir())
+    # 被拒绝的查询不影响之后的查询
+    result = analyzer.run_sql_query('SELECT COUNT(*) AS n FROM aircraft', verbose=False)
+    assert result['n'].iloc[0] == len(analyzer.filtered_df)
+
+
+def test_query_follows_current_snapshot(analyzer):
+    before = analyzer.run_sql_query('SELECT COUNT(*) AS n FROM aircraft', verbose=False)['n'].iloc[0]
+    analyzer.set_status_filter('In Service', verbose=False)
+    after = analyzer.run_sql_query('SELECT COUNT(*) AS n FROM aircraft', verbose=False)['n'].iloc[0]
+    assert before > after == len(analyzer.filtered_df)